@@ -1,7 +1,9 @@
 from rest_framework import serializers
+from apps.common.fast_serializers import FastListSerializer, FastRepresentationMixin
+from apps.common.fieldsets import SparseFieldsetMixin
 from .models import Cart, CartItem
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsetMixin, FastRepresentationMixin, serializers.ModelSerializer):
     """Cart item serializer."""
     tshirt_title = serializers.CharField(source='tshirt.title', read_only=True)
     tshirt_price = serializers.DecimalField(source='tshirt.price', max_digits=10, decimal_places=2, read_only=True)
@@ -12,9 +14,16 @@ class CartItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CartItem
+        list_serializer_class = FastListSerializer
         fields = ['id', 'tshirt_title', 'tshirt_price', 'tshirt_brand', 'tshirt_category', 'tshirt_image', 'quantity', 'total_price', 'created_at']
+        expandable_fields = {
+            'tshirt': ('apps.products.serializers.TShirtListSerializer', {'read_only': True}),
+        }
+        field_sources = {
+            'total_price': ['quantity', 'tshirt__price'],
+        }
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsetMixin, FastRepresentationMixin, serializers.ModelSerializer):
     """Cart serializer."""
     items = CartItemSerializer(many=True, read_only=True)
     total_items = serializers.ReadOnlyField()
@@ -1,10 +1,15 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
+from datetime import timedelta
 from decimal import Decimal
+from django.utils import timezone
 from .models import Cart, CartItem
-from apps.products.models import TShirt, Brand, Category
+from apps.products.models import ProductReservation, TShirt, Brand, Category
+from apps.products.reservation_engine import get_reservation_engine, reset_reservation_engine, undo_holds_on_error
+from apps.products.utils import get_available_quantity
+from apps.common.fast_serializers import _binder
 
 class CartAPITestCase(TestCase):
     def setUp(self):
@@ -64,3 +69,89 @@ class CartAPITestCase(TestCase):
         
         cart_item.refresh_from_db()
         self.assertEqual(cart_item.quantity, 3)
+
+    def test_fast_serializers_match_drf_output(self):
+        """Test the compiled cart and list serializers render the same JSON as DRF"""
+        self.client.force_authenticate(user=self.user)
+        uncategorized = TShirt.objects.create(
+            title='Plain Shirt', slug='plain-shirt', brand=self.product.brand,
+            price=Decimal('250.50'), quantity=3, size='L', condition='good'
+        )
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, tshirt=self.product, quantity=2)
+        CartItem.objects.create(cart=cart, tshirt=uncategorized, quantity=1)
+
+        for url in ('/api/v1/cart/', '/api/v1/products/tshirts/'):
+            with override_settings(FAST_SERIALIZERS_ENABLED=False):
+                expected = self.client.get(url).content
+            with override_settings(FAST_SERIALIZERS_ENABLED=True):
+                actual = self.client.get(url).content
+                compiled = _binder.cache_info().misses
+                self.client.get(url)
+                self.assertEqual(_binder.cache_info().misses, compiled)
+            self.assertEqual(actual, expected)
+
+    def test_cart_fields_and_expand(self):
+        """Test the cart honours ?fields= and expands items to full products on request"""
+        self.client.force_authenticate(user=self.user)
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, tshirt=self.product, quantity=2)
+
+        response = self.client.get('/api/v1/cart/?fields=total_price,items.quantity,items.tshirt&expand=items.tshirt')
+        self.assertEqual(list(response.data), ['items', 'total_price'])
+        item = response.data['items'][0]
+        self.assertEqual(item['quantity'], 2)
+        self.assertEqual(item['tshirt']['slug'], 'test-shirt')
+        self.assertNotIn('tshirt_title', item)
+
+
+    @override_settings(RESERVATION_ENGINE='memory', RESERVATION_WRITE_THROUGH_ASYNC=False)
+    def test_reservation_engine_holds_drop_items(self):
+        """Test the reservation engine lets only one shopper hold a one-off item and writes holds through"""
+        reset_reservation_engine()
+        self.addCleanup(reset_reservation_engine)
+        self.product.quantity = 1
+        self.product.save()
+        other = User.objects.create_user(username='otheruser', password='testpass123')
+        ProductReservation.objects.create(
+            product=self.product, user=other, quantity=1, expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(ProductReservation.objects.get(user=self.user, product=self.product).quantity, 1)
+
+        self.client.force_authenticate(user=other)
+        response = self.client.post('/api/v1/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.user)
+        item = CartItem.objects.get(cart__user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/v1/cart/remove/{item.id}/')
+        self.assertFalse(ProductReservation.objects.filter(user=self.user).exists())
+
+        self.client.force_authenticate(user=other)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/cart/add/', {'product_id': self.product.id, 'quantity': 1})
+        self.assertTrue(status.is_success(response.status_code))
+        self.assertTrue(ProductReservation.objects.get(user=other, product=self.product).is_active)
+
+    @override_settings(RESERVATION_ENGINE='memory', RESERVATION_WRITE_THROUGH_ASYNC=True)
+    def test_reservation_engine_undoes_holds_on_rollback(self):
+        """Test a failed request's holds are undone and availability reads the engine, not the stored counter"""
+        reset_reservation_engine()
+        self.addCleanup(reset_reservation_engine)
+        engine = get_reservation_engine()
+        expires = timezone.now() + timedelta(minutes=15)
+
+        with self.assertRaises(RuntimeError), undo_holds_on_error():
+            self.assertTrue(engine.hold(self.product.pk, self.user.pk, 4, self.product.quantity, expires)[0])
+            raise RuntimeError('request failed')
+        self.assertIsNone(engine.current(self.product.pk, self.user.pk))
+
+        engine.hold(self.product.pk, self.user.pk, 4, self.product.quantity, expires)
+        self.assertFalse(ProductReservation.objects.exists())
+        self.assertEqual(get_available_quantity(self.product), 6)
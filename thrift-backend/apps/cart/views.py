@@ -9,6 +9,9 @@ from rest_framework.views import APIView
 from .models import Cart, CartItem
 from .serializers import CartSerializer
 from apps.products.models import ProductReservation, TShirt
+from apps.products.reservation_engine import (
+    atomic_with_holds, get_reservation_engine, release_hold, write_through,
+)
 from apps.products.utils import get_available_quantity
 from apps.common.validators import validate_quantity as validate_qty
 from django.contrib.auth.models import User
@@ -57,7 +60,19 @@ def _get_or_create_cart_for_request(request):
 
 def _sync_reservation(product, user, new_quantity):
     """Create/update a ProductReservation for the given user/product.
-    Set inactive by deleting when quantity is 0."""
+    Set inactive by deleting when quantity is 0.
+
+    With a reservation engine the hold was already placed by
+    _ensure_quantity_available; removals release it once the request
+    commits, and the row is written through after commit.
+    """
+    if get_reservation_engine() is not None:
+        if new_quantity <= 0:
+            release_hold(product.pk, user.pk)
+        else:
+            write_through(product.pk, user.pk)
+        return
+
     expires = timezone.now() + timedelta(minutes=15)
     try:
         res = ProductReservation.objects.get(product=product, user=user)
@@ -79,8 +94,12 @@ def _sync_reservation(product, user, new_quantity):
             )
 
 
-def _ensure_quantity_available(product, desired_quantity, existing_quantity=0):
-    """Ensure the desired quantity respects stock and current availability."""
+def _ensure_quantity_available(product, desired_quantity, existing_quantity=0, user=None):
+    """Ensure the desired quantity respects stock and current availability.
+
+    Given the ``user``, a configured reservation engine checks and holds the
+    desired quantity for them in one atomic step.
+    """
     max_quantity = product.quantity or 0
     if max_quantity < 1:
         return False, f"{product.title} is currently out of stock."
@@ -88,7 +107,16 @@ def _ensure_quantity_available(product, desired_quantity, existing_quantity=0):
     if desired_quantity > max_quantity:
         return False, f"Only {max_quantity} unit(s) of {product.title} are available."
 
-    available_qty = get_available_quantity(product)
+    engine = get_reservation_engine()
+    if engine is not None and user is not None:
+        expires = timezone.now() + timedelta(minutes=15)
+        held, available_qty = engine.hold(product.pk, user.pk, desired_quantity, max_quantity, expires)
+        if held:
+            return True, None
+        # The engine counts this user's own hold as available; report the increment.
+        available_qty = max(available_qty - existing_quantity, 0)
+    else:
+        available_qty = get_available_quantity(product)
     incremental_needed = max(desired_quantity - existing_quantity, 0)
 
     if incremental_needed > available_qty:
@@ -115,7 +143,7 @@ class CartView(APIView):
 class AddToCartView(APIView):
     permission_classes = [AllowAny]
 
-    @transaction.atomic
+    @atomic_with_holds
     def post(self, request):
         product_id = request.data.get('product_id')
         quantity_value = request.data.get('quantity', 1)
@@ -132,7 +160,11 @@ class AddToCartView(APIView):
         if quantity is None:
             return Response({'error': 'Quantity must be between 1 and 100.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        product = get_object_or_404(TShirt.objects.select_for_update(), id=product_id, is_available=True)
+        products = TShirt.objects.all()
+        if get_reservation_engine() is None:
+            # Without an engine the row lock serializes the availability check and reservation write.
+            products = products.select_for_update()
+        product = get_object_or_404(products, id=product_id, is_available=True)
 
         cart = _get_or_create_cart_for_request(request)
         cart_item, created = CartItem.objects.select_for_update().get_or_create(
@@ -143,7 +175,9 @@ class AddToCartView(APIView):
 
         new_quantity = cart_item.quantity + quantity
 
-        is_valid, message = _ensure_quantity_available(product, new_quantity, existing_quantity=cart_item.quantity)
+        is_valid, message = _ensure_quantity_available(
+            product, new_quantity, existing_quantity=cart_item.quantity, user=cart.user
+        )
         if not is_valid:
             return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -161,7 +195,7 @@ class AddToCartView(APIView):
 class UpdateCartItemView(APIView):
     permission_classes = [AllowAny]
 
-    @transaction.atomic
+    @atomic_with_holds
     def put(self, request, item_id):
         quantity_value = request.data.get('quantity')
         quantity = _parse_quantity(quantity_value)
@@ -172,7 +206,7 @@ class UpdateCartItemView(APIView):
         cart_item = get_object_or_404(CartItem.objects.select_for_update().select_related('tshirt', 'cart'), id=item_id, cart=cart)
 
         product = cart_item.tshirt
-        is_valid, message = _ensure_quantity_available(product, quantity)
+        is_valid, message = _ensure_quantity_available(product, quantity, user=cart.user)
         if not is_valid:
             return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -214,6 +248,8 @@ class ClearCartView(APIView):
         product_ids = list(cart.items.values_list('tshirt_id', flat=True))
         cart.items.all().delete()
         if product_ids:
+            for product_id in product_ids:
+                release_hold(product_id, cart.user.pk)
             ProductReservation.objects.filter(user=cart.user, product_id__in=product_ids).delete()
 
         cart.refresh_from_db()
@@ -223,17 +259,15 @@ class ClearCartView(APIView):
 
 def validate_product_availability(product, user):
     """Check if product is available for purchase by this user."""
+    engine = get_reservation_engine()
+    if engine is not None:
+        # The engine counts the user's own hold as available to them.
+        return engine.available(product.pk, user.pk, product.quantity) > 0
+
+    # Releases any overdue reservations first, so is_active is exact.
     available_qty = get_available_quantity(product)
 
-    try:
-        user_reservation = ProductReservation.objects.get(
-            product=product,
-            user=user,
-            is_active=True
-        )
-        if not user_reservation.is_expired:
-            return True
-    except ProductReservation.DoesNotExist:
-        pass
+    if ProductReservation.objects.filter(product=product, user=user, is_active=True).exists():
+        return True
 
     return available_qty > 0
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""Precompiled fast path for hot read-only DRF serializers.
+
+``Serializer.to_representation`` resolves every field generically on every
+object: ``get_attribute`` walks ``source_attrs`` with Mapping/callable
+checks, builds an ``OrderedDict`` and dispatches ``to_representation``
+through the field. ``compile_serializer`` does that resolution once per
+serializer instance and generates one flat function with a straight line of
+attribute reads and conversions. Anything unusual (a missing relation, a
+callable source, ``source='*'``) drops back to the field's own DRF code, so
+the output is the same data in the same key order and renders to identical
+JSON.
+"""
+import datetime
+from functools import lru_cache
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
+from django.db import models
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+
+
+@lru_cache(maxsize=256)
+def _binder(serializer_class, layout):
+    """(serializer class, field layout) -> ``bind(*helpers) -> represent``.
+
+    The generated code only depends on the layout; the per-instance helpers
+    (method fields, converters, getters) are passed to ``bind``. Bounded,
+    since fieldset requests can produce many distinct layouts.
+    """
+    helpers, lines = [], []
+    for position, (name, kind, attr, converted) in enumerate(layout):
+        name = repr(name)
+        if kind == 'method':
+            helpers.append(f'm{position}')
+            lines.append(f'        data[{name}] = m{position}(instance)')
+            continue
+
+        value = f'c{position}(v)' if converted else 'v'
+        if converted:
+            helpers.append(f'c{position}')
+        if kind == 'attribute':
+            lines.append(f'        v = instance.{attr}')
+            lines.append(f'        data[{name}] = None if v is None else {value}')
+        else:
+            helpers.append(f'g{position}')
+            lines.extend([
+                '        try:',
+                f'            v = g{position}(instance)',
+                '        except SkipField:',
+                '            pass',
+                '        else:',
+                f'            data[{name}] = None if (v is None or (v.__class__ is PKOnlyObject and v.pk is None)) else {value}',
+            ])
+
+    source = '\n'.join([
+        f'def bind({", ".join(helpers)}):',
+        '    def represent(instance):',
+        '        data = {}',
+        *lines,
+        '        return data',
+        '    return represent',
+    ])
+    namespace = {'SkipField': SkipField, 'PKOnlyObject': PKOnlyObject}
+    exec(compile(source, f'<compiled {serializer_class.__name__}>', 'exec'), namespace)
+    return namespace['bind']
+
+
+def _datetime_converter(field):
+    """``DateTimeField.to_representation`` with the timezone lookup hoisted out."""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if field_timezone is None:
+        return field.to_representation
+    slow = field.to_representation
+
+    def convert(value):
+        if not isinstance(value, datetime.datetime) or value.tzinfo is None:
+            return slow(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _converter(field):
+    """The cheapest callable equivalent to ``field.to_representation``, or None for identity."""
+    field_type = type(field)
+    if field_type is serializers.ReadOnlyField:
+        return None
+    if field_type is serializers.CharField:
+        return str
+    if field_type is serializers.IntegerField:
+        return int
+    if field_type is serializers.DateTimeField:
+        return _datetime_converter(field)
+    if isinstance(field, serializers.ListSerializer):
+        child = compile_serializer(field.child)
+
+        def convert_many(value):
+            iterable = value.all() if isinstance(value, models.Manager) else value
+            return [child(item) for item in iterable]
+        return convert_many
+    if isinstance(field, serializers.Serializer):
+        return compile_serializer(field)
+    return field.to_representation
+
+
+def _is_concrete_attribute(serializer, field):
+    """True when the source is a plain (non-relation) column of the serializer's model."""
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None or len(field.source_attrs) != 1:
+        return False
+    try:
+        model_field = model._meta.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        return False
+    return model_field.concrete and not model_field.is_relation
+
+
+def _getter(field):
+    """Fast attribute getter with DRF's ``get_attribute`` as the fallback."""
+    if field.source == '*' or not field.source_attrs:
+        return field.get_attribute
+
+    fast = attrgetter('.'.join(field.source_attrs))
+    slow = field.get_attribute
+
+    def get(instance):
+        try:
+            value = fast(instance)
+        except (AttributeError, KeyError, ObjectDoesNotExist):
+            return slow(instance)
+        # Callable sources (methods) are called by DRF; let it handle them.
+        if callable(value) and not isinstance(value, models.Model):
+            return slow(instance)
+        return value
+    return get
+
+
+def compile_serializer(serializer):
+    """Compile a (bound) serializer instance into ``instance -> dict``.
+
+    Bind per request: converters capture the serializer context (e.g. the
+    request used for absolute image URLs) and the active timezone. The code
+    itself is generated once per serializer class and field layout.
+    """
+    layout, helpers = [], []
+    for field in serializer._readable_fields:
+        if isinstance(field, serializers.SerializerMethodField):
+            layout.append((field.field_name, 'method', None, False))
+            helpers.append(getattr(serializer, field.method_name))
+            continue
+
+        convert = _converter(field)
+        if convert is not None:
+            helpers.append(convert)
+        if _is_concrete_attribute(serializer, field):
+            layout.append((field.field_name, 'attribute', field.source_attrs[0], convert is not None))
+        else:
+            layout.append((field.field_name, 'getter', None, convert is not None))
+            helpers.append(_getter(field))
+    return _binder(type(serializer), tuple(layout))(*helpers)
+
+
+def fast_serializers_enabled():
+    return getattr(settings, 'FAST_SERIALIZERS_ENABLED', False)
+
+
+class FastListSerializer(serializers.ListSerializer):
+    """ListSerializer that renders its children through a compiled function."""
+
+    def to_representation(self, data):
+        if not fast_serializers_enabled():
+            return super().to_representation(data)
+        represent = compile_serializer(self.child)
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        return [represent(item) for item in iterable]
+
+
+class FastRepresentationMixin:
+    """Serializer mixin: single-object and ``many=True`` output use the compiled path.
+
+    Set ``Meta.list_serializer_class = FastListSerializer`` alongside it.
+    """
+
+    def to_representation(self, instance):
+        if not fast_serializers_enabled():
+            return super().to_representation(instance)
+        return compile_serializer(self)(instance)
@@ -0,0 +1,235 @@
+"""Sparse fieldsets for read endpoints: ``?fields=``, ``?omit=`` and ``?expand=``.
+
+All three take comma-separated field names; dotted names reach into nested
+serializers (``fields=id,title,brand.name``, ``expand=items.tshirt``).
+
+* ``fields`` keeps only the listed fields (a nested name keeps only its
+  listed sub-fields; a bare nested name keeps all of them).
+* ``omit`` drops the listed fields.
+* ``expand`` adds the serializer's ``Meta.expandable_fields``, which are left
+  out (or rendered as a plain id) by default.
+
+``SparseFieldsetMixin`` applies them to a serializer's fields, so the
+compiled fast path and DRF's own ``to_representation`` both only see the
+remaining fields. ``prune_queryset`` derives the matching ``only()`` /
+``select_related()`` / ``Prefetch`` from those fields, so a narrower
+response also reads fewer columns and joins fewer tables.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+EXPAND_PARAM = 'expand'
+# Serializer context key: path of a serializer built outside the field tree
+# (e.g. inside a SerializerMethodField), so it picks up the nested selection.
+PATH_CONTEXT_KEY = 'fieldset_path'
+
+
+def parse_fieldset(value):
+    """``'id,brand.name,brand.slug'`` -> ``{'id': {}, 'brand': {'name': {}, 'slug': {}}}``."""
+    tree = {}
+    for item in (value or '').split(','):
+        node = tree
+        for name in item.strip().split('.'):
+            if not name:
+                break
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _params(request):
+    """Parsed (fields, omit, expand) of a request, cached on it; fields is None when absent."""
+    if request is None:
+        return None, {}, {}
+    parsed = getattr(request, '_sparse_fieldset', None)
+    if parsed is None:
+        params = getattr(request, 'query_params', request.GET)
+        fields = params.get(FIELDS_PARAM)
+        parsed = (
+            parse_fieldset(fields) if fields else None,
+            parse_fieldset(params.get(OMIT_PARAM)),
+            parse_fieldset(params.get(EXPAND_PARAM)),
+        )
+        request._sparse_fieldset = parsed
+    return parsed
+
+
+def sparse_fieldset_requested(request):
+    """True when the request narrows the default fields (``fields`` or ``omit``)."""
+    fields, omit, _ = _params(request)
+    return fields is not None or bool(omit)
+
+
+def _subtree(tree, path):
+    """The selection below ``path``: None means "everything", {} means "nothing listed"."""
+    for name in path:
+        if name not in tree:
+            return {}
+        tree = tree[name]
+        if not tree:
+            return None
+    return tree
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin applying the request's ``fields``/``omit``/``expand``.
+
+    ``Meta.expandable_fields`` maps a field name to ``(serializer class or
+    dotted path, kwargs)``; the field is added (replacing any default field of
+    that name) when expanded. ``Meta.field_sources`` lists the model paths a
+    method field or property reads, for ``prune_queryset``.
+    """
+
+    def _fieldset_path(self):
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return tuple(node.context.get(PATH_CONTEXT_KEY, ())) + tuple(reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected, omit, expand = _params(self.context.get('request'))
+        path = self._fieldset_path()
+
+        expandable = getattr(getattr(self, 'Meta', None), 'expandable_fields', {})
+        expanded = _subtree(expand, path)
+        for name, (serializer_class, kwargs) in expandable.items():
+            if expanded is None or name not in expanded:
+                continue
+            if isinstance(serializer_class, str):
+                serializer_class = import_string(serializer_class)
+            fields[name] = serializer_class(**kwargs)
+
+        if selected is not None:
+            wanted = _subtree(selected, path)
+            if wanted:
+                fields = {name: field for name, field in fields.items() if name in wanted}
+        dropped = _subtree(omit, path)
+        if dropped:
+            fields = {name: field for name, field in fields.items() if dropped.get(name, True)}
+        return fields
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _resolve_path(model, path):
+    """Validate a ``__`` path and return the relations it traverses, or None if it is not a model path."""
+    relations = []
+    names = path.split('__')
+    for position, name in enumerate(names):
+        field = _model_field(model, name)
+        if field is None:
+            return None
+        if not field.is_relation:
+            return relations if position == len(names) - 1 else None
+        if field.many_to_many or field.one_to_many:
+            return None
+        if position < len(names) - 1 or field.auto_created:
+            # Traversed, or a reverse one-to-one that is read as a whole.
+            relations.append('__'.join(names[:position + 1]))
+        model = field.related_model
+    return relations
+
+
+def _field_paths(serializer, model):
+    """Columns, select_related paths and prefetches needed to render ``serializer``.
+
+    Returns None when a field's data dependencies are unknown.
+    """
+    meta = getattr(serializer, 'Meta', None)
+    field_sources = getattr(meta, 'field_sources', {})
+    columns, relations, prefetches = set(), set(), []
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in field_sources:
+            sources = field_sources[name]
+        elif isinstance(field, serializers.ListSerializer) and field.source_attrs:
+            relation = _model_field(model, field.source_attrs[0])
+            if relation is None or not (relation.one_to_many or relation.many_to_many):
+                return None
+            child = _field_paths(field.child, relation.related_model)
+            if child is None:
+                return None
+            child_columns, child_relations, child_prefetches = child
+            if relation.one_to_many:
+                child_columns.add(relation.field.name)
+            queryset = relation.related_model._default_manager.all()
+            prefetches.append(Prefetch(
+                field.source_attrs[0],
+                queryset=_apply(queryset, child_columns, child_relations, child_prefetches),
+            ))
+            continue
+        elif isinstance(field, serializers.Serializer) and field.source_attrs:
+            relation = _model_field(model, field.source_attrs[0])
+            if relation is None or not relation.is_relation or relation.many_to_many or relation.one_to_many:
+                return None
+            child = _field_paths(field, relation.related_model)
+            if child is None or child[2]:
+                return None
+            prefix = field.source_attrs[0]
+            relations.add(prefix)
+            columns.update(f'{prefix}__{column}' for column in child[0])
+            relations.update(f'{prefix}__{path}' for path in child[1])
+            continue
+        elif field.source != '*' and field.source_attrs:
+            sources = ['__'.join(field.source_attrs)]
+        else:
+            return None
+
+        for source in sources:
+            traversed = _resolve_path(model, source)
+            if traversed is None:
+                return None
+            relations.update(traversed)
+            head = _model_field(model, source.split('__')[0])
+            if not (head.is_relation and head.auto_created):
+                columns.add(source)
+    return columns, relations, prefetches
+
+
+def _apply(queryset, columns, relations, prefetches):
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if relations:
+        queryset = queryset.select_related(*sorted(relations))
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset.only(*sorted(columns | {queryset.model._meta.pk.name}))
+
+
+def prune_queryset(queryset, serializer):
+    """Narrow ``queryset`` to the columns and relations ``serializer`` will read.
+
+    Returns ``queryset`` unchanged when any field's dependencies are unknown.
+    """
+    paths = _field_paths(serializer, queryset.model)
+    if paths is None:
+        return queryset
+    return _apply(queryset, *paths)
+
+
+class SparseFieldsetViewMixin:
+    """View mixin: prune the queryset of reads to the requested fieldset, if one was requested.
+
+    Hooks ``filter_queryset`` rather than ``get_queryset`` so views that
+    build their own queryset are covered too.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in SAFE_METHODS and sparse_fieldset_requested(self.request):
+            queryset = prune_queryset(queryset, self.get_serializer())
+        return queryset
@@ -0,0 +1,169 @@
+"""Versioned cache for rendered API responses.
+
+Each model has a version counter in the cache that its save/delete signals
+bump once the write commits. Cached responses are keyed on the versions of the models they were
+built from, so a write makes every dependent entry unreachable at once and no
+key ever has to be deleted. Entries hold the rendered body bytes, so a hit is
+answered without touching the ORM, DRF or a serializer.
+
+Versions live in the default cache, so workers only see each other's bumps
+when that cache is shared (e.g. Redis or Memcached).
+"""
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+VERSION_KEY = 'model-version:{}'
+RESPONSE_KEY = 'response:{}'
+
+
+def _label(model):
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def model_versions(models):
+    """Current version of each model, initialising missing counters."""
+    keys = [VERSION_KEY.format(_label(model)) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seeded from the clock so an evicted counter never reuses an old version.
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_model_version(model):
+    """Invalidate every cached response built from ``model`` once the current transaction commits.
+
+    Bumping earlier would let a request that still reads the old rows cache
+    them under the new version, where they would stay until the next write.
+    """
+    key = VERSION_KEY.format(_label(model))
+    transaction.on_commit(lambda: _bump(key))
+
+
+def _etag(body):
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+
+def _not_modified(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return etag in (tag.strip() for tag in if_none_match.split(',')) or if_none_match.strip() == '*'
+
+
+def _cacheable_request(request):
+    # The browsable API renders HTML per user; only plain JSON is cached.
+    return request.method in ('GET', 'HEAD') and 'text/html' not in request.META.get('HTTP_ACCEPT', '')
+
+
+def _request_signature(request):
+    """Path plus query params in sorted order, so reordered params share an entry."""
+    return f'{request.path}?{urlencode(sorted(request.GET.lists()), doseq=True)}'
+
+
+def _render_for_cache(response):
+    """Render a view's response and return a cache entry, or None if it shouldn't be cached."""
+    if hasattr(response, 'render'):
+        response.render()
+    content_type = response.get('Content-Type', '')
+    if response.status_code != 200 or not content_type.startswith('application/json'):
+        return None
+    return content_type, bytes(response.content), _etag(response.content)
+
+
+def cache_response(*models, timeout=None):
+    """Cache a GET endpoint's rendered JSON until any of ``models`` changes.
+
+    Apply it outside ``@api_view`` (or with ``method_decorator`` on
+    ``dispatch``) so hits return before DRF sees the request. Responses carry
+    an ETag, and ``If-None-Match`` is answered with a 304.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+
+            versions = ':'.join(str(version) for version in model_versions(models))
+            raw_key = f'{versions}:{request.get_host()}:{_request_signature(request)}'
+            key = RESPONSE_KEY.format(hashlib.md5(raw_key.encode('utf-8')).hexdigest())
+
+            entry = cache.get(key)
+            if entry is None:
+                response = view_func(request, *args, **kwargs)
+                entry = _render_for_cache(response)
+                if entry is None:
+                    return response
+                cache.set(key, entry, timeout if timeout is not None else settings.RESPONSE_CACHE_TIMEOUT)
+
+            content_type, body, etag = entry
+            if _not_modified(request, etag):
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(body, content_type=content_type)
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Accept',))
+            return response
+        return wrapped
+    return decorator
+
+
+def conditional_response(get_validators, cache_enabled=None, timeout=None):
+    """Answer conditional GETs from cheap validators before the view runs.
+
+    ``get_validators(request, *args, **kwargs)`` returns ``(etag, last_modified)``
+    or None to run the view unconditionally (e.g. for a 404). A matching
+    ``If-None-Match``/``If-Modified-Since`` gets a 304 without the view being
+    called. When ``cache_enabled()`` is true, rendered bodies are also cached
+    under the ETag, so a changed validator is also a cache miss.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+            validators = get_validators(request, *args, **kwargs)
+            if validators is None:
+                return view_func(request, *args, **kwargs)
+
+            etag, last_modified = validators
+            response = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+            if response is None:
+                use_cache = cache_enabled is not None and cache_enabled()
+                key = None
+                if use_cache:
+                    raw_key = f'{etag}:{request.get_host()}:{request.get_full_path()}'
+                    key = RESPONSE_KEY.format(hashlib.md5(raw_key.encode('utf-8')).hexdigest())
+                entry = cache.get(key) if use_cache else None
+                if entry is not None:
+                    response = HttpResponse(entry[1], content_type=entry[0])
+                else:
+                    response = view_func(request, *args, **kwargs)
+                    entry = _render_for_cache(response) if use_cache else None
+                    if entry is not None:
+                        cache.set(key, entry, timeout if timeout is not None else settings.RESPONSE_CACHE_TIMEOUT)
+                    if response.status_code != 200:
+                        return response
+
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+            patch_vary_headers(response, ('Accept',))
+            return response
+        return wrapped
+    return decorator
@@ -9,6 +9,7 @@ from .models import Order, OrderItem, ReturnRequest
 from .serializers import OrderSerializer
 from apps.products.models import TShirt
 from apps.products.serializers import TShirtListSerializer, TShirtDetailSerializer
+from apps.products.stock import set_stock
 from django.utils.text import slugify
 from .refunds import refund_manager
 from .analytics import OrderAnalytics
@@ -114,6 +115,14 @@ class AdminProductViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
+    def perform_update(self, serializer):
+        # Save everything but the quantity, which goes through the stock journal.
+        quantity = serializer.validated_data.pop('quantity', None)
+        product = serializer.save()
+        if quantity is not None and quantity != product.quantity:
+            set_stock(product, quantity, reference=f'admin:{self.request.user.username}')
+            product.quantity, product.is_available = quantity, quantity > 0
+    
     @action(detail=True, methods=['post'])
     def update_stock(self, request, pk=None):
         """Update product stock."""
@@ -123,11 +132,16 @@ class AdminProductViewSet(viewsets.ModelViewSet):
         if quantity is None:
             return Response({'error': 'Quantity required'}, status=400)
         
-        product.quantity = int(quantity)
-        product.is_available = product.quantity > 0
-        product.save()
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            quantity = -1
+        if quantity < 0:
+            return Response({'error': 'Quantity must be a non-negative integer'}, status=400)
+        
+        movement = set_stock(product, quantity, reference=f'admin:{request.user.username}')
         
-        return Response({'status': 'updated', 'quantity': product.quantity})
+        return Response({'status': 'updated', 'quantity': movement.quantity_after})
 
 class AdminReturnViewSet(viewsets.ModelViewSet):
     """Admin-only return request management."""
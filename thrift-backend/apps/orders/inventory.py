@@ -1,45 +1,56 @@
 from django.db import transaction
 from apps.products.models import TShirt
+from apps.products.reservation_engine import get_reservation_engine, release_hold
+from apps.products.stock import move_stock, recorded_keys
 
 class InventoryManager:
     """Manages inventory operations to prevent overselling."""
     
     @staticmethod
     @transaction.atomic
-    def reserve_stock(product_id, quantity):
-        """Reserve stock for a product. Returns True if successful."""
+    def reserve_stock(product_id, quantity, user_id=None, idempotency_key=None):
+        """Reserve stock for a product. Returns True if successful.
+
+        Recorded as a ``sale`` stock movement; a repeated ``idempotency_key``
+        (see ``order_item_key``) succeeds without taking the stock again.
+        Pass the buyer's ``user_id`` to release their reservation hold, now
+        that the sale has taken the stock it was holding.
+        """
         try:
-            product = TShirt.objects.select_for_update().get(id=product_id)
-            
-            if product.quantity >= quantity and product.is_available:
-                product.quantity -= quantity
-                if product.quantity == 0:
-                    product.is_available = False
-                product.save()
-                return True, None
-            return False, "Insufficient stock"
+            product = TShirt.objects.get(id=product_id)
         except TShirt.DoesNotExist:
             return False, "Product not found"
+
+        if idempotency_key is None or not recorded_keys([idempotency_key]):
+            if product.quantity < quantity or not product.is_available:
+                return False, "Insufficient stock"
+            # Checked again under the row lock when applied; a racing sale may have taken the stock.
+            if move_stock(product_id, -quantity, 'sale', idempotency_key=idempotency_key) is None:
+                return False, "Insufficient stock"
+        if user_id is not None:
+            release_hold(product_id, user_id)
+        return True, None
     
     @staticmethod
     @transaction.atomic
-    def release_stock(product_id, quantity):
-        """Release reserved stock back to inventory."""
-        try:
-            product = TShirt.objects.select_for_update().get(id=product_id)
-            product.quantity += quantity
-            if product.quantity > 0:
-                product.is_available = True
-            product.save()
-            return True
-        except TShirt.DoesNotExist:
+    def release_stock(product_id, quantity, idempotency_key=None):
+        """Release reserved stock back to inventory, as a ``return`` stock movement."""
+        if not TShirt.objects.filter(id=product_id).exists():
             return False
+        move_stock(product_id, quantity, 'return', idempotency_key=idempotency_key)
+        return True
     
     @staticmethod
-    def check_availability(product_id, quantity):
-        """Check if product has sufficient stock."""
+    def check_availability(product_id, quantity, user_id=None):
+        """Check if product has sufficient stock.
+
+        With a reservation engine, stock held by other shoppers doesn't count.
+        """
         try:
             product = TShirt.objects.get(id=product_id)
+            engine = get_reservation_engine()
+            if engine is not None:
+                return product.is_available and engine.available(product_id, user_id, product.quantity) >= quantity
             return product.is_available and product.quantity >= quantity
         except TShirt.DoesNotExist:
             return False
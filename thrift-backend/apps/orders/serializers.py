@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from decimal import Decimal, InvalidOperation
 from django.db import transaction
+from apps.common.fieldsets import SparseFieldsetMixin
 from .models import Order, OrderItem
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Order item serializer."""
 
     class Meta:
@@ -12,8 +13,15 @@ class OrderItemSerializer(serializers.ModelSerializer):
             'id', 'tshirt', 'quantity', 'price', 'total_price',
             'product_title', 'product_brand', 'product_size', 'product_color'
         ]
-
-class OrderSerializer(serializers.ModelSerializer):
+        # ``tshirt`` is the product id unless expanded to the product itself.
+        expandable_fields = {
+            'tshirt': ('apps.products.serializers.TShirtListSerializer', {'read_only': True}),
+        }
+        field_sources = {
+            'total_price': ['quantity', 'price'],
+        }
+
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Order serializer."""
     items = OrderItemSerializer(many=True, read_only=True)
 
@@ -186,19 +194,15 @@ class CreateOrderSerializer(serializers.ModelSerializer):
             )
 
             # Create order items and reduce product quantities
-            from apps.products.models import TShirt
+            from apps.products.models import StockMovement, TShirt
+            from apps.products.stock import order_item_key, record_stock_movements
+            sales = []
             for item_data in order_items_data:
                 try:
                     tshirt = TShirt.objects.get(id=item_data['product'])
                     quantity_ordered = item_data['quantity']
 
-                    # Reduce product quantity
-                    tshirt.quantity = max(0, tshirt.quantity - quantity_ordered)
-                    # Update is_available status
-                    tshirt.is_available = tshirt.quantity > 0
-                    tshirt.save(update_fields=['quantity', 'is_available', 'updated_at'])
-
-                    OrderItem.objects.create(
+                    item = OrderItem.objects.create(
                         order=order,
                         tshirt=tshirt,
                         quantity=quantity_ordered,
@@ -208,6 +212,14 @@ class CreateOrderSerializer(serializers.ModelSerializer):
                         product_size=tshirt.size,
                         product_color=tshirt.color
                     )
+                    # Reduce product quantity; payment confirmation reuses the key and takes no more
+                    sales.append(StockMovement(
+                        product=tshirt,
+                        kind='sale',
+                        delta=-quantity_ordered,
+                        idempotency_key=order_item_key(item),
+                        reference=order.order_number,
+                    ))
                 except TShirt.DoesNotExist:
                     # Create item with stored product data if product doesn't exist
                     OrderItem.objects.create(
@@ -220,6 +232,13 @@ class CreateOrderSerializer(serializers.ModelSerializer):
                         product_size=item_data.get('size', 'N/A'),
                         product_color=item_data.get('color', 'N/A')
                     )
+            recorded = record_stock_movements(sales)
+            short = [sale.product.title for sale in sales if sale.idempotency_key not in recorded]
+            if short:
+                # Rolls back the order: the stock was taken by another order first.
+                raise serializers.ValidationError(
+                    {'order_items': [f"Insufficient stock for '{title}'" for title in short]}
+                )
 
         return order
 
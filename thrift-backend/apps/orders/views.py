@@ -24,11 +24,13 @@ from .serializers import (
 )
 from apps.cart.models import Cart
 from .models import Order, OrderItem
+from apps.products.stock import order_item_key
 from apps.products.utils import reduce_inventory_for_order
+from apps.common.fieldsets import SparseFieldsetViewMixin
 from .inventory import InventoryManager
 from apps.common.validators import validate_email, validate_phone, validate_pincode, sanitize_html
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """Order viewset with Razorpay payment integration."""
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
@@ -300,7 +302,9 @@ class OrderViewSet(viewsets.ModelViewSet):
 
                 # Reduce product inventory using InventoryManager
                 for item in order.items.all():
-                    success, error = InventoryManager.reserve_stock(item.tshirt.id, item.quantity)
+                    success, error = InventoryManager.reserve_stock(
+                        item.tshirt.id, item.quantity, user_id=order.user_id, idempotency_key=order_item_key(item)
+                    )
                     if not success:
                         print(f"Warning: Inventory update failed for {item.product_title}: {error}")
 
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import Brand, Category, TShirt, TShirtReview, ShippingZone, ShippingMethod, ShippingRate
+from .stock import save_product
 
 @admin.register(Brand)
 class BrandAdmin(admin.ModelAdmin):
@@ -84,6 +85,10 @@ class TShirtAdmin(admin.ModelAdmin):
         }),
     )
     
+    def save_model(self, request, obj, form, change):
+        # Quantity edits go through the stock journal as admin adjustments.
+        save_product(obj, reference=f'admin:{request.user.username}')
+
     def image_preview(self, obj):
         if obj.primary_image:
             return format_html(
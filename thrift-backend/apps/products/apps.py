@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ProductsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.products'
+    label = 'products'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,352 @@
+"""In-process autocomplete index for search suggestions.
+
+Suggestions are brand, category, color, tag and title values of available
+products, each carrying its live product count. Lookups match the start of any
+word of a value through a sorted prefix list, and fall back to trigram
+similarity so small typos ("adiddas", "harly") still find something.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+TYPE_ORDER = ('brand', 'category', 'color', 'tag', 'title')
+TYPE_LABELS = {
+    'brand': 'Brand',
+    'category': 'Category',
+    'color': 'Color',
+    'tag': 'Tag',
+    'title': 'Product',
+}
+# Titles are too many and too long for typo matching to stay cheap or useful.
+FUZZY_TYPES = frozenset({'brand', 'category', 'color', 'tag'})
+
+ROW_FIELDS = ('id', 'title', 'color', 'tags', 'brand__name', 'category__name')
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall(text.lower())) if text else ''
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two leading and one trailing space."""
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def row_from_tshirt(tshirt):
+    """Build the ROW_FIELDS tuple for a TShirt instance."""
+    category = tshirt.category
+    return (
+        tshirt.pk, tshirt.title, tshirt.color, tshirt.tags,
+        tshirt.brand.name, category.name if category else None,
+    )
+
+
+class SuggestionIndex:
+    """Suggestion values with live product counts.
+
+    ``entries`` maps (type, normalized value) -> [display value, count] and
+    ``product_keys`` keeps each product's entries so updates only touch what
+    changed. Prefix lookups use sorted lists of (word-start suffix, key)
+    pairs, maintained in place so writes never trigger a full re-sort.
+
+    Facet values (brands, categories, colors, tags) are few and ranked over
+    every prefix match. Titles are one per product, so they only fill the
+    remaining slots from a bounded scan of the title list.
+    """
+    min_similarity = 0.3
+    title_scan_limit = 50
+    cache_size = 1024
+
+    def __init__(self):
+        self.entries = {}
+        self.product_keys = {}
+        self.synced_at = None
+        self._facet_prefixes = []
+        self._title_prefixes = []
+        self._deferred_sort = False
+        self._trigrams = {}
+        self._term_keys = {}
+        self._cache = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, product_id):
+        return product_id in self.product_keys
+
+    # Mutation
+
+    @staticmethod
+    def _row_values(row):
+        _, title, color, tags, brand_name, category_name = row
+        values = [('brand', brand_name), ('category', category_name), ('color', color), ('title', title)]
+        values.extend(('tag', tag.strip()) for tag in (tags or '').split(','))
+        keys = {}
+        for kind, value in values:
+            norm = normalize(value)
+            if norm:
+                keys.setdefault((kind, norm), value.strip())
+        return keys
+
+    def add_row(self, row):
+        """Index (or re-index) a product given its ROW_FIELDS tuple."""
+        product_id = row[0]
+        keys = self._row_values(row)
+        with self._lock:
+            old_keys = self.product_keys.get(product_id, ())
+            if set(old_keys) == set(keys):
+                return
+            self._release(old_keys)
+            for key, display in keys.items():
+                entry = self.entries.get(key)
+                if entry is None:
+                    self.entries[key] = [display, 1]
+                    self._insert_entry(key)
+                else:
+                    entry[1] += 1
+            self.product_keys[product_id] = tuple(keys)
+            self._cache.clear()
+
+    def add_tshirt(self, tshirt):
+        self.add_row(row_from_tshirt(tshirt))
+
+    def remove(self, product_id):
+        with self._lock:
+            keys = self.product_keys.pop(product_id, None)
+            if keys:
+                self._release(keys)
+                self._cache.clear()
+
+    def _release(self, keys):
+        for key in keys:
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self.entries[key]
+                self._delete_entry(key)
+
+    def _suffixes(self, key):
+        words = key[1].split()
+        return [' '.join(words[i:]) for i in range(len(words))]
+
+    def _terms(self, key):
+        words = key[1].split()
+        return set(words) | {key[1]}
+
+    def _prefix_list(self, key):
+        return self._title_prefixes if key[0] == 'title' else self._facet_prefixes
+
+    def _insert_entry(self, key):
+        prefixes = self._prefix_list(key)
+        for suffix in self._suffixes(key):
+            if self._deferred_sort:
+                prefixes.append((suffix, key))
+            else:
+                bisect.insort(prefixes, (suffix, key))
+        if key[0] in FUZZY_TYPES:
+            for term in self._terms(key):
+                holders = self._term_keys.setdefault(term, set())
+                if not holders:
+                    for gram in trigrams(term):
+                        self._trigrams.setdefault(gram, set()).add(term)
+                holders.add(key)
+
+    def _delete_entry(self, key):
+        prefixes = self._prefix_list(key)
+        for suffix in self._suffixes(key):
+            position = bisect.bisect_left(prefixes, (suffix, key))
+            if position < len(prefixes) and prefixes[position] == (suffix, key):
+                del prefixes[position]
+        if key[0] in FUZZY_TYPES:
+            for term in self._terms(key):
+                holders = self._term_keys.get(term)
+                if holders is None:
+                    continue
+                holders.discard(key)
+                if not holders:
+                    del self._term_keys[term]
+                    for gram in trigrams(term):
+                        terms = self._trigrams.get(gram)
+                        if terms is not None:
+                            terms.discard(term)
+                            if not terms:
+                                del self._trigrams[gram]
+
+    # Query
+
+    def _rank_key(self, key):
+        return (-self.entries[key][1], TYPE_ORDER.index(key[0]), key[1])
+
+    @staticmethod
+    def _prefix_matches(prefixes, query, scan_limit=None):
+        start = bisect.bisect_left(prefixes, (query,))
+        stop = len(prefixes) if scan_limit is None else min(len(prefixes), start + scan_limit)
+        matches = set()
+        for position in range(start, stop):
+            suffix, key = prefixes[position]
+            if not suffix.startswith(query):
+                break
+            matches.add(key)
+        return matches
+
+    def _fuzzy_matches(self, query, exclude):
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        overlaps = {}
+        for gram in query_grams:
+            for term in self._trigrams.get(gram, ()):
+                overlaps[term] = overlaps.get(term, 0) + 1
+
+        similarities = {}
+        for term, overlap in overlaps.items():
+            similarity = overlap / (len(query_grams) + len(trigrams(term)) - overlap)
+            if similarity < self.min_similarity:
+                continue
+            for key in self._term_keys[term]:
+                if key not in exclude and similarity > similarities.get(key, 0):
+                    similarities[key] = similarity
+        return sorted(similarities, key=lambda key: (-similarities[key],) + self._rank_key(key))
+
+    def suggest(self, query, limit=10):
+        """Best suggestions for a partial query.
+
+        Facet prefix matches come first, ranked by live product count, then
+        title prefix matches; trigram matches fill any remaining slots,
+        ranked by similarity.
+
+        Returns:
+            list: dicts with ``type``, ``value``, ``label`` and ``count``
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        with self._lock:
+            cached = self._cache.get((query, limit))
+            if cached is not None:
+                return cached
+
+            prefix_keys = self._prefix_matches(self._facet_prefixes, query)
+            keys = heapq.nsmallest(limit, prefix_keys, key=self._rank_key)
+            if len(keys) < limit:
+                titles = self._prefix_matches(self._title_prefixes, query, self.title_scan_limit)
+                keys.extend(heapq.nsmallest(limit - len(keys), titles, key=self._rank_key))
+            if len(keys) < limit and len(query) >= 3:
+                keys.extend(self._fuzzy_matches(query, prefix_keys)[:limit - len(keys)])
+
+            suggestions = []
+            for kind, norm in keys:
+                display, count = self.entries[(kind, norm)]
+                label_value = display.title() if kind == 'color' else display
+                suggestions.append({
+                    'type': kind,
+                    'value': display,
+                    'label': f"{TYPE_LABELS[kind]}: {label_value}",
+                    'count': count,
+                })
+
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[(query, limit)] = suggestions
+            return suggestions
+
+    # Database sync
+
+    def refresh_products(self, product_ids):
+        """Re-read the given products from the database."""
+        from .models import TShirt
+
+        product_ids = set(product_ids)
+        rows = TShirt.objects.filter(id__in=product_ids, is_available=True).values_list(*ROW_FIELDS)
+        for row in rows:
+            self.add_row(row)
+            product_ids.discard(row[0])
+        for product_id in product_ids:
+            self.remove(product_id)
+
+    def sync(self, full=False, batch_size=2000):
+        """Catch the index up with the available TShirt rows.
+
+        Same strategy as SearchIndex.sync: drop products no longer available,
+        then re-read rows changed since the last sync or missing from the index.
+        """
+        from .models import TShirt
+
+        started = timezone.now()
+        available = TShirt.objects.filter(is_available=True)
+        available_ids = set(available.values_list('id', flat=True))
+
+        with self._lock:
+            for product_id in [pid for pid in self.product_keys if pid not in available_ids]:
+                self.remove(product_id)
+            missing = available_ids.difference(self.product_keys)
+
+            # Filling an empty index: append everything and sort once at the end.
+            self._deferred_sort = not self.entries
+            try:
+                changed = available
+                if not full and self.synced_at is not None:
+                    changed = changed.filter(updated_at__gte=self.synced_at)
+                for row in changed.values_list(*ROW_FIELDS).iterator(chunk_size=batch_size):
+                    self.add_row(row)
+                    missing.discard(row[0])
+
+                if missing:
+                    rows = available.filter(id__in=missing).values_list(*ROW_FIELDS)
+                    for row in rows.iterator(chunk_size=batch_size):
+                        self.add_row(row)
+            finally:
+                if self._deferred_sort:
+                    self._facet_prefixes.sort()
+                    self._title_prefixes.sort()
+                    self._deferred_sort = False
+
+        self.synced_at = started
+        return len(self)
+
+
+_index = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_suggestion_index():
+    """Process-wide suggestion index, built on first use and kept in sync like the search index."""
+    global _index, _index_checked_at
+
+    refresh_seconds = getattr(settings, 'CATALOG_SEARCH_REFRESH_SECONDS', 60)
+    with _index_lock:
+        if _index is None:
+            _index = SuggestionIndex()
+            _index.sync(full=True)
+            _index_checked_at = time.monotonic()
+        elif refresh_seconds and time.monotonic() - _index_checked_at > refresh_seconds:
+            _index.sync()
+            _index_checked_at = time.monotonic()
+        return _index
+
+
+def loaded_suggestion_index():
+    """The process index if it has been built, without building it."""
+    return _index
+
+
+def reset_suggestion_index():
+    global _index
+    with _index_lock:
+        _index = None
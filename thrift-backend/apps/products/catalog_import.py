@@ -0,0 +1,397 @@
+"""Streaming bulk import of TShirt rows from CSV or JSON Lines.
+
+Rows are read one at a time, validated against the model fields and
+inserted with ``bulk_create`` in fixed-size batches, each in its own
+transaction, so memory stays bounded by the batch size whatever the file
+size. Brands and categories are resolved through in-memory name/slug maps
+(missing ones are created once). Rows that fail validation are written to a
+reject file with the reason, and the rest of the batch still goes in.
+
+``bulk_create`` bypasses the TShirt signals, so after each batch the
+importer refreshes the listing read model and tag links, journals the
+opening stock as ``import`` movements and renders image variants itself,
+and bumps the TShirt response-cache version at the end.
+"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+import requests
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.utils.text import slugify
+
+from apps.common.response_cache import bump_model_version
+
+from .images import IMAGE_FIELDS, generate_image_variants
+from .models import Brand, Category, TShirt
+from .read_model import refresh_listings
+from .stock import record_opening_stock
+from .tags import refresh_tshirt_tags
+
+RELATION_COLUMNS = ('brand', 'category')
+TRUE_VALUES = frozenset({'1', 'true', 't', 'yes', 'y'})
+FALSE_VALUES = frozenset({'0', 'false', 'f', 'no', 'n', ''})
+# Columns the importer fills itself or that cannot come from a supplier file.
+EXCLUDED_FIELDS = frozenset({
+    'id', 'created_at', 'updated_at', 'image_variants',
+    'condition_verifier', 'condition_verified_at',
+})
+
+
+class RowError(Exception):
+    """A row that cannot be imported; the message goes to the reject file."""
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    imported: int = 0
+    rejected: int = 0
+    batches: int = 0
+    brands_created: int = 0
+    categories_created: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+
+def read_rows(path, file_format=None):
+    """Yield (row dict, parse error or None) from a CSV or JSONL file, one row at a time."""
+    file_format = file_format or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        if file_format == 'csv':
+            for row in csv.DictReader(handle):
+                yield row, None
+        else:
+            for line_number, line in enumerate(handle, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    yield {'_line': line.rstrip('\n')}, f'line {line_number}: invalid JSON ({exc})'
+                    continue
+                if not isinstance(row, dict):
+                    yield {'_line': line.rstrip('\n')}, f'line {line_number}: expected a JSON object'
+                    continue
+                yield row, None
+
+
+class RejectWriter:
+    """Append rejected rows and their error to a CSV or JSONL file, opened lazily."""
+
+    def __init__(self, path):
+        self.path = path
+        self.jsonl = path.endswith(('.jsonl', '.ndjson'))
+        self._handle = None
+        self._writer = None
+
+    def write(self, row, error):
+        if self._handle is None:
+            self._handle = open(self.path, 'w', newline='', encoding='utf-8')
+        if self.jsonl:
+            self._handle.write(json.dumps({**row, 'error': error}, default=str) + '\n')
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(
+                self._handle, fieldnames=list(row) + ['error'], extrasaction='ignore', restval=''
+            )
+            self._writer.writeheader()
+        self._writer.writerow({**row, 'error': error})
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+
+
+class CatalogImporter:
+    """Validate and insert catalog rows in batches.
+
+    Args:
+        batch_size: rows per ``bulk_create`` and transaction
+        image_root: directory that relative image paths in the file resolve against
+        image_workers: threads copying images into storage concurrently
+        create_missing: create unknown brands/categories instead of rejecting the row
+        render_variants: render image variants for each imported batch
+        dry_run: validate everything but write nothing
+        rejects: RejectWriter for rows that fail, or None
+        on_batch: called with the running ImportStats after each batch
+    """
+
+    def __init__(self, batch_size=500, image_root=None, image_workers=8, create_missing=True,
+                 render_variants=True, dry_run=False, rejects=None, on_batch=None):
+        self.batch_size = batch_size
+        self.image_root = image_root
+        self.image_workers = image_workers
+        self.create_missing = create_missing
+        self.render_variants = render_variants
+        self.dry_run = dry_run
+        self.rejects = rejects
+        self.on_batch = on_batch
+        self.stats = ImportStats()
+
+        self.fields = {
+            model_field.name: model_field
+            for model_field in TShirt._meta.concrete_fields
+            if model_field.name not in EXCLUDED_FIELDS and model_field.name not in RELATION_COLUMNS
+            and model_field.name not in IMAGE_FIELDS
+        }
+        self.choices = {
+            name: self._choice_lookup(model_field)
+            for name, model_field in self.fields.items() if model_field.choices
+        }
+        self.brands = self._relation_map(Brand)
+        self.categories = self._relation_map(Category)
+
+    # Lookups
+
+    @staticmethod
+    def _normalize(value):
+        return slugify(str(value)).replace('-', '_')
+
+    def _choice_lookup(self, model_field):
+        lookup = {}
+        for value, label in model_field.flatchoices:
+            lookup[self._normalize(label)] = value
+            lookup[self._normalize(label.split(' - ')[0])] = value
+            lookup[self._normalize(value)] = value
+        return lookup
+
+    def _relation_map(self, model):
+        lookup = {}
+        for pk, name, slug in model.objects.values_list('pk', 'name', 'slug'):
+            lookup[name.strip().lower()] = pk
+            lookup[slug] = pk
+        return lookup
+
+    def _resolve(self, model, lookup, value):
+        key = str(value).strip()
+        pk = lookup.get(key.lower()) or lookup.get(slugify(key))
+        if pk is not None:
+            return pk
+        if not self.create_missing:
+            raise RowError(f'unknown {model._meta.model_name} "{key}"')
+        if self.dry_run:
+            return -1
+        instance, created = model.objects.get_or_create(slug=slugify(key)[:100], defaults={'name': key[:100]})
+        if created:
+            if model is Brand:
+                self.stats.brands_created += 1
+            else:
+                self.stats.categories_created += 1
+        lookup[key.lower()] = lookup[instance.slug] = instance.pk
+        return instance.pk
+
+    # Row conversion
+
+    def _convert(self, name, model_field, raw):
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if isinstance(model_field, models.BooleanField):
+            text = str(raw).lower()
+            if text in TRUE_VALUES or raw is True:
+                return True
+            if text in FALSE_VALUES or raw is False:
+                return False
+            raise RowError(f'{name}: not a boolean ("{raw}")')
+        if raw in ('', None) and model_field.null:
+            return None
+        if name in self.choices and raw not in ('', None):
+            value = self.choices[name].get(self._normalize(raw))
+            if value is None:
+                raise RowError(f'{name}: unknown choice "{raw}"')
+            raw = value
+        try:
+            return model_field.clean(raw, None)
+        except ValidationError as exc:
+            raise RowError(f'{name}: {" ".join(exc.messages)}') from None
+
+    def build(self, row):
+        """Turn a row dict into an unsaved TShirt plus its image references."""
+        if None in row:
+            raise RowError('more values than header columns')
+        unknown = set(row) - set(self.fields) - set(RELATION_COLUMNS) - set(IMAGE_FIELDS)
+        if unknown:
+            raise RowError(f'unknown columns: {", ".join(sorted(unknown))}')
+
+        values = {}
+        for name, model_field in self.fields.items():
+            raw = row.get(name)
+            if raw is None or raw == '':
+                if name == 'slug':
+                    # Generated from the title once the batch is known.
+                    continue
+                if model_field.has_default():
+                    values[name] = model_field.get_default()
+                    continue
+                raw = ''
+            values[name] = self._convert(name, model_field, raw)
+
+        if not row.get('brand'):
+            raise RowError('brand: This field cannot be blank.')
+        values['brand_id'] = self._resolve(Brand, self.brands, row['brand'])
+        if row.get('category'):
+            values['category_id'] = self._resolve(Category, self.categories, row['category'])
+
+        images = {name: str(row[name]).strip() for name in IMAGE_FIELDS if row.get(name)}
+        if 'primary_image' not in images:
+            raise RowError('primary_image: This field cannot be blank.')
+        return TShirt(**values), images
+
+    # Images
+
+    def _store_image(self, name, reference):
+        """Copy one image (local path or http(s) URL) into storage and return its name."""
+        upload_to = TShirt._meta.get_field(name).upload_to
+        if reference.startswith(('http://', 'https://')):
+            # RequestException subclasses OSError, so failures reject the row.
+            response = requests.get(reference, timeout=30)
+            response.raise_for_status()
+            filename = os.path.basename(urlparse(reference).path) or 'image.jpg'
+            return default_storage.save(os.path.join(upload_to, filename), ContentFile(response.content))
+        path = reference if os.path.isabs(reference) or not self.image_root else os.path.join(self.image_root, reference)
+        with open(path, 'rb') as handle:
+            return default_storage.save(os.path.join(upload_to, os.path.basename(path)), File(handle))
+
+    def _store_images(self, pending, executor):
+        """Copy every image of the batch into storage concurrently.
+
+        Returns:
+            list: (row, tshirt, stored names) for rows whose images were all stored
+        """
+        futures = [
+            (row, tshirt, {name: executor.submit(self._store_image, name, ref) for name, ref in images.items()})
+            for row, tshirt, images in pending
+        ]
+        ready = []
+        for row, tshirt, image_futures in futures:
+            stored, errors = {}, []
+            for name, future in image_futures.items():
+                try:
+                    stored[name] = future.result()
+                except OSError as exc:
+                    errors.append(f'{name}: {getattr(exc, "strerror", None) or exc}')
+            if errors:
+                for stored_name in stored.values():
+                    default_storage.delete(stored_name)
+                self.reject(row, '; '.join(errors))
+                continue
+            for name, stored_name in stored.items():
+                setattr(tshirt, name, stored_name)
+            ready.append((row, tshirt, stored))
+        return ready
+
+    # Slugs
+
+    def _assign_slugs(self, ready):
+        """Give rows unique slugs: explicit duplicates are rejected, generated ones get a suffix."""
+        explicit = [tshirt.slug for _, tshirt, _ in ready if tshirt.slug]
+        taken = set(TShirt.objects.filter(slug__in=explicit).values_list('slug', flat=True))
+        kept = []
+        for row, tshirt, stored in ready:
+            if tshirt.slug:
+                if tshirt.slug in taken:
+                    self._discard(row, stored, f'slug: "{tshirt.slug}" already exists')
+                    continue
+                taken.add(tshirt.slug)
+            kept.append((row, tshirt, stored))
+
+        pending = [tshirt for _, tshirt, _ in kept if not tshirt.slug]
+        bases = {id(tshirt): slugify(tshirt.title)[:190] or 'tshirt' for tshirt in pending}
+        attempt = {id(tshirt): 1 for tshirt in pending}
+        while pending:
+            candidates = {}
+            for tshirt in pending:
+                n = attempt[id(tshirt)]
+                candidates[id(tshirt)] = bases[id(tshirt)] if n == 1 else f'{bases[id(tshirt)]}-{n}'
+            taken |= set(TShirt.objects.filter(slug__in=candidates.values()).values_list('slug', flat=True))
+            retry = []
+            for tshirt in pending:
+                candidate = candidates[id(tshirt)]
+                if candidate in taken:
+                    attempt[id(tshirt)] += 1
+                    retry.append(tshirt)
+                else:
+                    tshirt.slug = candidate
+                    taken.add(candidate)
+            pending = retry
+        return kept
+
+    # Batches
+
+    def reject(self, row, error):
+        self.stats.rejected += 1
+        if self.rejects is not None:
+            self.rejects.write({key: value for key, value in row.items() if key is not None}, error)
+
+    def _discard(self, row, stored, error):
+        for stored_name in stored.values():
+            default_storage.delete(stored_name)
+        self.reject(row, error)
+
+    def _flush(self, pending, executor):
+        if not pending:
+            return
+        self.stats.batches += 1
+        self._insert(pending, executor)
+        if self.on_batch is not None:
+            self.on_batch(self.stats)
+
+    def _insert(self, pending, executor):
+        if self.dry_run:
+            self.stats.imported += len(pending)
+            return
+
+        ready = self._assign_slugs(self._store_images(pending, executor))
+        tshirts = [tshirt for _, tshirt, _ in ready]
+        try:
+            with transaction.atomic():
+                TShirt.objects.bulk_create(tshirts, batch_size=self.batch_size)
+                imported = TShirt.objects.filter(pk__in=[tshirt.pk for tshirt in tshirts])
+                refresh_listings(imported)
+                refresh_tshirt_tags(imported)
+                record_opening_stock(tshirts)
+        except Exception as exc:
+            for row, _, stored in ready:
+                self._discard(row, stored, f'batch failed: {exc}')
+            return
+        self.stats.imported += len(tshirts)
+        if self.render_variants:
+            generate_image_variants(tshirts)
+
+    def run(self, rows):
+        """Import an iterable of (row, parse error) pairs as produced by ``read_rows``."""
+        pending = []
+        with ThreadPoolExecutor(max_workers=max(1, self.image_workers)) as executor:
+            for row, error in rows:
+                self.stats.read += 1
+                if error is not None:
+                    self.reject(row, error)
+                    continue
+                try:
+                    tshirt, images = self.build(row)
+                except RowError as exc:
+                    self.reject(row, str(exc))
+                    continue
+                pending.append((row, tshirt, images))
+                if len(pending) >= self.batch_size:
+                    self._flush(pending, executor)
+                    pending = []
+            self._flush(pending, executor)
+        if self.stats.imported and not self.dry_run:
+            bump_model_version(TShirt)
+        return self.stats
@@ -0,0 +1,381 @@
+"""Bitmap facet counts over the available catalog.
+
+Every facet value (a brand, a size, a flag, a price bucket, ...) owns a bitset
+of the TShirt ids carrying it, stored as a Python int: bit ``id`` is set when
+product ``id`` has the value. Combining filters is a handful of big-int
+AND/OR operations and a count is ``int.bit_count()``, both of which run a
+machine word at a time in C.
+
+Prices are also kept in a NumPy array indexed by id (NaN where there is no
+available product), so a filter's bitset can be unpacked into a boolean
+mask and the matching prices bucketed for the price histogram in one
+vectorized pass.
+"""
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import TShirt
+
+VALUE_FACETS = ('brand', 'category', 'size', 'condition', 'gender')
+FLAG_FACETS = (
+    'is_featured', 'condition_verified',
+    'has_stains', 'has_holes', 'has_fading', 'has_pilling', 'has_repairs',
+)
+# Lower bounds of the price buckets; the last bucket is open-ended.
+PRICE_BUCKETS = (Decimal('0'), Decimal('250'), Decimal('500'), Decimal('1000'), Decimal('2000'), Decimal('5000'))
+# TShirtFilter filters answered by the bitsets, and the price range filters
+# that are evaluated separately so price buckets can ignore them.
+FACET_FILTERS = frozenset(VALUE_FACETS + FLAG_FACETS + ('is_available',))
+PRICE_FILTERS = frozenset({'min_price', 'max_price', 'price_range', 'price', 'price__gte', 'price__lte'})
+
+ROW_FIELDS = (
+    'id', 'brand_id', 'brand__name', 'category__slug', 'category__name',
+    'size', 'condition', 'gender', 'price',
+) + FLAG_FACETS
+
+
+def bitset_from_ids(ids):
+    """Build a bitset from an iterable of non-negative ints."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for doc_id in ids:
+        buffer[doc_id >> 3] |= 1 << (doc_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def price_bucket(price):
+    bucket = 0
+    for position, lower in enumerate(PRICE_BUCKETS):
+        if price >= lower:
+            bucket = position
+    return bucket
+
+
+def mask_from_bitset(bits, size):
+    """Boolean array of length ``size`` with True at every set bit."""
+    buffer = bits.to_bytes(max((bits.bit_length() + 7) // 8, 1), 'little')
+    mask = np.unpackbits(np.frombuffer(buffer, dtype=np.uint8), bitorder='little').astype(bool)
+    if len(mask) < size:
+        return np.concatenate([mask, np.zeros(size - len(mask), dtype=bool)])
+    return mask[:size]
+
+
+def describe_counts(counts, label):
+    """Shape facet counts for the API, with labels and choice order.
+
+    ``label(facet, value)`` names brand and category values.
+    """
+    choices = {
+        'size': TShirt.SIZE_CHOICES,
+        'condition': TShirt.CONDITION_CHOICES,
+        'gender': TShirt.GENDER_CHOICES,
+    }
+    facets = {}
+    for facet in ('brand', 'category'):
+        values = sorted(counts[facet].items(), key=lambda item: (-item[1], str(label(facet, item[0]))))
+        facets[facet] = [
+            {'value': value, 'label': label(facet, value), 'count': count}
+            for value, count in values
+        ]
+    for facet, facet_choices in choices.items():
+        facets[facet] = [
+            {'value': value, 'label': choice_label, 'count': counts[facet].get(value, 0)}
+            for value, choice_label in facet_choices
+        ]
+    facets['price'] = [
+        {
+            'min': lower,
+            'max': PRICE_BUCKETS[position + 1] if position + 1 < len(PRICE_BUCKETS) else None,
+            'count': counts['price'].get(position, 0),
+        }
+        for position, lower in enumerate(PRICE_BUCKETS)
+    ]
+    for flag in FLAG_FACETS:
+        facets[flag] = {'true': counts[flag][True], 'false': counts[flag][False]}
+    return {'total': counts['total'], 'facets': facets}
+
+
+class FacetIndex:
+    """Per-value bitsets over available TShirt ids.
+
+    ``values`` maps facet -> {value: bitset}; ``flags`` maps flag -> bitset of
+    products where it is True; ``doc_keys`` keeps each product's
+    (facet, value) pairs so an update clears exactly the bits it set.
+    ``prices`` holds each available product's price at position ``id``.
+    """
+
+    def __init__(self):
+        self.available = 0
+        self.values = {facet: {} for facet in VALUE_FACETS + ('price',)}
+        self.flags = {flag: 0 for flag in FLAG_FACETS}
+        self.labels = {}
+        self.doc_keys = {}
+        self.prices = np.full(1024, np.nan)
+        self.synced_at = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_keys)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_keys
+
+    # Mutation
+
+    @staticmethod
+    def _row_keys(row):
+        data = dict(zip(ROW_FIELDS, row))
+        keys = [
+            ('brand', data['brand_id']),
+            ('size', data['size']),
+            ('condition', data['condition']),
+            ('gender', data['gender']),
+            ('price', price_bucket(data['price'])),
+        ]
+        if data['category__slug']:
+            keys.append(('category', data['category__slug']))
+        keys.extend(('flag', flag) for flag in FLAG_FACETS if data[flag])
+        labels = {('brand', data['brand_id']): data['brand__name']}
+        if data['category__slug']:
+            labels[('category', data['category__slug'])] = data['category__name']
+        return data['id'], tuple(keys), labels
+
+    def add_row(self, row):
+        """Index (or re-index) a product given its ROW_FIELDS tuple."""
+        doc_id, keys, labels = self._row_keys(row)
+        bit = 1 << doc_id
+        with self._lock:
+            self._clear(doc_id)
+            for facet, value in keys:
+                if facet == 'flag':
+                    self.flags[value] |= bit
+                else:
+                    bucket = self.values[facet]
+                    bucket[value] = bucket.get(value, 0) | bit
+            self.available |= bit
+            if doc_id >= len(self.prices):
+                self._grow_prices(doc_id)
+            self.prices[doc_id] = float(row[ROW_FIELDS.index('price')])
+            self.labels.update(labels)
+            self.doc_keys[doc_id] = keys
+
+    def add_tshirt(self, tshirt):
+        category = tshirt.category
+        row = [
+            tshirt.pk, tshirt.brand_id, tshirt.brand.name,
+            category.slug if category else None, category.name if category else None,
+            tshirt.size, tshirt.condition, tshirt.gender, tshirt.price,
+        ]
+        row.extend(getattr(tshirt, flag) for flag in FLAG_FACETS)
+        self.add_row(row)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._clear(doc_id)
+
+    def _clear(self, doc_id):
+        keys = self.doc_keys.pop(doc_id, None)
+        if keys is None:
+            return
+        mask = ~(1 << doc_id)
+        for facet, value in keys:
+            if facet == 'flag':
+                self.flags[value] &= mask
+                continue
+            bucket = self.values[facet]
+            remaining = bucket.get(value, 0) & mask
+            if remaining:
+                bucket[value] = remaining
+            else:
+                bucket.pop(value, None)
+        self.available &= mask
+        self.prices[doc_id] = np.nan
+
+    def _grow_prices(self, doc_id):
+        capacity = len(self.prices)
+        while capacity <= doc_id:
+            capacity *= 2
+        prices = np.full(capacity, np.nan)
+        prices[:len(self.prices)] = self.prices
+        self.prices = prices
+
+    # Query
+
+    def _selection(self, facet, selected):
+        """Bitset of products matching any of the selected values of a facet."""
+        bits = 0
+        bucket = self.values[facet]
+        for value in selected:
+            bits |= bucket.get(value, 0)
+        return bits
+
+    def _universe(self, base):
+        return self.available if base is None else self.available & base
+
+    def _masks(self, selections, flags, universe):
+        """Bitset per active selection and flag filter."""
+        masks = {
+            facet: self._selection(facet, values)
+            for facet, values in (selections or {}).items() if values
+        }
+        for flag, value in (flags or {}).items():
+            if value is not None:
+                masks[flag] = self.flags[flag] if value else universe & ~self.flags[flag]
+        return masks
+
+    def counts(self, selections=None, flags=None, base=None, price_mask=None):
+        """Count every facet value under the given filters.
+
+        Counts are disjunctive: each facet is counted with every filter applied
+        except its own, so picking one brand still shows how many items the
+        other brands would add.
+
+        Args:
+            selections: facet -> iterable of selected values (OR within a facet)
+            flags: flag -> True/False
+            base: bitset from filters the index cannot answer, or None
+            price_mask: bitset from price range filters, or None
+
+        Returns:
+            dict: ``total`` and per-facet {value: count}
+        """
+        with self._lock:
+            universe = self._universe(base)
+            masks = self._masks(selections, flags, universe)
+            if price_mask is not None:
+                masks['price'] = price_mask
+
+            def excluding(name):
+                bits = universe
+                for other, mask in masks.items():
+                    if other != name:
+                        bits &= mask
+                return bits
+
+            result = {'total': excluding(None).bit_count()}
+            for facet in VALUE_FACETS + ('price',):
+                scope = excluding(facet)
+                result[facet] = {
+                    value: count
+                    for value, bits in self.values[facet].items()
+                    if (count := (bits & scope).bit_count())
+                }
+            for flag in FLAG_FACETS:
+                scope = excluding(flag)
+                true_count = (self.flags[flag] & scope).bit_count()
+                result[flag] = {True: true_count, False: scope.bit_count() - true_count}
+            return result
+
+    def price_histogram(self, selections=None, flags=None, base=None, price_mask=None, bins=20):
+        """Equal-width histogram of prices under the given filters.
+
+        Like the price facet it ignores the price range filter itself (so the
+        slider shows the whole distribution), and reports how many products
+        fall inside the range as ``selected``.
+
+        Returns:
+            dict: ``total``, ``selected``, ``min``, ``max`` and ``buckets``
+            as [(lower, upper, count), ...]
+        """
+        with self._lock:
+            scope = self._universe(base)
+            for mask in self._masks(selections, flags, scope).values():
+                scope &= mask
+            prices = self.prices[mask_from_bitset(scope, len(self.prices))]
+            selected = (scope & price_mask).bit_count() if price_mask is not None else len(prices)
+
+        result = {'total': len(prices), 'selected': selected, 'min': None, 'max': None, 'buckets': []}
+        if not len(prices):
+            return result
+        lower, upper = float(prices.min()), float(prices.max())
+        if upper == lower:
+            counts, edges = np.array([len(prices)]), np.array([lower, upper])
+        else:
+            counts, edges = np.histogram(prices, bins=bins, range=(lower, upper))
+        result.update(min=lower, max=upper, buckets=[
+            (round(float(edges[position]), 2), round(float(edges[position + 1]), 2), int(count))
+            for position, count in enumerate(counts)
+        ])
+        return result
+
+    def label(self, facet, value):
+        return self.labels.get((facet, value), value)
+
+    def describe(self, counts):
+        """Shape ``counts()`` output for the API (see ``describe_counts``)."""
+        return describe_counts(counts, self.label)
+
+    # Database sync
+
+    def refresh_products(self, product_ids):
+        """Re-read the given products from the database."""
+        product_ids = set(product_ids)
+        for row in TShirt.objects.filter(id__in=product_ids, is_available=True).values_list(*ROW_FIELDS):
+            self.add_row(row)
+            product_ids.discard(row[0])
+        for product_id in product_ids:
+            self.remove(product_id)
+
+    def sync(self, full=False, batch_size=2000):
+        """Catch the index up with the available TShirt rows (see SearchIndex.sync)."""
+        started = timezone.now()
+        available = TShirt.objects.filter(is_available=True)
+        available_ids = set(available.values_list('id', flat=True))
+
+        with self._lock:
+            for doc_id in [doc_id for doc_id in self.doc_keys if doc_id not in available_ids]:
+                self._clear(doc_id)
+            missing = available_ids.difference(self.doc_keys)
+
+        changed = available
+        if not full and self.synced_at is not None:
+            changed = changed.filter(updated_at__gte=self.synced_at)
+        for row in changed.values_list(*ROW_FIELDS).iterator(chunk_size=batch_size):
+            self.add_row(row)
+            missing.discard(row[0])
+
+        if missing:
+            for row in available.filter(id__in=missing).values_list(*ROW_FIELDS).iterator(chunk_size=batch_size):
+                self.add_row(row)
+
+        self.synced_at = started
+        return len(self)
+
+
+_index = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_facet_index():
+    """Process-wide facet index, built on first use and kept in sync like the search index."""
+    global _index, _index_checked_at
+
+    refresh_seconds = getattr(settings, 'CATALOG_SEARCH_REFRESH_SECONDS', 60)
+    with _index_lock:
+        if _index is None:
+            _index = FacetIndex()
+            _index.sync(full=True)
+            _index_checked_at = time.monotonic()
+        elif refresh_seconds and time.monotonic() - _index_checked_at > refresh_seconds:
+            _index.sync()
+            _index_checked_at = time.monotonic()
+        return _index
+
+
+def loaded_facet_index():
+    """The process index if it has been built, without building it."""
+    return _index
+
+
+def reset_facet_index():
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,415 @@
+"""Product feeds (Google Merchant, Meta catalog) and the XML sitemap.
+
+Feeds are rendered by a generator over ``values().iterator()``, so memory
+stays flat however large the catalog is, and can be gzip-compressed on the
+fly (``gzip_chunks``) for a streaming response.
+
+``FeedWriter`` keeps an on-disk copy up to date incrementally. Products are
+sharded by id range and each shard is stored as its own gzip member; a run
+only re-renders the shards that hold a product changed since the previous
+run (or whose membership changed through a delete), then assembles the
+full file by concatenating header, shard and footer members. A
+concatenation of gzip members is itself a valid gzip file, so assembling
+never re-renders or re-compresses unchanged shards. A feed with a per-file
+limit (the sitemap) is assembled into several part files plus an index
+once the catalog outgrows it.
+
+The feed endpoint serves those files rather than rendering per request.
+"""
+import csv
+import io
+import json
+import os
+import threading
+import zlib
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import TShirt
+
+FEED_FIELDS = (
+    'id', 'slug', 'title', 'description', 'brand__name', 'category__name', 'size', 'color', 'gender',
+    'condition', 'price', 'quantity', 'primary_image', 'image_2', 'image_3', 'image_4', 'updated_at',
+)
+NEW_CONDITIONS = frozenset({'new_with_tags', 'new_without_tags'})
+GOOGLE_GENDERS = {'men': 'male', 'women': 'female', 'unisex': 'unisex', 'kids': 'unisex'}
+# Flush rendered text to the consumer in pieces of about this size.
+CHUNK_BYTES = 64 * 1024
+
+
+class Feed:
+    """One output format: a header, one entry per product and a footer."""
+    name = None
+    extension = None
+    content_type = None
+    # Most entries one file may hold; larger feeds are split into parts plus an index.
+    max_items = None
+
+    def __init__(self, media_base_url, site_url=None):
+        self.media_base_url = media_base_url.rstrip('/')
+        self.site_url = (site_url or settings.FRONTEND_URL).rstrip('/')
+
+    def header(self):
+        return ''
+
+    def footer(self):
+        return ''
+
+    def item(self, row):
+        raise NotImplementedError
+
+    def index(self, part_urls):
+        raise NotImplementedError
+
+    def link(self, row):
+        return f"{self.site_url}/products/{row['slug']}"
+
+    def part_url(self, part):
+        return f"{self.media_base_url}{reverse('products:product-feed-part', args=[self.name, part])}"
+
+    def image_url(self, name):
+        if not name:
+            return ''
+        return f'{self.media_base_url}{settings.MEDIA_URL}{name}'
+
+    def extra_images(self, row):
+        return [self.image_url(row[field]) for field in ('image_2', 'image_3', 'image_4') if row[field]]
+
+    def price(self, row):
+        return f"{Decimal(row['price']):.2f} {settings.PAYMENT_CURRENCY}"
+
+    @staticmethod
+    def condition(row):
+        return 'new' if row['condition'] in NEW_CONDITIONS else 'used'
+
+    @staticmethod
+    def description(row):
+        return ' '.join((row['description'] or row['title']).split())[:5000]
+
+
+class GoogleFeed(Feed):
+    """Google Merchant Center RSS 2.0 feed."""
+    name = 'google'
+    extension = 'xml'
+    content_type = 'application/rss+xml; charset=utf-8'
+
+    def header(self):
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+            f'<title>Thrift Shop</title>\n<link>{escape(self.site_url)}</link>\n'
+            '<description>Available products</description>\n'
+        )
+
+    def footer(self):
+        return '</channel>\n</rss>\n'
+
+    def item(self, row):
+        fields = [
+            ('g:id', row['id']),
+            ('g:title', row['title'][:150]),
+            ('g:description', self.description(row)),
+            ('g:link', self.link(row)),
+            ('g:image_link', self.image_url(row['primary_image'])),
+            *(('g:additional_image_link', url) for url in self.extra_images(row)),
+            ('g:availability', 'in stock'),
+            ('g:price', self.price(row)),
+            ('g:condition', self.condition(row)),
+            ('g:brand', row['brand__name']),
+            ('g:product_type', row['category__name'] or ''),
+            ('g:color', row['color']),
+            ('g:size', row['size'].upper()),
+            ('g:gender', GOOGLE_GENDERS.get(row['gender'], 'unisex')),
+            ('g:age_group', 'kids' if row['gender'] == 'kids' else 'adult'),
+        ]
+        body = ''.join(f'<{tag}>{escape(str(value))}</{tag}>' for tag, value in fields if value not in ('', None))
+        return f'<item>{body}</item>\n'
+
+
+class MetaFeed(Feed):
+    """Meta (Facebook/Instagram) catalog CSV feed."""
+    name = 'meta'
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+    columns = (
+        'id', 'title', 'description', 'availability', 'condition', 'price', 'link', 'image_link',
+        'additional_image_link', 'brand', 'product_type', 'color', 'size', 'gender', 'quantity_to_sell_on_facebook',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+
+    def _line(self, values):
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._writer.writerow(values)
+        return self._buffer.getvalue()
+
+    def header(self):
+        return self._line(self.columns)
+
+    def item(self, row):
+        return self._line([
+            row['id'], row['title'][:150], self.description(row), 'in stock', self.condition(row),
+            self.price(row), self.link(row), self.image_url(row['primary_image']),
+            ','.join(self.extra_images(row)), row['brand__name'], row['category__name'] or '', row['color'],
+            row['size'].upper(), {'men': 'male', 'women': 'female'}.get(row['gender'], 'unisex'), row['quantity'],
+        ])
+
+
+class SitemapFeed(Feed):
+    """XML sitemap of product pages (the sitemap protocol allows 50,000 URLs per file)."""
+    name = 'sitemap'
+    extension = 'xml'
+    content_type = 'application/xml; charset=utf-8'
+    max_items = 50000
+
+    def index(self, part_urls):
+        lastmod = timezone.now().date().isoformat()
+        entries = ''.join(
+            f'<sitemap><loc>{escape(url)}</loc><lastmod>{lastmod}</lastmod></sitemap>\n' for url in part_urls
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            f'{entries}</sitemapindex>\n'
+        )
+
+    def header(self):
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        )
+
+    def footer(self):
+        return '</urlset>\n'
+
+    def item(self, row):
+        return (
+            f'<url><loc>{escape(self.link(row))}</loc>'
+            f"<lastmod>{row['updated_at'].date().isoformat()}</lastmod></url>\n"
+        )
+
+
+FEEDS = {feed.name: feed for feed in (GoogleFeed, MetaFeed, SitemapFeed)}
+
+
+def feed_queryset():
+    return TShirt.objects.filter(is_available=True).order_by('id')
+
+
+def render_items(feed, queryset, chunk_size=2000):
+    """Entries for ``queryset`` as UTF-8 chunks of about CHUNK_BYTES."""
+    parts, size = [], 0
+    for row in queryset.values(*FEED_FIELDS).iterator(chunk_size=chunk_size):
+        text = feed.item(row)
+        parts.append(text)
+        size += len(text)
+        if size >= CHUNK_BYTES:
+            yield ''.join(parts).encode('utf-8')
+            parts, size = [], 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def stream_feed(feed, queryset=None, chunk_size=2000):
+    """The whole feed as a generator of UTF-8 chunks."""
+    yield feed.header().encode('utf-8')
+    yield from render_items(feed, feed_queryset() if queryset is None else queryset, chunk_size)
+    yield feed.footer().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a chunk generator into one gzip member, on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def gunzip_file(path):
+    """Decompressed chunks of a file of concatenated gzip members."""
+    with open(path, 'rb') as handle:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        while True:
+            data = handle.read(CHUNK_BYTES)
+            if not data:
+                break
+            while data:
+                text = decompressor.decompress(data)
+                if text:
+                    yield text
+                if not decompressor.eof:
+                    break
+                data = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+
+def _write_atomic(path, chunks):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as handle:
+        for chunk in chunks:
+            handle.write(chunk)
+    os.replace(temporary, path)
+
+
+class FeedWriter:
+    """Sharded, incrementally refreshed on-disk copy of one feed.
+
+    Layout under ``root/<feed>/``: ``shard-<n>.gz`` holds the entries of
+    products with ids in ``[n * shard_size, (n + 1) * shard_size)``,
+    ``manifest.json`` records per-shard (count, id sum) and the time of the
+    last run, and ``<feed>.<extension>.gz`` is the assembled feed. Past
+    ``feed.max_items`` entries that file is an index of
+    ``<feed>-<n>.<extension>.gz`` parts, each a run of whole shards.
+    """
+
+    def __init__(self, feed, root=None, shard_size=None, chunk_size=2000):
+        self.feed = feed
+        self.directory = os.path.join(root or settings.PRODUCT_FEED_ROOT, feed.name)
+        self.shard_size = shard_size or settings.PRODUCT_FEED_SHARD_SIZE
+        if feed.max_items:
+            # A part is made of whole shards, so no shard may exceed the limit.
+            self.shard_size = min(self.shard_size, feed.max_items)
+        self.chunk_size = chunk_size
+
+    @property
+    def output_path(self):
+        return os.path.join(self.directory, f'{self.feed.name}.{self.feed.extension}.gz')
+
+    def part_path(self, part):
+        return os.path.join(self.directory, f'{self.feed.name}-{part}.{self.feed.extension}.gz')
+
+    def ensure(self):
+        """Write the feed if no run has produced it yet; refreshing it is build_product_feeds' job."""
+        with _ensure_lock:
+            if not os.path.exists(self.output_path):
+                self.update()
+        return self.output_path
+
+    def shard_path(self, shard):
+        return os.path.join(self.directory, f'shard-{shard:06d}.gz')
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path()) as handle:
+                manifest = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('shard_size') != self.shard_size:
+            return None
+        return manifest
+
+    def _shard_signatures(self):
+        """{shard: [count, id sum]} of the available products, from one aggregate query."""
+        rows = (
+            feed_queryset().order_by().annotate(shard=F('id') / self.shard_size)
+            .values('shard').annotate(count=Count('id'), id_sum=Sum('id'))
+            .values_list('shard', 'count', 'id_sum')
+        )
+        return {str(shard): [count, id_sum] for shard, count, id_sum in rows}
+
+    def update(self, full=False):
+        """Re-render the shards that changed since the last run and reassemble the feed.
+
+        Returns:
+            tuple: (shards re-rendered, total shards, products in the feed)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        started = timezone.now()
+        manifest = None if full else self._load_manifest()
+        current = self._shard_signatures()
+
+        if manifest is None:
+            stale = set(current)
+        else:
+            previous = manifest['shards']
+            since = parse_datetime(manifest['generated_at'])
+            touched = TShirt.objects.filter(updated_at__gte=since).values_list('id', flat=True)
+            stale = {str(tshirt_id // self.shard_size) for tshirt_id in touched}
+            stale.update(shard for shard in current if previous.get(shard) != current[shard])
+            stale.update(shard for shard in previous if shard not in current)
+            stale.update(shard for shard in current if not os.path.exists(self.shard_path(int(shard))))
+
+        for shard in stale:
+            path = self.shard_path(int(shard))
+            if shard not in current:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            start = int(shard) * self.shard_size
+            queryset = feed_queryset().filter(id__gte=start, id__lt=start + self.shard_size)
+            _write_atomic(path, gzip_chunks(render_items(self.feed, queryset, self.chunk_size)))
+
+        counts = {int(shard): count for shard, (count, _) in current.items()}
+        self._assemble(sorted(counts), counts)
+        with open(self._manifest_path(), 'w') as handle:
+            json.dump({
+                'generated_at': started.isoformat(),
+                'shard_size': self.shard_size,
+                'shards': current,
+            }, handle)
+        return len(stale), len(current), sum(count for count, _ in current.values())
+
+    def _parts(self, shards, counts):
+        """Group consecutive shards into parts of at most ``feed.max_items`` entries."""
+        limit = self.feed.max_items
+        if not limit or sum(counts.values()) <= limit:
+            return [shards]
+        parts, part, size = [], [], 0
+        for shard in shards:
+            if part and size + counts[shard] > limit:
+                parts.append(part)
+                part, size = [], 0
+            part.append(shard)
+            size += counts[shard]
+        parts.append(part)
+        return parts
+
+    def _write_members(self, path, shards):
+        def members():
+            yield from gzip_chunks([self.feed.header().encode('utf-8')])
+            for shard in shards:
+                with open(self.shard_path(shard), 'rb') as handle:
+                    while True:
+                        data = handle.read(CHUNK_BYTES)
+                        if not data:
+                            break
+                        yield data
+            yield from gzip_chunks([self.feed.footer().encode('utf-8')])
+        _write_atomic(path, members())
+
+    def _assemble(self, shards, counts):
+        parts = self._parts(shards, counts)
+        if len(parts) == 1:
+            self._write_members(self.output_path, shards)
+            parts = []
+        else:
+            for part, part_shards in enumerate(parts):
+                self._write_members(self.part_path(part), part_shards)
+            index = self.feed.index([self.feed.part_url(part) for part in range(len(parts))])
+            _write_atomic(self.output_path, gzip_chunks([index.encode('utf-8')]))
+        prefix, suffix = f'{self.feed.name}-', f'.{self.feed.extension}.gz'
+        for name in os.listdir(self.directory):
+            number = name[len(prefix):-len(suffix)]
+            if name.startswith(prefix) and name.endswith(suffix) and number.isdigit() and int(number) >= len(parts):
+                os.remove(os.path.join(self.directory, name))
+
+
+_ensure_lock = threading.Lock()
@@ -1,8 +1,11 @@
 import django_filters
+from django.conf import settings
 from django.db import models
+from rest_framework.filters import OrderingFilter, SearchFilter
 from django.utils import timezone
+from django.utils.text import slugify
 from datetime import datetime, timedelta
-from .models import TShirt, Brand, Category
+from .models import TShirt, Brand, Category, ProductListing, TShirtTag
 
 
 class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
@@ -69,6 +72,9 @@ class TShirtFilter(django_filters.FilterSet):
     created_month = django_filters.BooleanFilter(method='filter_created_month')
     created_year = django_filters.BooleanFilter(method='filter_created_year')
     
+    # Exact tag filter (comma-separated, any of) over the indexed TShirtTag links
+    tag = CharInFilter(method='filter_tag')
+
     # Text filters
     color = django_filters.CharFilter(field_name='color', lookup_expr='icontains')
     material = django_filters.CharFilter(field_name='material', lookup_expr='icontains')
@@ -83,6 +89,14 @@ class TShirtFilter(django_filters.FilterSet):
             'quantity': ['exact', 'gte', 'lte'],
         }
     
+    def filter_tag(self, queryset, name, value):
+        """Products carrying any of the given tags (matched by normalized slug)."""
+        slugs = [slug for slug in (slugify(tag) for tag in value) if slug]
+        if not slugs:
+            return queryset
+        # ProductListing's primary key is the TShirt id, so this serves both filtersets.
+        return queryset.filter(pk__in=TShirtTag.objects.filter(tag__slug__in=slugs).values('tshirt_id'))
+
     def filter_has_discount(self, queryset, name, value):
         """Filter items that have a discount."""
         if value:
@@ -118,3 +132,100 @@ class TShirtFilter(django_filters.FilterSet):
             year_start = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
             return queryset.filter(created_at__gte=year_start)
         return queryset
+
+
+class ProductListingFilter(TShirtFilter):
+    """TShirtFilter over the ProductListing read model.
+
+    Filters on denormalized columns need no join; the rarely used condition
+    detail filters fall back to the ``tshirt`` relation.
+    """
+
+    category = CharInFilter(field_name='category_slug', lookup_expr='in')
+    is_available = django_filters.BooleanFilter(method='filter_is_available')
+
+    condition_verified = django_filters.BooleanFilter(field_name='tshirt__condition_verified')
+    has_stains = django_filters.BooleanFilter(field_name='tshirt__has_stains')
+    has_holes = django_filters.BooleanFilter(field_name='tshirt__has_holes')
+    has_fading = django_filters.BooleanFilter(field_name='tshirt__has_fading')
+    has_pilling = django_filters.BooleanFilter(field_name='tshirt__has_pilling')
+    has_repairs = django_filters.BooleanFilter(field_name='tshirt__has_repairs')
+    material = django_filters.CharFilter(field_name='tshirt__material', lookup_expr='icontains')
+
+    class Meta(TShirtFilter.Meta):
+        model = ProductListing
+
+    def filter_is_available(self, queryset, name, value):
+        """Listings only exist for available items."""
+        if value is False:
+            return queryset.none()
+        return queryset
+
+
+class CatalogSearchFilter(SearchFilter):
+    """SearchFilter backed by the in-process inverted index.
+
+    Restricts the queryset to the best CATALOG_SEARCH_MAX_HITS index hits
+    instead of running ``icontains`` across every search field; a query with
+    no index terms (only stopwords) falls back to that ``icontains`` search.
+
+    Cursor pagination seeks on a ``search_rank`` (BM25 score) annotation.
+    Page-number results in relevance order are paged against the ranked ids
+    by the view (see ``ranked_hits``), so they carry a constant rank instead
+    of a CASE over every hit.
+    """
+
+    @classmethod
+    def ranked_hits(cls, request):
+        """Capped (doc_id, score) index hits for the request's search, best first.
+
+        Returns:
+            list or None: None when there is nothing to look up in the index
+            (no search, or only stopwords)
+        """
+        from .search import get_search_index, tokenize
+
+        if not hasattr(request, '_catalog_search_hits'):
+            query = request.query_params.get(cls.search_param, '')
+            hits = None
+            if tokenize(query):
+                hits = get_search_index().search(query, limit=settings.CATALOG_SEARCH_MAX_HITS)
+            request._catalog_search_hits = hits
+        return request._catalog_search_hits
+
+    def filter_queryset(self, request, queryset, view):
+        from .pagination import wants_cursor_pagination
+
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+
+        no_rank = models.Value(0.0, output_field=models.FloatField())
+        hits = self.ranked_hits(request)
+        if hits is None:
+            return super().filter_queryset(request, queryset, view).annotate(search_rank=no_rank)
+        if not hits:
+            return queryset.none().annotate(search_rank=no_rank)
+
+        queryset = queryset.filter(pk__in=[doc_id for doc_id, _ in hits])
+        if not wants_cursor_pagination(request):
+            return queryset.annotate(search_rank=no_rank)
+        ranks = [models.When(pk=doc_id, then=models.Value(score)) for doc_id, score in hits]
+        return queryset.annotate(
+            search_rank=models.Case(*ranks, default=no_rank, output_field=models.FloatField())
+        )
+
+
+class RelevanceOrderingFilter(OrderingFilter):
+    """OrderingFilter that keeps relevance order for searches.
+
+    An explicit ``ordering`` parameter always wins; otherwise searched results
+    are ordered by ``search_rank`` and unsearched ones by the view default.
+    """
+
+    def get_default_ordering(self, view):
+        request = getattr(view, 'request', None)
+        search_param = CatalogSearchFilter.search_param
+        if request is not None and request.query_params.get(search_param, '').strip():
+            return ['-search_rank'] + list(super().get_default_ordering(view) or [])
+        return super().get_default_ordering(view)
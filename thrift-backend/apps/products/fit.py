@@ -0,0 +1,214 @@
+"""Measurement-based fit search over the available catalog.
+
+Vintage size labels are unreliable, so "tees that fit like mine" is answered
+from the five garment measurements instead. Every available product is one
+row of a float32 NumPy matrix (NaN where a measurement is missing); a query
+is a reference measurement set plus a tolerance per measurement, evaluated
+as one vectorized comparison over the whole matrix rather than a 5-way
+range query on the database.
+
+Rows are kept in a grow-by-doubling buffer: adding a product appends (or
+overwrites its row) and removing one moves the last row into its slot, so
+writes are O(1) and the index is updated incrementally like the search and
+facet indexes.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import TShirt
+
+MEASUREMENTS = ('pit_to_pit', 'shoulder_to_shoulder', 'front_length', 'back_length', 'sleeve_length')
+ROW_FIELDS = ('id',) + MEASUREMENTS
+
+
+def measured_tshirts():
+    """Available products with at least one measurement."""
+    measured = Q()
+    for name in MEASUREMENTS:
+        measured |= Q(**{f'{name}__isnull': False})
+    return TShirt.objects.filter(measured, is_available=True)
+
+
+class FitIndex:
+    """Measurements of every available product, one row per product."""
+
+    def __init__(self, capacity=1024):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((capacity, len(MEASUREMENTS)), np.nan, dtype=np.float32)
+        self.positions = {}
+        self.synced_at = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.positions
+
+    def add_row(self, row):
+        """Insert or replace a ROW_FIELDS tuple; products without any measurement are dropped."""
+        doc_id, measurements = row[0], row[1:]
+        if all(value is None for value in measurements):
+            self.remove(doc_id)
+            return
+        vector = [np.nan if value is None else float(value) for value in measurements]
+        with self._lock:
+            position = self.positions.get(doc_id)
+            if position is None:
+                position = len(self.positions)
+                if position == len(self.ids):
+                    self._grow()
+                self.positions[doc_id] = position
+                self.ids[position] = doc_id
+            self.values[position] = vector
+
+    def add_tshirt(self, tshirt):
+        if tshirt.is_available:
+            self.add_row([getattr(tshirt, field) for field in ROW_FIELDS])
+        else:
+            self.remove(tshirt.pk)
+
+    def remove(self, doc_id):
+        with self._lock:
+            position = self.positions.pop(doc_id, None)
+            if position is None:
+                return
+            last = len(self.positions)
+            if position != last:
+                moved = int(self.ids[last])
+                self.ids[position] = moved
+                self.values[position] = self.values[last]
+                self.positions[moved] = position
+            self.values[last] = np.nan
+
+    def _grow(self):
+        capacity = len(self.ids) * 2
+        ids = np.zeros(capacity, dtype=np.int64)
+        values = np.full((capacity, len(MEASUREMENTS)), np.nan, dtype=np.float32)
+        ids[:len(self.ids)] = self.ids
+        values[:len(self.values)] = self.values
+        self.ids, self.values = ids, values
+
+    def search(self, reference, tolerances, limit=20, exclude=()):
+        """Products within tolerance on every reference measurement, closest first.
+
+        Args:
+            reference: {measurement: value} for the measurements to match on
+            tolerances: {measurement: allowed absolute difference}, same keys
+            limit: maximum number of matches returned
+            exclude: product ids left out (e.g. the reference product)
+
+        Returns:
+            tuple: (total matches, [(product id, fit score, {measurement: difference}), ...])
+            where the fit score is the RMS difference in units of tolerance,
+            so 0 is an exact fit and 1 is at the edge of every tolerance.
+        """
+        names = [name for name in MEASUREMENTS if name in reference]
+        if not names:
+            return 0, []
+        columns = [MEASUREMENTS.index(name) for name in names]
+        target = np.array([float(reference[name]) for name in names], dtype=np.float32)
+        scale = np.array([float(tolerances[name]) for name in names], dtype=np.float32)
+
+        with self._lock:
+            count = len(self.positions)
+            ids = self.ids[:count].copy()
+            differences = self.values[:count, columns] - target
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaled = np.abs(differences) / scale
+        # A zero tolerance asks for an exact match: 0/0 is a perfect fit there, not NaN.
+        scaled[(differences == 0) & (scale == 0)] = 0.0
+        # NaN (missing measurement) compares False, so those products never match.
+        matches = np.flatnonzero((scaled <= 1.0).all(axis=1))
+        if exclude:
+            matches = matches[~np.isin(ids[matches], list(exclude))]
+        scores = np.sqrt((scaled[matches] ** 2).mean(axis=1))
+        if len(matches) > limit:
+            best = np.argpartition(scores, limit - 1)[:limit]
+        else:
+            best = np.arange(len(matches))
+        best = best[np.lexsort((ids[matches[best]], scores[best]))]
+
+        results = []
+        for position in best:
+            row = matches[position]
+            results.append((
+                int(ids[row]),
+                float(scores[position]),
+                {name: round(float(differences[row, column]), 2) for column, name in enumerate(names)},
+            ))
+        return len(matches), results
+
+    # Database sync
+
+    def refresh_products(self, product_ids):
+        """Re-read the given products from the database."""
+        product_ids = set(product_ids)
+        for row in TShirt.objects.filter(id__in=product_ids, is_available=True).values_list(*ROW_FIELDS):
+            self.add_row(row)
+            product_ids.discard(row[0])
+        for product_id in product_ids:
+            self.remove(product_id)
+
+    def sync(self, full=False, batch_size=2000):
+        """Catch the index up with the available TShirt rows (see SearchIndex.sync)."""
+        started = timezone.now()
+        available = measured_tshirts()
+        available_ids = set(available.values_list('id', flat=True))
+
+        with self._lock:
+            for doc_id in [doc_id for doc_id in self.positions if doc_id not in available_ids]:
+                self.remove(doc_id)
+            missing = available_ids.difference(self.positions)
+
+        changed = available
+        if not full and self.synced_at is not None:
+            changed = changed.filter(updated_at__gte=self.synced_at)
+        for row in changed.values_list(*ROW_FIELDS).iterator(chunk_size=batch_size):
+            self.add_row(row)
+            missing.discard(row[0])
+
+        if missing:
+            for row in available.filter(id__in=missing).values_list(*ROW_FIELDS).iterator(chunk_size=batch_size):
+                self.add_row(row)
+
+        self.synced_at = started
+        return len(self)
+
+
+_index = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_fit_index():
+    """Process-wide fit index, built on first use and kept in sync like the search index."""
+    global _index, _index_checked_at
+
+    refresh_seconds = getattr(settings, 'CATALOG_SEARCH_REFRESH_SECONDS', 60)
+    with _index_lock:
+        if _index is None:
+            _index = FitIndex()
+            _index.sync(full=True)
+            _index_checked_at = time.monotonic()
+        elif refresh_seconds and time.monotonic() - _index_checked_at > refresh_seconds:
+            _index.sync()
+            _index_checked_at = time.monotonic()
+        return _index
+
+
+def loaded_fit_index():
+    """The process index if it has been built, without building it."""
+    return _index
+
+
+def reset_fit_index():
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,324 @@
+"""Resized WebP/JPEG variants of product photos, served as ``srcset`` data.
+
+Each image field of a TShirt gets fixed-width variants (never wider than
+the original) in every configured format. Rendering happens in a process
+pool; the results are recorded on ``TShirt.image_variants`` as
+
+    {field: {'source': <original name>, 'width': w, 'height': h,
+             'variants': [{'name', 'width', 'height', 'format'}, ...]}}
+
+so serializers build ``srcset`` strings without touching storage. Entries
+whose ``source`` no longer matches the field are ignored until regenerated.
+
+The rendering half of this module only imports Pillow, so pool workers
+started with ``spawn``/``forkserver`` do not need Django set up.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from PIL import Image, ImageOps, features
+
+IMAGE_FIELDS = (
+    'primary_image', 'image_2', 'image_3', 'image_4',
+    'condition_photo_1', 'condition_photo_2', 'condition_photo_3', 'condition_photo_4',
+)
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+VARIANT_DIR = 'tshirts/variants'
+
+logger = logging.getLogger(__name__)
+
+
+def supported_formats():
+    """Configured output formats this Pillow build can encode, best first."""
+    formats = []
+    for fmt in settings.PRODUCT_IMAGE_FORMATS:
+        fmt = fmt.strip().lower()
+        if fmt == 'jpeg' or (fmt == 'webp' and features.check_module('webp')) or (fmt == 'avif' and _has_avif()):
+            formats.append(fmt)
+    return formats
+
+
+def _has_avif():
+    try:
+        return features.check_module('avif')
+    except ValueError:
+        # Pillow < 11.2 has no AVIF encoder.
+        return False
+
+
+# Rendering (runs in pool workers)
+
+def _prepare(image, fmt):
+    if fmt == 'jpeg':
+        if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+            rgba = image.convert('RGBA')
+            background = Image.new('RGB', rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            return background
+        return image if image.mode in ('RGB', 'L') else image.convert('RGB')
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+        return image.convert('RGBA' if has_alpha else 'RGB')
+    return image
+
+
+def render_variants(data, widths, formats, quality):
+    """Decode an image and encode it at each width and format.
+
+    Returns:
+        tuple: (original width, original height, [(width, height, format, bytes), ...])
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    width, height = image.size
+    rendered = []
+    # Largest first, each resize starting from the previous (smaller) result.
+    resized = image
+    for target in sorted({min(int(w), width) for w in widths}, reverse=True):
+        if target != resized.width:
+            size = (target, max(1, round(height * target / width)))
+            resized = resized.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for fmt in formats:
+            buffer = io.BytesIO()
+            options = {'quality': quality}
+            if fmt == 'jpeg':
+                options.update(optimize=True, progressive=True)
+            elif fmt == 'webp':
+                options['method'] = 4
+            _prepare(resized, fmt).save(buffer, format=fmt.upper(), **options)
+            rendered.append((resized.width, resized.height, fmt, buffer.getvalue()))
+    rendered.sort(key=lambda item: (item[0], formats.index(item[2])))
+    return width, height, rendered
+
+
+# Pool
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_image_pool():
+    """Process-wide render pool, or None to render inline (PRODUCT_IMAGE_WORKERS=0)."""
+    global _pool
+    workers = settings.PRODUCT_IMAGE_WORKERS
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+class _InlineFuture:
+    def __init__(self, func, *args):
+        self._value = func(*args)
+
+    def result(self):
+        return self._value
+
+
+# Bookkeeping (Django side)
+
+def stale_image_fields(tshirt, force=False):
+    """Image fields whose recorded variants don't belong to the current file."""
+    recorded = tshirt.image_variants or {}
+    stale = []
+    for field in IMAGE_FIELDS:
+        name = getattr(tshirt, field).name or ''
+        entry = recorded.get(field)
+        if (name and (force or entry is None or entry.get('source') != name)) or (not name and entry):
+            stale.append(field)
+    return stale
+
+
+def _variant_name(source_name, width, fmt):
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f'{VARIANT_DIR}/{stem}-{width}w.{extension}'
+
+
+def generate_image_variants(tshirts, force=False, executor=None):
+    """Render and record variants for every stale image field of ``tshirts``.
+
+    All renders are submitted before any result is awaited, so one call
+    keeps the whole pool busy. Fields changed again while rendering are
+    left for the next run.
+
+    Returns:
+        int: Number of image fields updated
+    """
+    from django.core.files.storage import default_storage
+    from django.db import transaction
+    from django.utils import timezone
+
+    from .models import ProductListing, TShirt
+
+    if executor is None:
+        executor = get_image_pool()
+    widths = settings.PRODUCT_IMAGE_WIDTHS
+    formats = supported_formats()
+    quality = settings.PRODUCT_IMAGE_QUALITY
+
+    jobs = []
+    for tshirt in tshirts:
+        for field in stale_image_fields(tshirt, force=force):
+            file = getattr(tshirt, field)
+            if not file.name:
+                jobs.append((tshirt.pk, field, '', None))
+                continue
+            try:
+                with default_storage.open(file.name, 'rb') as handle:
+                    data = handle.read()
+            except OSError:
+                continue
+            args = (render_variants, data, widths, formats, quality)
+            future = executor.submit(*args) if executor is not None else _InlineFuture(*args)
+            jobs.append((tshirt.pk, field, file.name, future))
+
+    results = {}
+    for tshirt_id, field, source_name, future in jobs:
+        if future is None:
+            results.setdefault(tshirt_id, {})[field] = None
+            continue
+        try:
+            width, height, rendered = future.result()
+        except Exception:
+            logger.exception('Could not render variants of %s', source_name)
+            continue
+        variants = [
+            {
+                'name': default_storage.save(_variant_name(source_name, variant_width, fmt), io.BytesIO(content)),
+                'width': variant_width,
+                'height': variant_height,
+                'format': fmt,
+            }
+            for variant_width, variant_height, fmt, content in rendered
+        ]
+        results.setdefault(tshirt_id, {})[field] = {
+            'source': source_name, 'width': width, 'height': height, 'variants': variants,
+        }
+
+    updated = 0
+    for tshirt_id, entries in results.items():
+        obsolete = []
+        with transaction.atomic():
+            row = TShirt.objects.select_for_update().filter(pk=tshirt_id).values_list(
+                'image_variants', *IMAGE_FIELDS
+            ).first()
+            if row is None:
+                row = (None,) + ('',) * len(IMAGE_FIELDS)
+            recorded = dict(row[0] or {})
+            current = dict(zip(IMAGE_FIELDS, row[1:]))
+            for field, entry in entries.items():
+                source_name = entry['source'] if entry else ''
+                if (current[field] or '') != source_name:
+                    # Replaced again while rendering: discard this result.
+                    obsolete.extend(entry['variants'] if entry else ())
+                    continue
+                previous = recorded.pop(field, None)
+                if previous:
+                    obsolete.extend(previous['variants'])
+                if entry:
+                    recorded[field] = entry
+                updated += 1
+            TShirt.objects.filter(pk=tshirt_id).update(image_variants=recorded, updated_at=timezone.now())
+            ProductListing.objects.filter(tshirt_id=tshirt_id).update(
+                primary_image_variants=recorded.get('primary_image', {})
+            )
+        keep = {variant['name'] for entry in recorded.values() for variant in entry['variants']}
+        for variant in obsolete:
+            if variant['name'] not in keep:
+                default_storage.delete(variant['name'])
+    return updated
+
+
+# Upload queue
+
+_pending = set()
+_pending_ready = threading.Condition()
+_worker = None
+
+
+def _render_forever():
+    from django.db import close_old_connections
+
+    from .models import TShirt
+
+    while True:
+        with _pending_ready:
+            while not _pending:
+                _pending_ready.wait()
+            batch = list(_pending)
+            _pending.clear()
+        try:
+            generate_image_variants(TShirt.objects.filter(pk__in=batch))
+        except Exception:
+            logger.exception('Could not render variants of products %s', batch)
+        close_old_connections()
+
+
+def _enqueue(tshirt_id):
+    global _worker
+    with _pending_ready:
+        # Several saves of one product before the worker gets to it render once.
+        _pending.add(tshirt_id)
+        if _worker is None:
+            _worker = threading.Thread(target=_render_forever, name='image-variants', daemon=True)
+            _worker.start()
+        _pending_ready.notify()
+
+
+def queue_image_variants(tshirt_id):
+    """Render variants of a product's stale photos once the current transaction commits.
+
+    Handed to a background thread when PRODUCT_IMAGE_VARIANTS_ASYNC is on,
+    so the request never reads the photos or waits on the pool; rendered
+    inline otherwise.
+    """
+    from django.db import transaction
+
+    from .models import TShirt
+
+    if settings.PRODUCT_IMAGE_VARIANTS_ASYNC:
+        transaction.on_commit(lambda: _enqueue(tshirt_id))
+    else:
+        transaction.on_commit(lambda: generate_image_variants(TShirt.objects.filter(pk=tshirt_id)))
+
+
+def build_srcset(entry, source_name, request=None):
+    """``srcset`` data for one image from its recorded variants.
+
+    Returns None when the field has no variants for ``source_name`` yet, in
+    which case clients keep using the original URL.
+    """
+    if not entry or not source_name or entry.get('source') != source_name:
+        return None
+    from django.core.files.storage import default_storage
+
+    def url(name):
+        location = default_storage.url(name)
+        return request.build_absolute_uri(location) if request is not None else location
+
+    by_format = {}
+    for variant in entry['variants']:
+        by_format.setdefault(variant['format'], []).append(variant)
+    sources = []
+    for fmt in sorted(by_format, key=list(MIME_TYPES).index):
+        variants = sorted(by_format[fmt], key=lambda variant: variant['width'])
+        sources.append({
+            'type': MIME_TYPES[fmt],
+            'srcset': ', '.join(f"{url(variant['name'])} {variant['width']}w" for variant in variants),
+        })
+    fallback = by_format.get('jpeg') or entry['variants']
+    largest = max(fallback, key=lambda variant: variant['width'])
+    return {
+        'width': entry['width'],
+        'height': entry['height'],
+        'sources': sources,
+        'src': url(largest['name']),
+    }
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.products.autocomplete import SuggestionIndex
+
+from .benchmark_search import generate_synthetic_products
+
+DEFAULT_QUERIES = ['vintage', 'nike', 'black', 'rockabilly', 'adiddas', 'harly', 'grunge tee', 'champ']
+
+
+class Command(BaseCommand):
+    help = 'Measure search suggestion latency, typing each query one keystroke at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=0,
+                            help='Generate this many synthetic products (rolled back afterwards)')
+        parser.add_argument('--query', action='append', dest='queries', help='Query to type (repeatable)')
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or DEFAULT_QUERIES
+        with transaction.atomic():
+            if options['products']:
+                generate_synthetic_products(options['products'])
+            self._run(queries)
+            transaction.set_rollback(True)
+
+    def _run(self, queries):
+        started = time.perf_counter()
+        index = SuggestionIndex()
+        entries = index.sync(full=True)
+        build_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(f'Index: {len(index.product_keys)} products, {entries} suggestions, built in {build_ms:.0f} ms')
+
+        keystrokes = [query[:end] for query in queries for end in range(2, len(query) + 1)]
+        for label, clear_cache in (('cold', True), ('cached', False)):
+            samples = []
+            for prefix in keystrokes:
+                if clear_cache:
+                    index._cache.clear()
+                else:
+                    index.suggest(prefix)
+                started = time.perf_counter()
+                index.suggest(prefix)
+                samples.append((time.perf_counter() - started) * 1000)
+            samples.sort()
+            p50 = samples[len(samples) // 2]
+            p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+            self.stdout.write(f'{label:<8} {len(samples)} lookups  p50 {p50:.3f} ms  p99 {p99:.3f} ms  max {samples[-1]:.3f} ms')
+
+        for query in queries:
+            values = ', '.join(f"{item['value']} ({item['count']})" for item in index.suggest(query)[:3])
+            self.stdout.write(f'  {query!r}: {values}')
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,116 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+from functools import reduce
+from operator import and_, or_
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from apps.products.models import Brand, TShirt
+from apps.products.search import SearchIndex
+
+SEARCH_FIELDS = ['title', 'description', 'brand__name', 'color', 'tags']
+
+DEFAULT_QUERIES = ['vintage', 'black tee', 'rock band', 'nike', 'faded 90s', 'roll', 'graphic print cotton']
+
+WORDS = [
+    'vintage', 'retro', 'band', 'rock', 'rockabilly', 'tour', 'graphic', 'print', 'faded',
+    'distressed', 'cotton', 'single', 'stitch', 'oversized', 'boxy', 'classic', 'logo',
+    'college', 'skate', 'surf', 'racing', 'festival', 'concert', 'metal', 'punk', 'grunge',
+    'hiphop', 'souvenir', 'pocket', 'ringer', '80s', '90s', 'y2k', 'made', 'usa',
+]
+COLORS = ['Black', 'White', 'Grey', 'Navy', 'Red', 'Olive', 'Cream', 'Brown']
+BRANDS = ['Nike', 'Adidas', 'Levis', 'Hanes', 'Fruit of the Loom', 'Gildan', 'Champion', 'Stussy']
+
+
+def generate_synthetic_products(count, seed=42):
+    """Bulk-create ``count`` random products for benchmarks (no signals fire)."""
+    rng = random.Random(seed)
+    brands = [
+        Brand.objects.get_or_create(name=f'{name} (bench)', defaults={'slug': f'bench-{i}'})[0]
+        for i, name in enumerate(BRANDS)
+    ]
+    batch = []
+    for i in range(count):
+        words = rng.sample(WORDS, 8)
+        batch.append(TShirt(
+            title=' '.join(words[:4]).title() + ' Tee',
+            slug=f'bench-{i}',
+            description=' '.join(rng.choices(WORDS, k=30)),
+            brand=rng.choice(brands),
+            size='m',
+            color=rng.choice(COLORS),
+            material='100% Cotton',
+            condition='good',
+            price=Decimal(rng.randint(300, 3000)),
+            tags=','.join(words[4:]),
+        ))
+        if len(batch) == 1000:
+            TShirt.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        TShirt.objects.bulk_create(batch)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the inverted-index search against the icontains SearchFilter path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=0,
+                            help='Generate this many synthetic products (rolled back afterwards)')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query')
+        parser.add_argument('--query', action='append', dest='queries', help='Query to time (repeatable)')
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or DEFAULT_QUERIES
+        with transaction.atomic():
+            if options['products']:
+                generate_synthetic_products(options['products'])
+                self.stdout.write(f"Generated {options['products']} synthetic products")
+            self._run(queries, options['repeat'])
+            transaction.set_rollback(True)
+
+    def _run(self, queries, repeat):
+        available = TShirt.objects.filter(is_available=True)
+
+        started = time.perf_counter()
+        index = SearchIndex()
+        documents = index.sync(full=True)
+        build_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(f'Index: {documents} products, {len(index.postings)} terms, built in {build_ms:.0f} ms\n')
+
+        self.stdout.write(f"{'query':<24}{'icontains ms':>14}{'index ms':>12}{'index+db ms':>14}{'hits':>8}")
+        for query in queries:
+            terms = query.split()
+            condition = reduce(and_, [
+                reduce(or_, [Q(**{f'{field}__icontains': term}) for field in SEARCH_FIELDS])
+                for term in terms
+            ])
+
+            def icontains():
+                return list(available.filter(condition).values_list('id', flat=True))
+
+            def engine():
+                return index.search(query)
+
+            def engine_with_db():
+                ids = [doc_id for doc_id, _ in index.search(query)]
+                return list(available.filter(pk__in=ids).values_list('id', flat=True))
+
+            icontains_ms = self._time(icontains, repeat)
+            engine_ms = self._time(engine, repeat)
+            engine_db_ms = self._time(engine_with_db, repeat)
+            self.stdout.write(
+                f'{query:<24}{icontains_ms:>14.2f}{engine_ms:>12.2f}{engine_db_ms:>14.2f}{len(engine()):>8}'
+            )
+
+    @staticmethod
+    def _time(func, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
@@ -0,0 +1,76 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from apps.cart.models import Cart, CartItem
+from apps.cart.serializers import CartItemSerializer
+from apps.products.models import TShirt
+from apps.products.serializers import TShirtListSerializer
+
+from .benchmark_search import generate_synthetic_products
+
+SIZES = (20, 100, 1000)
+
+
+class Command(BaseCommand):
+    help = 'Compare the compiled fast-path serializers with plain DRF serialization'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Renders per measurement')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            missing = max(SIZES) - TShirt.objects.count()
+            if missing > 0:
+                generate_synthetic_products(missing)
+            self._run(options['repeat'])
+            transaction.set_rollback(True)
+
+    def _run(self, repeat):
+        request = APIRequestFactory().get('/api/v1/products/tshirts/')
+        context = {'request': request}
+        products = list(TShirt.objects.select_related('brand', 'category').order_by('id')[:max(SIZES)])
+
+        user = User.objects.create_user(username='serializer-benchmark')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.bulk_create([CartItem(cart=cart, tshirt=product, quantity=2) for product in products])
+        items = list(CartItem.objects.filter(cart=cart).select_related('tshirt__brand', 'tshirt__category'))
+
+        self.stdout.write(f"{'serializer':<22}{'items':>7}{'drf items/s':>14}{'fast items/s':>14}{'speedup':>9}")
+        for label, serializer_class, objects in (
+            ('TShirtListSerializer', TShirtListSerializer, products),
+            ('CartItemSerializer', CartItemSerializer, items),
+        ):
+            for size in SIZES:
+                batch = objects[:size]
+
+                def render():
+                    return JSONRenderer().render(serializer_class(batch, many=True, context=context).data)
+
+                with override_settings(FAST_SERIALIZERS_ENABLED=False):
+                    drf_body, drf_seconds = self._time(render, repeat)
+                with override_settings(FAST_SERIALIZERS_ENABLED=True):
+                    fast_body, fast_seconds = self._time(render, repeat)
+                if fast_body != drf_body:
+                    raise CommandError(f'{label} fast path output differs at {size} items')
+
+                self.stdout.write(
+                    f'{label:<22}{size:>7}{size / drf_seconds:>14.0f}{size / fast_seconds:>14.0f}'
+                    f'{drf_seconds / fast_seconds:>8.1f}x'
+                )
+        self.stdout.write(self.style.SUCCESS('Outputs are byte-identical'))
+
+    @staticmethod
+    def _time(func, repeat):
+        body = func()
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return body, best
@@ -0,0 +1,49 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.products.images import generate_image_variants, stale_image_fields, supported_formats
+from apps.products.models import TShirt
+
+
+class Command(BaseCommand):
+    help = 'Render resized WebP/JPEG variants for existing product photos in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.PRODUCT_IMAGE_WORKERS,
+                            help='Render processes (0 renders inline)')
+        parser.add_argument('--batch-size', type=int, default=25,
+                            help='Products whose photos are rendered concurrently')
+        parser.add_argument('--force', action='store_true', help='Re-render fields that already have variants')
+        parser.add_argument('--check', action='store_true', help='Only count stale image fields')
+
+    def handle(self, *args, **options):
+        tshirts = TShirt.objects.order_by('pk').iterator(chunk_size=500)
+        if options['check']:
+            stale = sum(len(stale_image_fields(tshirt, force=options['force'])) for tshirt in tshirts)
+            self.stdout.write(f'Image fields needing variants: {stale}')
+            return
+
+        self.stdout.write(
+            f"Widths {settings.PRODUCT_IMAGE_WIDTHS}, formats {supported_formats()}, {options['workers']} workers"
+        )
+        started = time.perf_counter()
+        updated = 0
+        executor = ProcessPoolExecutor(max_workers=options['workers']) if options['workers'] > 0 else None
+        try:
+            batch = []
+            for tshirt in tshirts:
+                if stale_image_fields(tshirt, force=options['force']):
+                    batch.append(tshirt)
+                if len(batch) >= options['batch_size']:
+                    updated += generate_image_variants(batch, force=options['force'], executor=executor)
+                    batch = []
+            if batch:
+                updated += generate_image_variants(batch, force=options['force'], executor=executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Rendered variants for {updated} image fields in {elapsed:.1f}s'))
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.products.feeds import FEEDS, FeedWriter
+
+
+class Command(BaseCommand):
+    help = 'Write the merchant feeds and sitemap to disk, re-rendering only shards with changed products'
+
+    def add_arguments(self, parser):
+        parser.add_argument('feeds', nargs='*', help=f"Feeds to write (default: all of {', '.join(FEEDS)})")
+        parser.add_argument('--root', default=settings.PRODUCT_FEED_ROOT, help='Output directory')
+        parser.add_argument('--shard-size', type=int, default=settings.PRODUCT_FEED_SHARD_SIZE,
+                            help='Product ids per shard')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip')
+        parser.add_argument('--full', action='store_true',
+                            help='Re-render every shard (e.g. after brand or category renames)')
+
+    def handle(self, *args, **options):
+        unknown = set(options['feeds']).difference(FEEDS)
+        if unknown:
+            raise CommandError(f"Unknown feeds: {', '.join(sorted(unknown))}")
+
+        for name in options['feeds'] or FEEDS:
+            started = time.perf_counter()
+            writer = FeedWriter(
+                FEEDS[name](media_base_url=settings.PRODUCT_FEED_MEDIA_BASE_URL),
+                root=options['root'], shard_size=options['shard_size'], chunk_size=options['chunk_size'],
+            )
+            rewritten, shards, products = writer.update(full=options['full'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: {products} products, re-rendered {rewritten}/{shards} shards '
+                f'in {elapsed:.1f}s -> {writer.output_path}'
+            ))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.products.search import SearchIndex
+
+
+class Command(BaseCommand):
+    help = 'Build the catalog search index and write its on-disk snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None, help='Snapshot path (defaults to CATALOG_SEARCH_INDEX_PATH)')
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.CATALOG_SEARCH_INDEX_PATH
+        index = SearchIndex()
+        documents = index.sync(full=True)
+        size = index.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {documents} products ({len(index.postings)} terms), wrote {size} bytes to {path}'
+        ))
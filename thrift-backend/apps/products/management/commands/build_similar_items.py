@@ -0,0 +1,24 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.products.similarity import rebuild_similar_items
+
+
+class Command(BaseCommand):
+    help = 'Precompute the top-K similar available products of every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=settings.SIMILAR_ITEMS_K,
+                            help='Neighbours stored per product')
+        parser.add_argument('--batch-size', type=int, default=1024,
+                            help='Products scored per matrix product')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        products, model = rebuild_similar_items(k=options['k'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored neighbours for {products} products against {len(model)} available '
+            f'({model.encoder.width} features) in {elapsed:.1f}s'
+        ))
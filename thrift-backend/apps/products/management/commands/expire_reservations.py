@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.products.reservation_stats import expire_reservations
+
+
+class Command(BaseCommand):
+    help = 'Deactivate expired product reservations in batches and release their reserved quantity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.RESERVATION_SWEEP_BATCH_SIZE,
+                            help='Reservations expired per transaction')
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping every --interval seconds')
+        parser.add_argument('--interval', type=int, default=settings.RESERVATION_SWEEPER_INTERVAL,
+                            help='Seconds between sweeps with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_reservations(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Expired {expired} reservations'))
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,61 @@
+import os
+import resource
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.products.catalog_import import CatalogImporter, RejectWriter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSONL supplier file into the catalog with batched bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file, one product per row')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk insert and transaction')
+        parser.add_argument('--images', dest='image_root', help='Directory relative image paths resolve against')
+        parser.add_argument('--image-workers', type=int, default=8, help='Threads copying images concurrently')
+        parser.add_argument('--rejects', help='Reject file (default: <path>.rejects.<ext>)')
+        parser.add_argument('--no-create', action='store_true', help='Reject rows with unknown brands/categories')
+        parser.add_argument('--no-variants', action='store_true', help='Skip rendering image variants')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        root, extension = os.path.splitext(path)
+        rejects = RejectWriter(options['rejects'] or f'{root}.rejects{extension}')
+        importer = CatalogImporter(
+            batch_size=options['batch_size'],
+            image_root=options['image_root'] or os.path.dirname(os.path.abspath(path)),
+            image_workers=options['image_workers'],
+            create_missing=not options['no_create'],
+            render_variants=not options['no_variants'],
+            dry_run=options['dry_run'],
+            rejects=rejects,
+            on_batch=self._progress if options['verbosity'] > 1 else None,
+        )
+        try:
+            stats = importer.run(read_rows(path, options['format']))
+        finally:
+            rejects.close()
+
+        self.stdout.write(
+            f'Read {stats.read} rows in {stats.elapsed:.1f}s ({stats.rows_per_second:.0f} rows/s), '
+            f'{stats.batches} batches, peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB'
+        )
+        if stats.brands_created or stats.categories_created:
+            self.stdout.write(f'Created {stats.brands_created} brands, {stats.categories_created} categories')
+        if stats.rejected:
+            self.stdout.write(self.style.WARNING(f'Rejected {stats.rejected} rows, see {rejects.path}'))
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {stats.imported} products'))
+
+    def _progress(self, stats):
+        self.stdout.write(
+            f'  batch {stats.batches}: {stats.imported} imported, {stats.rejected} rejected, '
+            f'{stats.rows_per_second:.0f} rows/s'
+        )
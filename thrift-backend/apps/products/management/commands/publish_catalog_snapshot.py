@@ -0,0 +1,24 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.products.snapshot import CatalogSnapshot, publish_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Publish a new generation of the memory-mapped catalog snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.CATALOG_SNAPSHOT_DIR,
+                            help='Snapshot directory shared by the workers')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        path = publish_snapshot(options['dir'])
+        elapsed = time.perf_counter() - started
+        snapshot = CatalogSnapshot(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Published generation {snapshot.generation}: {len(snapshot)} products, '
+            f'{os.path.getsize(path) / 1024:.1f} KiB in {elapsed:.2f}s'
+        ))
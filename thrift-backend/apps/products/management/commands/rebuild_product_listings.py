@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from apps.products.models import ProductListing, TShirt
+from apps.products.read_model import rebuild_listings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ProductListing catalog read model from TShirt rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk insert')
+        parser.add_argument('--check', action='store_true', help='Only report drift, do not rebuild')
+
+    def handle(self, *args, **options):
+        expected = TShirt.objects.filter(is_available=True).count()
+        actual = ProductListing.objects.count()
+        missing = TShirt.objects.filter(is_available=True, listing__isnull=True).count()
+        stale = ProductListing.objects.filter(tshirt__is_available=False).count()
+        self.stdout.write(
+            f'Available products: {expected}, listings: {actual}, missing: {missing}, stale: {stale}'
+        )
+
+        if options['check']:
+            return
+
+        written = rebuild_listings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} product listings'))
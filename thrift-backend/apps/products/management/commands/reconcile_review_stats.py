@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from apps.products.review_stats import reconcile_review_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute TShirtReviewStats from TShirtReview rows and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk write')
+        parser.add_argument('--check', action='store_true', help='Only report drift, do not fix it')
+
+    def handle(self, *args, **options):
+        drifted = reconcile_review_stats(fix=not options['check'], batch_size=options['batch_size'])
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Review stats are consistent'))
+        elif options['check']:
+            self.stdout.write(f'Review stats drifted for {len(drifted)} products')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Repaired review stats for {len(drifted)} products'))
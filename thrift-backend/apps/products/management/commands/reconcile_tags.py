@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from apps.common.response_cache import bump_model_version
+from apps.products.models import Tag
+from apps.products.tags import reconcile_tags
+
+
+class Command(BaseCommand):
+    help = 'Rebuild TShirtTag links from TShirt.tags and recount Tag.product_count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Products per batch')
+        parser.add_argument('--check', action='store_true', help='Only report drift, do not fix it')
+
+    def handle(self, *args, **options):
+        products, tags = reconcile_tags(fix=not options['check'], batch_size=options['batch_size'])
+        if not products and not tags:
+            self.stdout.write(self.style.SUCCESS('Tags are consistent'))
+        elif options['check']:
+            self.stdout.write(f'Tag links drifted for {len(products)} products, counts for {len(tags)} tags')
+        else:
+            bump_model_version(Tag)
+            self.stdout.write(self.style.SUCCESS(
+                f'Repaired tag links for {len(products)} products and counts for {len(tags)} tags'
+            ))
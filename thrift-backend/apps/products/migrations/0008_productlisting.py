@@ -0,0 +1,96 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0007_productreservation_quantity_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductListing",
+            fields=[
+                (
+                    "tshirt",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="listing",
+                        serialize=False,
+                        to="products.tshirt",
+                    ),
+                ),
+                ("title", models.CharField(max_length=200)),
+                ("slug", models.SlugField(max_length=200, unique=True)),
+                ("brand_name", models.CharField(max_length=100)),
+                ("brand_slug", models.SlugField(max_length=100)),
+                ("category_name", models.CharField(blank=True, max_length=100)),
+                ("category_slug", models.SlugField(blank=True, max_length=100)),
+                ("size", models.CharField(max_length=10)),
+                ("color", models.CharField(max_length=50)),
+                ("condition", models.CharField(max_length=20)),
+                ("gender", models.CharField(max_length=10)),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "original_price",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                ("discount_percentage", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "primary_image",
+                    models.CharField(
+                        blank=True,
+                        help_text="Storage name of the primary image",
+                        max_length=255,
+                    ),
+                ),
+                ("is_featured", models.BooleanField(default=False)),
+                ("quantity", models.PositiveIntegerField(default=1)),
+                ("created_at", models.DateTimeField()),
+                ("search_text", models.TextField(blank=True)),
+                (
+                    "brand",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="products.brand",
+                    ),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="products.category",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["is_featured", "created_at"],
+                        name="products_pr_is_feat_afdc19_idx",
+                    ),
+                    models.Index(
+                        fields=["brand", "size"], name="products_pr_brand_i_663883_idx"
+                    ),
+                    models.Index(
+                        fields=["category_slug"], name="products_pr_categor_4396f3_idx"
+                    ),
+                    models.Index(fields=["price"], name="products_pr_price_9e02a8_idx"),
+                    models.Index(
+                        fields=["created_at"], name="products_pr_created_56fb86_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_review_stats(apps, schema_editor):
+    TShirtReview = apps.get_model("products", "TShirtReview")
+    TShirtReviewStats = apps.get_model("products", "TShirtReviewStats")
+
+    stats = {}
+    rows = TShirtReview.objects.values("tshirt_id", "rating").annotate(n=models.Count("id"))
+    for row in rows:
+        entry = stats.setdefault(row["tshirt_id"], TShirtReviewStats(tshirt_id=row["tshirt_id"]))
+        entry.review_count += row["n"]
+        entry.rating_sum += row["rating"] * row["n"]
+        field = f"rating_{row['rating']}"
+        setattr(entry, field, getattr(entry, field) + row["n"])
+    TShirtReviewStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0008_productlisting"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TShirtReviewStats",
+            fields=[
+                (
+                    "tshirt",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="review_stats",
+                        serialize=False,
+                        to="products.tshirt",
+                    ),
+                ),
+                ("review_count", models.IntegerField(default=0)),
+                ("rating_sum", models.IntegerField(default=0)),
+                ("rating_1", models.IntegerField(default=0)),
+                ("rating_2", models.IntegerField(default=0)),
+                ("rating_3", models.IntegerField(default=0)),
+                ("rating_4", models.IntegerField(default=0)),
+                ("rating_5", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "T-shirt review stats",
+            },
+        ),
+        migrations.RunPython(backfill_review_stats, migrations.RunPython.noop),
+    ]
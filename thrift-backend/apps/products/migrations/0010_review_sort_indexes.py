@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0009_tshirtreviewstats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="tshirtreview",
+            index=models.Index(
+                fields=["tshirt", "created_at"], name="products_ts_tshirt__33a8ed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tshirtreview",
+            index=models.Index(
+                fields=["tshirt", "rating", "created_at"],
+                name="products_ts_tshirt__3dba37_idx",
+            ),
+        ),
+    ]
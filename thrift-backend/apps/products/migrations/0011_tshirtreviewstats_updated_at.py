@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0010_review_sort_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tshirtreviewstats",
+            name="updated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0011_tshirtreviewstats_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productlisting",
+            name="primary_image_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="tshirt",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.text import slugify
+
+
+def parse_tags(text):
+    pairs = {}
+    for raw in (text or "").split(","):
+        name = " ".join(raw.split()).lower()[:50]
+        slug = slugify(name)[:60]
+        if slug and slug not in pairs:
+            pairs[slug] = name
+    return pairs
+
+
+def backfill_tags(apps, schema_editor):
+    TShirt = apps.get_model("products", "TShirt")
+    Tag = apps.get_model("products", "Tag")
+    TShirtTag = apps.get_model("products", "TShirtTag")
+
+    rows = TShirt.objects.exclude(tags="").values_list("id", "tags", "is_available")
+    names = {}
+    for _, tags, _ in rows.iterator(chunk_size=2000):
+        for slug, name in parse_tags(tags).items():
+            names.setdefault(slug, name)
+    Tag.objects.bulk_create([Tag(slug=slug, name=name) for slug, name in names.items()], batch_size=1000)
+    tag_ids = dict(Tag.objects.values_list("slug", "id"))
+
+    counts = {}
+    links = []
+    for tshirt_id, tags, available in rows.iterator(chunk_size=2000):
+        for slug in parse_tags(tags):
+            links.append(TShirtTag(tshirt_id=tshirt_id, tag_id=tag_ids[slug], tshirt_available=available))
+            if available:
+                counts[tag_ids[slug]] = counts.get(tag_ids[slug], 0) + 1
+        if len(links) >= 2000:
+            TShirtTag.objects.bulk_create(links)
+            links = []
+    TShirtTag.objects.bulk_create(links)
+    Tag.objects.bulk_update(
+        [Tag(id=tag_id, product_count=count) for tag_id, count in counts.items()], ["product_count"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0012_image_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50)),
+                ("slug", models.SlugField(max_length=60, unique=True)),
+                ("product_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="TShirtTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tshirt_available", models.BooleanField(default=True)),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tshirt_links",
+                        to="products.tag",
+                    ),
+                ),
+                (
+                    "tshirt",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tag_links",
+                        to="products.tshirt",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                fields=["-product_count", "name"], name="products_ta_product_bf1b80_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tshirttag",
+            index=models.Index(
+                fields=["tag", "tshirt"], name="products_ts_tag_id_a5cf93_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="tshirttag",
+            unique_together={("tshirt", "tag")},
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
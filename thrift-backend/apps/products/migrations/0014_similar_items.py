@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0013_tags"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarTShirt",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("score", models.FloatField()),
+                (
+                    "similar",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="products.tshirt",
+                    ),
+                ),
+                (
+                    "tshirt",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar_items",
+                        to="products.tshirt",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["tshirt", "rank"],
+                "indexes": [
+                    models.Index(
+                        fields=["similar"], name="products_si_similar_a4ce4f_idx"
+                    )
+                ],
+                "unique_together": {("tshirt", "rank")},
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_reservation_stats(apps, schema_editor):
+    ProductReservation = apps.get_model("products", "ProductReservation")
+    ProductReservationStats = apps.get_model("products", "ProductReservationStats")
+
+    rows = (
+        ProductReservation.objects.filter(is_active=True)
+        .values("product_id")
+        .annotate(reserved=models.Sum("quantity"), next_expiry=models.Min("expires_at"))
+    )
+    ProductReservationStats.objects.bulk_create(
+        [
+            ProductReservationStats(
+                product_id=row["product_id"], reserved_quantity=row["reserved"], next_expiry=row["next_expiry"]
+            )
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0014_similar_items"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductReservationStats",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="reservation_stats",
+                        serialize=False,
+                        to="products.tshirt",
+                    ),
+                ),
+                ("reserved_quantity", models.IntegerField(default=0)),
+                ("next_expiry", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name_plural": "Product reservation stats",
+            },
+        ),
+        migrations.RunPython(backfill_reservation_stats, migrations.RunPython.noop),
+    ]
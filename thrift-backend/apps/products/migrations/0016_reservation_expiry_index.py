@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0015_productreservationstats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="productreservation",
+            index=models.Index(
+                fields=["is_active", "expires_at"], name="reservation_expiry_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def backfill_opening_stock(apps, schema_editor):
+    """Give every stocked product an applied opening movement, so its history starts from today's level."""
+    TShirt = apps.get_model("products", "TShirt")
+    StockMovement = apps.get_model("products", "StockMovement")
+    # Stamped now, not at product creation: earlier levels were never journalled.
+    opened = timezone.now()
+
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(
+                product_id=product_id,
+                kind="adjustment",
+                delta=quantity,
+                idempotency_key=f"opening:{product_id}",
+                quantity_after=quantity,
+                applied_at=opened,
+            )
+            for product_id, quantity in TShirt.objects.filter(quantity__gt=0).values_list("id", "quantity")
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0016_reservation_expiry_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("sale", "Order sale"),
+                            ("return", "Return"),
+                            ("adjustment", "Admin adjustment"),
+                            ("import", "Import"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("delta", models.IntegerField()),
+                ("idempotency_key", models.CharField(max_length=100, unique=True)),
+                ("reference", models.CharField(blank=True, max_length=100)),
+                ("quantity_after", models.IntegerField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("applied_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_movements",
+                        to="products.tshirt",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["product", "applied_at"],
+                        name="stock_movement_history_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("applied_at__isnull", True)),
+                        fields=["id"],
+                        name="stock_movement_pending_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_opening_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0017_stock_movements"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="tshirtreview",
+            index=models.Index(
+                fields=["tshirt", "rating", "-created_at", "-id"],
+                name="products_ts_tshirt__6978fb_idx",
+            ),
+        ),
+    ]
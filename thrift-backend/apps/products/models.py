@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -133,6 +133,8 @@ class TShirt(models.Model):
     image_2 = models.ImageField(upload_to='tshirts/', blank=True, null=True)
     image_3 = models.ImageField(upload_to='tshirts/', blank=True, null=True)
     image_4 = models.ImageField(upload_to='tshirts/', blank=True, null=True)
+    # Resized variants per image field, written by apps.products.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     class Meta:
         ordering = ['-created_at']
@@ -214,6 +216,54 @@ class TShirt(models.Model):
         self.save()
     
 
+class ProductListing(models.Model):
+    """Flat, denormalized read model for catalog list endpoints.
+
+    One row per available TShirt, kept in sync by the signals in
+    ``apps.products.signals`` and rebuilt in bulk by ``rebuild_product_listings``.
+    """
+    tshirt = models.OneToOneField(TShirt, on_delete=models.CASCADE, primary_key=True, related_name='listing')
+    title = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=200, unique=True)
+
+    # Denormalized brand/category columns (no join needed to render a card)
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='+')
+    brand_name = models.CharField(max_length=100)
+    brand_slug = models.SlugField(max_length=100)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    category_name = models.CharField(max_length=100, blank=True)
+    category_slug = models.SlugField(max_length=100, blank=True)
+
+    size = models.CharField(max_length=10)
+    color = models.CharField(max_length=50)
+    condition = models.CharField(max_length=20)
+    gender = models.CharField(max_length=10)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    original_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    discount_percentage = models.PositiveSmallIntegerField(default=0)
+    primary_image = models.CharField(max_length=255, blank=True, help_text="Storage name of the primary image")
+    primary_image_variants = models.JSONField(default=dict, blank=True)
+    is_featured = models.BooleanField(default=False)
+    quantity = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField()
+
+    # Lowercased title, description, brand, color and tags for search
+    search_text = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_featured', 'created_at']),
+            models.Index(fields=['brand', 'size']),
+            models.Index(fields=['category_slug']),
+            models.Index(fields=['price']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"Listing: {self.title}"
+
+
 class TShirtReview(models.Model):
     """Review model for t-shirts."""
     tshirt = models.ForeignKey(TShirt, on_delete=models.CASCADE, related_name='reviews')
@@ -228,9 +278,21 @@ class TShirtReview(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['tshirt', 'user']  # One review per user per product
+        indexes = [
+            # Back the cursor-paginated sort modes of product_reviews
+            models.Index(fields=['tshirt', 'created_at']),
+            models.Index(fields=['tshirt', 'rating', 'created_at']),
+            # rating_low mixes directions (rating up, newest first, then the -id tiebreaker).
+            models.Index(fields=['tshirt', 'rating', '-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.tshirt.title} ({self.rating}/5)"
+
+    def save(self, *args, **kwargs):
+        # TShirtReviewStats is updated from the save signals; commit both together.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
     
     @property
     def reviewer_initials(self):
@@ -247,6 +309,101 @@ class TShirtReview(models.Model):
         return delta.days
 
 
+class TShirtReviewStats(models.Model):
+    """Review aggregates for a TShirt.
+
+    Kept in step with TShirtReview writes by the signals in
+    ``apps.products.signals`` and repaired by ``reconcile_review_stats``.
+    """
+    tshirt = models.OneToOneField(TShirt, on_delete=models.CASCADE, primary_key=True, related_name='review_stats')
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
+    # Set explicitly on every change (F() updates bypass auto_now); feeds detail ETags
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'T-shirt review stats'
+
+    def __str__(self):
+        return f"Review stats: {self.tshirt_id} ({self.review_count})"
+
+    @property
+    def average_rating(self):
+        if self.review_count:
+            return round(self.rating_sum / self.review_count, 1)
+        return 0
+
+    @property
+    def histogram(self):
+        """Review count per star rating, 1 to 5."""
+        return {stars: getattr(self, f'rating_{stars}') for stars in range(1, 6)}
+
+
+class Tag(models.Model):
+    """A normalized product tag.
+
+    Rows and links are maintained from ``TShirt.tags`` by ``apps.products.tags``;
+    ``product_count`` counts available products carrying the tag.
+    """
+    name = models.CharField(max_length=50)
+    slug = models.SlugField(max_length=60, unique=True)
+    product_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['-product_count', 'name']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class TShirtTag(models.Model):
+    """Link between a TShirt and one of its tags."""
+    tshirt = models.ForeignKey(TShirt, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='tshirt_links')
+    # Denormalized TShirt.is_available: whether this link counts toward Tag.product_count
+    tshirt_available = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ['tshirt', 'tag']
+        indexes = [
+            models.Index(fields=['tag', 'tshirt']),
+        ]
+
+    def __str__(self):
+        return f"{self.tshirt_id} - {self.tag_id}"
+
+
+class SimilarTShirt(models.Model):
+    """Precomputed nearest neighbour of a TShirt, written by ``apps.products.similarity``.
+
+    Rows are kept for sold-out products too, so their pages can still point
+    to available alternatives; neighbours are always available products.
+    """
+    tshirt = models.ForeignKey(TShirt, on_delete=models.CASCADE, related_name='similar_items')
+    similar = models.ForeignKey(TShirt, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['tshirt', 'rank']
+        unique_together = ['tshirt', 'rank']
+        indexes = [
+            # Finds the rows to recompute when a product sells out
+            models.Index(fields=['similar']),
+        ]
+
+    def __str__(self):
+        return f"{self.tshirt_id} ~ {self.similar_id} ({self.score:.3f})"
+
+
 # Shipping Models for Dynamic Shipping Cost Calculator
 
 class ShippingZone(models.Model):
@@ -538,6 +695,10 @@ class ProductReservation(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['product', 'user']
+        indexes = [
+            # Expiry queue walked by the sweeper (apps.products.reservation_stats.expire_reservations)
+            models.Index(fields=['is_active', 'expires_at'], name='reservation_expiry_idx'),
+        ]
     
     def __str__(self):
         return f"{self.product.title} ({self.quantity}) reserved by {self.user.username}"
@@ -565,4 +726,63 @@ class ProductReservation(models.Model):
             self.extension_count += 1
             self.save()
             return True
-        return False
\ No newline at end of file
+        return False
+
+
+class ProductReservationStats(models.Model):
+    """Active-reservation totals for a TShirt, so availability is a single row read.
+
+    ``reserved_quantity`` is the quantity held by active reservations. It is
+    kept in step with ProductReservation writes by the signals in
+    ``apps.products.signals`` and repaired by ``reconcile_reservations``.
+    ``next_expiry`` is never later than the earliest expiry among those
+    reservations; once it has passed, the next availability check releases
+    the expired ones.
+    """
+    product = models.OneToOneField(TShirt, on_delete=models.CASCADE, primary_key=True, related_name='reservation_stats')
+    reserved_quantity = models.IntegerField(default=0)
+    next_expiry = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'Product reservation stats'
+
+    def __str__(self):
+        return f"Reservation stats: {self.product_id} ({self.reserved_quantity})"
+
+
+class StockMovement(models.Model):
+    """One change to a TShirt's stock, recorded once per ``idempotency_key``.
+
+    The journal is append-only: movements are inserted pending
+    (``applied_at`` unset) and ``apps.products.stock`` applies them to
+    ``TShirt.quantity`` in batches, filling in ``quantity_after`` (never
+    below zero). The latest applied movement at or before a moment gives
+    the stock level then.
+    """
+    KIND_CHOICES = [
+        ('sale', 'Order sale'),
+        ('return', 'Return'),
+        ('adjustment', 'Admin adjustment'),
+        ('import', 'Import'),
+    ]
+
+    product = models.ForeignKey(TShirt, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    delta = models.IntegerField()
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    reference = models.CharField(max_length=100, blank=True)
+    quantity_after = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    applied_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Point-in-time lookups (apps.products.stock.stock_at)
+            models.Index(fields=['product', 'applied_at'], name='stock_movement_history_idx'),
+            # Movements still waiting to be applied
+            models.Index(fields=['id'], name='stock_movement_pending_idx', condition=models.Q(applied_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.delta:+d} for {self.product_id}"
@@ -0,0 +1,198 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+CURSOR_MODE = 'cursor'
+CURSOR_VERSION = 'cursor'
+
+
+def wants_cursor_pagination(request):
+    """Check whether the client opted into keyset (infinite-scroll) pagination.
+
+    Clients opt in with ``?pagination=cursor``, by sending a ``cursor`` they got
+    from a previous page, or with an ``Accept: application/json; version=cursor``
+    header.
+    """
+    params = request.query_params
+    if params.get('pagination') == CURSOR_MODE or 'cursor' in params:
+        return True
+    return getattr(request, 'version', None) == CURSOR_VERSION
+
+
+def approximate_count(queryset, cap=1000):
+    """Cheap estimate of the number of rows in a queryset.
+
+    On PostgreSQL the planner's row estimate is used, which costs no scan at all.
+    Elsewhere the count is capped, so at most ``cap + 1`` rows are touched.
+
+    Returns:
+        tuple: (count, is_exact)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), False
+
+    count = queryset.order_by()[:cap + 1].count()
+    return min(count, cap), count <= cap
+
+
+class CatalogPagination(PageNumberPagination):
+    """Page-number pagination with an opt-in keyset (cursor) mode.
+
+    Page-number mode is unchanged for existing clients. Cursor mode orders by the
+    active ordering plus an ``id`` tiebreaker and seeks past the last row seen,
+    so it needs neither an exact ``COUNT(*)`` nor a deep ``OFFSET``.
+    """
+    cursor_query_param = 'cursor'
+    total_query_param = 'include_total'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def wants_cursor(self, request):
+        return wants_cursor_pagination(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.wants_cursor(request)
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            position = self.decode_cursor(encoded)
+            queryset = queryset.filter(self.seek_filter(queryset.model, position))
+
+        # The estimate is only offered on the first page; later pages reuse it.
+        self.total = None
+        if not encoded and request.query_params.get(self.total_query_param) in ('1', 'true', 'True'):
+            self.total = approximate_count(queryset)
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.cursor_page = rows[:self.page_size]
+        return self.cursor_page
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+
+        payload = OrderedDict([('next', self.get_next_cursor_link())])
+        if self.total is not None:
+            payload['approximate_count'], payload['count_is_exact'] = self.total
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['approximate_count'] = {'type': 'integer', 'nullable': True}
+        response_schema['properties']['count_is_exact'] = {'type': 'boolean', 'nullable': True}
+        return response_schema
+
+    def get_ordering(self, queryset):
+        """Return the active ordering with a unique primary-key tiebreaker appended."""
+        ordering = [
+            term for term in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(term, str)
+        ]
+        pk_name = queryset.model._meta.pk.attname
+        names = {term.lstrip('-') for term in ordering}
+        if pk_name not in names and 'pk' not in names:
+            last = ordering[-1] if ordering else pk_name
+            ordering.append(f'-{pk_name}' if last.startswith('-') else pk_name)
+        return ordering
+
+    def seek_filter(self, model, position):
+        """Build the lexicographic "row comes after position" condition."""
+        condition = Q()
+        equal_so_far = Q()
+        for term, raw_value in zip(self.ordering, position):
+            name = term.lstrip('-')
+            field = self._get_field(model, name)
+            try:
+                # Annotations (e.g. search_rank) have no model field to coerce with.
+                value = field.to_python(raw_value) if field is not None else raw_value
+            except Exception:
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if term.startswith('-') else 'gt'
+            condition |= equal_so_far & Q(**{f'{name}__{lookup}': value})
+            equal_so_far &= Q(**{name: value})
+        return condition
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        last = self.cursor_page[-1]
+        position = [self._cursor_value(self._attname_value(last, term.lstrip('-'))) for term in self.ordering]
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.total_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position))
+
+    def encode_cursor(self, position):
+        payload = json.dumps({'o': self.ordering, 'p': position}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, encoded):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            ordering, position = data['o'], data['p']
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # A cursor is only meaningful for the ordering it was issued under.
+        if ordering != self.ordering or len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    @staticmethod
+    def _get_field(model, name):
+        if name == 'pk':
+            return model._meta.pk
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def _attname_value(self, obj, name):
+        field = self._get_field(type(obj), name)
+        return getattr(obj, field.attname if field is not None else name)
+
+    @staticmethod
+    def _cursor_value(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if value is None or isinstance(value, (int, float, str)):
+            return value
+        return str(value)
+
+
+class ReviewPagination(CatalogPagination):
+    """Keyset-only pagination for review lists.
+
+    Review summaries come from TShirtReviewStats, so pages never need a count.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+    def wants_cursor(self, request):
+        return True
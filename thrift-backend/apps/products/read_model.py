@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.db import transaction
+
+from .models import ProductListing, TShirt
+
+
+def read_model_enabled():
+    """Check whether catalog list endpoints should serve from ProductListing."""
+    return getattr(settings, 'CATALOG_READ_MODEL_ENABLED', False)
+
+
+def build_search_text(tshirt):
+    """Lowercased text the listing search runs against."""
+    parts = [tshirt.title, tshirt.description, tshirt.brand.name, tshirt.color, tshirt.tags]
+    return ' '.join(part for part in parts if part).lower()
+
+
+def build_listing(tshirt):
+    """Build an unsaved ProductListing row for a TShirt.
+
+    Expects ``brand`` and ``category`` to be loaded (or cheap to load).
+    """
+    category = tshirt.category
+    return ProductListing(
+        tshirt_id=tshirt.pk,
+        title=tshirt.title,
+        slug=tshirt.slug,
+        brand_id=tshirt.brand_id,
+        brand_name=tshirt.brand.name,
+        brand_slug=tshirt.brand.slug,
+        category_id=tshirt.category_id,
+        category_name=category.name if category else '',
+        category_slug=category.slug if category else '',
+        size=tshirt.size,
+        color=tshirt.color,
+        condition=tshirt.condition,
+        gender=tshirt.gender,
+        price=tshirt.price,
+        original_price=tshirt.original_price,
+        discount_percentage=tshirt.discount_percentage,
+        primary_image=tshirt.primary_image.name or '',
+        primary_image_variants=(tshirt.image_variants or {}).get('primary_image', {}),
+        is_featured=tshirt.is_featured,
+        quantity=tshirt.quantity,
+        created_at=tshirt.created_at,
+        search_text=build_search_text(tshirt),
+    )
+
+
+def sync_listing(tshirt):
+    """Upsert or remove the listing row for a single TShirt."""
+    if not tshirt.is_available:
+        ProductListing.objects.filter(tshirt_id=tshirt.pk).delete()
+        return None
+
+    listing = build_listing(tshirt)
+    listing.save()
+    return listing
+
+
+def refresh_listings(queryset, batch_size=500):
+    """Rebuild the listing rows for every TShirt in ``queryset``.
+
+    Returns:
+        int: Number of listing rows written
+    """
+    queryset = queryset.select_related('brand', 'category').order_by()
+    written = 0
+    with transaction.atomic():
+        ProductListing.objects.filter(tshirt__in=queryset.values('pk')).delete()
+        batch = []
+        for tshirt in queryset.filter(is_available=True).iterator(chunk_size=batch_size):
+            batch.append(build_listing(tshirt))
+            if len(batch) >= batch_size:
+                ProductListing.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            ProductListing.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def rebuild_listings(batch_size=500):
+    """Drop and rebuild the whole read model."""
+    with transaction.atomic():
+        ProductListing.objects.all().delete()
+        return refresh_listings(TShirt.objects.all(), batch_size=batch_size)
@@ -0,0 +1,396 @@
+"""Atomic check-and-hold for product reservations, outside the database.
+
+A drop puts many shoppers on the same one-off tee at once. Checking stock
+and writing a ProductReservation under a ``select_for_update()`` on the
+TShirt row serializes every one of those requests on one row lock. With
+RESERVATION_ENGINE set, holds live in an engine that checks "stock minus
+everyone else's unexpired holds" and sets the caller's hold in a single
+atomic step:
+
+* ``redis``: one Lua script per operation against a hash of holds per
+  product (``reservation:{<id>}:holds``, ``user id -> "qty:expires_ms"``),
+  shared by every web process.
+* ``memory``: the same algorithm on a dict under a lock, for tests and
+  single-process deployments.
+
+Stock is always passed in by the caller from the TShirt row it has
+already read, so the engine never needs to be told about stock changes.
+The first operation on a product seeds its holds from the active
+ProductReservation rows.
+
+Holds placed inside ``atomic_with_holds`` are put back as they were if
+the transaction rolls back; releases wait for the commit
+(``release_hold``), so a failed request never frees or keeps stock the
+database disagrees with. Redis keys expire after RESERVATION_REDIS_KEY_TTL
+of inactivity and are then reseeded from the database.
+
+ProductReservation stays the durable record (the sweeper and reconcile
+command work on it); with an engine configured, availability reads come
+from the engine, since the stored counter lags the asynchronous
+write-through. ``write_through`` persists the
+engine's current hold for a (product, user) pair after the request
+commits, from a background writer thread when
+RESERVATION_WRITE_THROUGH_ASYNC is on. The writer always copies the
+engine's latest state, so writes that arrive out of order still converge.
+"""
+import datetime
+import functools
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ProductReservation
+
+logger = logging.getLogger(__name__)
+
+# Returned by a backend when the product's holds have not been seeded yet.
+_UNSEEDED = -1
+
+# Per-thread log of (engine, product id, user id, previous hold) inside undo_holds_on_error.
+_scope = threading.local()
+
+
+def _millis(moment):
+    return int(moment.timestamp() * 1000)
+
+
+def _load_holds(product_id):
+    """{user id: (quantity, expires ms)} for a product's active, unexpired reservations."""
+    return {
+        user_id: (quantity, _millis(expires_at))
+        for user_id, quantity, expires_at in ProductReservation.objects.filter(
+            product_id=product_id, is_active=True, expires_at__gt=timezone.now()
+        ).order_by().values_list('user_id', 'quantity', 'expires_at')
+    }
+
+
+class ReservationEngine:
+    """Check-and-hold operations shared by the backends.
+
+    Backends implement ``_run`` (the atomic step), ``_seed``, ``_get`` and
+    ``_set`` (unconditional, used to undo a hold).
+    ``_run`` sets the user's hold to ``quantity`` when it fits (0 releases
+    it, a negative quantity only reads) and returns ``(status, available)``
+    where status is 1 (held), 0 (refused) or ``_UNSEEDED``.
+    """
+
+    def hold(self, product_id, user_id, quantity, stock, expires_at):
+        """Set the user's hold to ``quantity`` if stock minus the other holds allows it.
+
+        Returns:
+            tuple: (held, available) where ``available`` is the most this
+            user could hold right now
+        """
+        undo = getattr(_scope, 'undo', None)
+        previous = None
+        if undo is not None:
+            # Seed first, so the previous hold is known before it is overwritten.
+            self._call(product_id, user_id, -1, 0, 0)
+            previous = self._get(product_id, user_id)
+        held, available = self._call(product_id, user_id, quantity, stock, _millis(expires_at))
+        if held and undo is not None:
+            undo.append((self, product_id, user_id, previous))
+        return bool(held), available
+
+    def release(self, product_id, user_id):
+        self._call(product_id, user_id, 0, 0, 0)
+
+    def available(self, product_id, user_id, stock):
+        """Stock minus the unexpired holds of everyone but ``user_id``."""
+        return self._call(product_id, user_id, -1, stock, 0)[1]
+
+    def current(self, product_id, user_id):
+        """(quantity, expires_at) of the user's unexpired hold, or None."""
+        hold = self._get(product_id, user_id)
+        if hold is None or hold[1] <= _millis(timezone.now()):
+            return None
+        quantity, expires_ms = hold
+        return quantity, datetime.datetime.fromtimestamp(expires_ms / 1000, tz=datetime.timezone.utc)
+
+    def _call(self, product_id, user_id, quantity, stock, expires_ms):
+        args = (product_id, user_id, quantity, stock, expires_ms, _millis(timezone.now()))
+        result = self._run(*args)
+        if result[0] == _UNSEEDED:
+            self._seed(product_id, _load_holds(product_id))
+            result = self._run(*args)
+        return result
+
+
+class InProcessReservationEngine(ReservationEngine):
+    """Holds in a dict guarded by one lock; only correct with a single web process."""
+
+    def __init__(self):
+        self._holds = {}
+        self._lock = threading.Lock()
+
+    def _run(self, product_id, user_id, quantity, stock, expires_ms, now_ms):
+        with self._lock:
+            holds = self._holds.get(product_id)
+            if holds is None:
+                return _UNSEEDED, 0
+            others = 0
+            for holder, (held, held_until) in list(holds.items()):
+                if held_until <= now_ms:
+                    del holds[holder]
+                elif holder != user_id:
+                    others += held
+            available = max(stock - others, 0)
+            if quantity < 0:
+                return 1, available
+            if quantity > available:
+                return 0, available
+            if quantity:
+                holds[user_id] = (quantity, expires_ms)
+            else:
+                holds.pop(user_id, None)
+            return 1, available
+
+    def _seed(self, product_id, holds):
+        with self._lock:
+            self._holds.setdefault(product_id, holds)
+
+    def _set(self, product_id, user_id, hold):
+        with self._lock:
+            holds = self._holds.setdefault(product_id, {})
+            if hold is None:
+                holds.pop(user_id, None)
+            else:
+                holds[user_id] = hold
+
+    def _get(self, product_id, user_id):
+        with self._lock:
+            return self._holds.get(product_id, {}).get(user_id)
+
+
+# KEYS: holds hash, seeded marker. ARGV: user id, quantity, stock, expires ms, now ms, key TTL ms.
+# Every call pushes both keys' expiry out, so only products idle for the TTL get reseeded.
+_HOLD_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return {-1, 0}
+end
+local user, quantity, stock = ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3])
+local now = tonumber(ARGV[5])
+redis.call('PEXPIRE', KEYS[1], ARGV[6])
+redis.call('PEXPIRE', KEYS[2], ARGV[6])
+local others = 0
+local holds = redis.call('HGETALL', KEYS[1])
+for i = 1, #holds, 2 do
+    local held, held_until = string.match(holds[i + 1], '(%d+):(%d+)')
+    if tonumber(held_until) <= now then
+        redis.call('HDEL', KEYS[1], holds[i])
+    elseif holds[i] ~= user then
+        others = others + tonumber(held)
+    end
+end
+local available = math.max(stock - others, 0)
+if quantity < 0 then
+    return {1, available}
+end
+if quantity > available then
+    return {0, available}
+end
+if quantity > 0 then
+    redis.call('HSET', KEYS[1], user, quantity .. ':' .. ARGV[4])
+else
+    redis.call('HDEL', KEYS[1], user)
+end
+return {1, available}
+"""
+
+# KEYS: holds hash, seeded marker. ARGV: key TTL ms, then user id, "qty:expires_ms" pairs.
+# HSETNX keeps any hold the engine placed since: it is newer than the database row.
+_SEED_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HSETNX', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('SET', KEYS[2], 1, 'PX', ARGV[1])
+redis.call('PEXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class RedisReservationEngine(ReservationEngine):
+    """Holds in Redis, checked and written by one Lua script per operation.
+
+    Keys carry the product id as a hash tag, so both keys of a product land
+    on the same Redis Cluster slot.
+    """
+
+    def __init__(self, url, key_ttl):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._key_ttl_ms = key_ttl * 1000
+        self._hold = self._client.register_script(_HOLD_SCRIPT)
+        self._seed_holds = self._client.register_script(_SEED_SCRIPT)
+
+    @staticmethod
+    def _keys(product_id):
+        return [f'reservation:{{{product_id}}}:holds', f'reservation:{{{product_id}}}:seeded']
+
+    def _run(self, product_id, user_id, quantity, stock, expires_ms, now_ms):
+        status, available = self._hold(
+            keys=self._keys(product_id), args=[user_id or '', quantity, stock, expires_ms, now_ms, self._key_ttl_ms]
+        )
+        return int(status), int(available)
+
+    def _seed(self, product_id, holds):
+        args = [self._key_ttl_ms]
+        for user_id, (quantity, expires_ms) in holds.items():
+            args += [user_id, f'{quantity}:{expires_ms}']
+        self._seed_holds(keys=self._keys(product_id), args=args)
+
+    def _get(self, product_id, user_id):
+        value = self._client.hget(self._keys(product_id)[0], user_id)
+        if value is None:
+            return None
+        quantity, expires_ms = value.decode().split(':')
+        return int(quantity), int(expires_ms)
+
+    def _set(self, product_id, user_id, hold):
+        key = self._keys(product_id)[0]
+        if hold is None:
+            self._client.hdel(key, user_id)
+        else:
+            self._client.hset(key, user_id, '%d:%d' % hold)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_reservation_engine():
+    """This process's engine for RESERVATION_ENGINE, or None when holds go straight to the database."""
+    global _engine
+    backend = settings.RESERVATION_ENGINE
+    if backend not in ('memory', 'redis'):
+        return None
+    with _engine_lock:
+        if _engine is None:
+            if backend == 'redis':
+                _engine = RedisReservationEngine(settings.RESERVATION_REDIS_URL, settings.RESERVATION_REDIS_KEY_TTL)
+            else:
+                _engine = InProcessReservationEngine()
+        return _engine
+
+
+def reset_reservation_engine():
+    global _engine
+    with _engine_lock:
+        _engine = None
+
+
+@contextmanager
+def undo_holds_on_error():
+    """Put holds placed inside the block back as they were if it raises."""
+    outer = getattr(_scope, 'undo', None)
+    _scope.undo = undo = []
+    try:
+        yield
+    except BaseException:
+        for engine, product_id, user_id, previous in reversed(undo):
+            try:
+                engine._set(product_id, user_id, previous)
+            except Exception:
+                logger.exception('Could not undo reservation hold for product %s, user %s', product_id, user_id)
+        raise
+    finally:
+        _scope.undo = outer
+        if outer is not None:
+            outer.extend(undo)
+
+
+def atomic_with_holds(func):
+    """``transaction.atomic`` for a view that places engine holds: a rollback undoes them too."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with undo_holds_on_error(), transaction.atomic():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def release_hold(product_id, user_id):
+    """Release the user's engine hold and its reservation row once the current transaction commits."""
+    engine = get_reservation_engine()
+    if engine is None:
+        return
+    transaction.on_commit(lambda: engine.release(product_id, user_id))
+    write_through(product_id, user_id)
+
+
+def persist_hold(product_id, user_id):
+    """Make the user's ProductReservation match the engine's current hold.
+
+    No hold (released or expired) deletes the row, as removing a cart item
+    does; the reservation signals keep ProductReservationStats in step.
+    """
+    engine = get_reservation_engine()
+    if engine is None:
+        return
+    current = engine.current(product_id, user_id)
+    with transaction.atomic():
+        reservation = ProductReservation.objects.select_for_update().filter(
+            product_id=product_id, user_id=user_id
+        ).first()
+        if current is None:
+            if reservation is not None:
+                reservation.delete()
+            return
+        quantity, expires_at = current
+        if reservation is None:
+            ProductReservation.objects.create(
+                product_id=product_id, user_id=user_id, quantity=quantity, expires_at=expires_at, is_active=True
+            )
+        elif (reservation.quantity, reservation.expires_at, reservation.is_active) != (quantity, expires_at, True):
+            reservation.quantity, reservation.expires_at, reservation.is_active = quantity, expires_at, True
+            reservation.save(update_fields=['quantity', 'expires_at', 'is_active'])
+
+
+_pending = {}
+_pending_ready = threading.Condition()
+_writer = None
+
+
+def _write_forever():
+    while True:
+        with _pending_ready:
+            while not _pending:
+                _pending_ready.wait()
+            batch = list(_pending)
+            _pending.clear()
+        for product_id, user_id in batch:
+            try:
+                persist_hold(product_id, user_id)
+            except Exception:
+                logger.exception('Reservation write-through failed for product %s, user %s', product_id, user_id)
+        close_old_connections()
+
+
+def _enqueue(product_id, user_id):
+    global _writer
+    with _pending_ready:
+        # Repeated changes to one hold collapse into a single write of its latest state.
+        _pending[(product_id, user_id)] = None
+        if _writer is None:
+            _writer = threading.Thread(target=_write_forever, name='reservation-writer', daemon=True)
+            _writer.start()
+        _pending_ready.notify()
+
+
+def write_through(product_id, user_id):
+    """Persist the user's hold once the current transaction commits.
+
+    Queued for the background writer when RESERVATION_WRITE_THROUGH_ASYNC is
+    on, written inline otherwise.
+    """
+    if settings.RESERVATION_WRITE_THROUGH_ASYNC:
+        transaction.on_commit(lambda: _enqueue(product_id, user_id))
+    else:
+        transaction.on_commit(lambda: persist_hold(product_id, user_id))
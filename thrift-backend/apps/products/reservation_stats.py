@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Min, Sum, Value
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from .models import ProductReservation, ProductReservationStats, TShirt
+
+logger = logging.getLogger(__name__)
+
+
+def apply_reservation_change(product_id, delta, expires_at=None):
+    """Add ``delta`` to a product's reserved quantity.
+
+    Pass ``expires_at`` when a reservation becomes (or stays) active so
+    ``next_expiry`` is pulled forward to it if it is earlier. Uses F()
+    increments like ``apply_review_change``; removals never create a row.
+    """
+    changes = {}
+    if delta:
+        changes['reserved_quantity'] = F('reserved_quantity') + delta
+    if expires_at is not None:
+        changes['next_expiry'] = Least(Coalesce('next_expiry', Value(expires_at)), Value(expires_at))
+    if not changes:
+        return
+    with transaction.atomic():
+        if delta > 0 or expires_at is not None:
+            ProductReservationStats.objects.get_or_create(product_id=product_id)
+        ProductReservationStats.objects.filter(product_id=product_id).update(**changes)
+
+
+def _settle(product_ids, released):
+    """Subtract released quantities and recompute ``next_expiry`` for the given products.
+
+    Must run inside a transaction; locks the stats rows so concurrent
+    reservation writes to those products wait for it.
+    """
+    product_ids = list(product_ids)
+    locked = list(ProductReservationStats.objects.select_for_update().filter(product_id__in=product_ids))
+    next_expiry = dict(
+        ProductReservation.objects.filter(product_id__in=product_ids, is_active=True).order_by()
+        .values('product_id').annotate(next_expiry=Min('expires_at')).values_list('product_id', 'next_expiry')
+    )
+    for stats in locked:
+        stats.reserved_quantity = max(stats.reserved_quantity - released.get(stats.product_id, 0), 0)
+        stats.next_expiry = next_expiry.get(stats.product_id)
+    ProductReservationStats.objects.bulk_update(locked, ['reserved_quantity', 'next_expiry'])
+
+
+def expire_reservations(batch_size=500, product_ids=None, now=None):
+    """Deactivate active reservations past their expiry and release their quantity.
+
+    Walks the ``(is_active, expires_at)`` index oldest first, ``batch_size``
+    reservations per transaction. Rows another sweeper has locked are
+    skipped rather than waited for. ``product_ids`` limits the sweep to
+    those products.
+
+    Returns:
+        int: reservations expired
+    """
+    now = now or timezone.now()
+    due = ProductReservation.objects.filter(is_active=True, expires_at__lte=now)
+    if product_ids is not None:
+        due = due.filter(product_id__in=list(product_ids))
+    expired = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                due.order_by('expires_at').select_for_update(skip_locked=True)
+                .values_list('id', 'product_id', 'quantity')[:batch_size]
+            )
+            if not rows:
+                break
+            ProductReservation.objects.filter(id__in=[row[0] for row in rows]).update(is_active=False)
+            released = defaultdict(int)
+            for _, row_product_id, quantity in rows:
+                released[row_product_id] += quantity
+            _settle(released, released)
+        expired += len(rows)
+        if len(rows) < batch_size:
+            break
+    return expired
+
+
+def release_expired_reservations(product_ids):
+    """Expire the given products' overdue reservations now, without waiting for the sweeper.
+
+    Returns:
+        dict: product id -> reserved quantity afterwards
+    """
+    product_ids = list(product_ids)
+    expire_reservations(product_ids=product_ids)
+    with transaction.atomic():
+        # Also corrects a next_expiry that was merely early (e.g. after an extension).
+        _settle(product_ids, {})
+    return dict(
+        ProductReservationStats.objects.filter(product_id__in=product_ids)
+        .values_list('product_id', 'reserved_quantity')
+    )
+
+
+def _overdue(reserved, next_expiry, now):
+    return bool(reserved) and next_expiry is not None and next_expiry <= now
+
+
+def reserved_quantity(product_id):
+    """Quantity held by active reservations: one row read.
+
+    Reservations that expired since the last sweep are released here first,
+    so callers can trust ``is_active`` on this product's reservations
+    afterwards without comparing ``expires_at``.
+    """
+    ensure_reservation_sweeper()
+    row = ProductReservationStats.objects.filter(product_id=product_id).values_list(
+        'reserved_quantity', 'next_expiry'
+    ).first()
+    if row is None:
+        return 0
+    reserved, next_expiry = row
+    if _overdue(reserved, next_expiry, timezone.now()):
+        return release_expired_reservations([product_id]).get(product_id, 0)
+    return reserved
+
+
+def stock_and_reserved(product_ids):
+    """{product id: (quantity, reserved quantity)} for many products in one query.
+
+    Like ``reserved_quantity``, overdue reservations of those products are
+    released first (one extra sweep, only when some are overdue).
+    """
+    ensure_reservation_sweeper()
+    rows = TShirt.objects.filter(id__in=product_ids).order_by().values_list(
+        'id', 'quantity', 'reservation_stats__reserved_quantity', 'reservation_stats__next_expiry'
+    )
+    now = timezone.now()
+    result, overdue = {}, []
+    for product_id, quantity, reserved, next_expiry in rows:
+        result[product_id] = (quantity, reserved or 0)
+        if _overdue(reserved, next_expiry, now):
+            overdue.append(product_id)
+    if overdue:
+        for product_id, reserved in release_expired_reservations(overdue).items():
+            result[product_id] = (result[product_id][0], reserved)
+    return result
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def _sweep_forever(interval, batch_size):
+    while True:
+        time.sleep(interval)
+        try:
+            expire_reservations(batch_size=batch_size)
+        except Exception:
+            logger.exception('Reservation sweep failed')
+        finally:
+            close_old_connections()
+
+
+def ensure_reservation_sweeper():
+    """Start the in-process sweeper thread if RESERVATION_SWEEPER_THREAD is on and it isn't running."""
+    global _sweeper
+    if _sweeper is not None or not settings.RESERVATION_SWEEPER_THREAD:
+        return
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(
+                target=_sweep_forever,
+                args=(settings.RESERVATION_SWEEPER_INTERVAL, settings.RESERVATION_SWEEP_BATCH_SIZE),
+                name='reservation-sweeper',
+                daemon=True,
+            )
+            _sweeper.start()
+
+
+def reconcile_reservation_stats(fix=True, batch_size=500):
+    """Compare stored reserved quantities with the active reservations and optionally repair them.
+
+    Returns:
+        list: product ids whose stored stats had drifted
+    """
+    expected = {
+        row['product_id']: (row['reserved'], row['next_expiry'])
+        for row in ProductReservation.objects.filter(is_active=True).order_by().values('product_id').annotate(
+            reserved=Sum('quantity'), next_expiry=Min('expires_at')
+        )
+    }
+    drifted, to_create, to_update = [], [], []
+    stored = {stats.product_id: stats for stats in ProductReservationStats.objects.all()}
+    for product_id, (reserved, next_expiry) in expected.items():
+        current = stored.pop(product_id, None)
+        if current is None:
+            drifted.append(product_id)
+            to_create.append(ProductReservationStats(
+                product_id=product_id, reserved_quantity=reserved, next_expiry=next_expiry
+            ))
+        elif current.reserved_quantity != reserved or current.next_expiry is None or current.next_expiry > next_expiry:
+            # An early next_expiry only costs one extra release pass; a late (or missing) one hides expiries.
+            drifted.append(product_id)
+            current.reserved_quantity, current.next_expiry = reserved, next_expiry
+            to_update.append(current)
+    # Rows left over belong to products without active reservations.
+    for current in stored.values():
+        if current.reserved_quantity:
+            drifted.append(current.product_id)
+            current.reserved_quantity, current.next_expiry = 0, None
+            to_update.append(current)
+
+    if fix and drifted:
+        with transaction.atomic():
+            ProductReservationStats.objects.bulk_create(to_create, batch_size=batch_size)
+            ProductReservationStats.objects.bulk_update(
+                to_update, ['reserved_quantity', 'next_expiry'], batch_size=batch_size
+            )
+    return drifted
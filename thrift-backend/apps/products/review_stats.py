@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Count, F
+
+from .models import TShirtReview, TShirtReviewStats
+
+
+def apply_review_change(tshirt_id, rating, delta):
+    """Add (``delta=1``) or remove (``delta=-1``) one rating from a product's stats.
+
+    Uses F() increments, so concurrent reviews of the same product don't lose
+    updates. Removals never create a row: during a cascading TShirt delete the
+    stats row may already be gone.
+    """
+    changes = {
+        'review_count': F('review_count') + delta,
+        'rating_sum': F('rating_sum') + rating * delta,
+        f'rating_{rating}': F(f'rating_{rating}') + delta,
+        'updated_at': timezone.now(),
+    }
+    with transaction.atomic():
+        if delta > 0:
+            TShirtReviewStats.objects.get_or_create(tshirt_id=tshirt_id)
+        TShirtReviewStats.objects.filter(tshirt_id=tshirt_id).update(**changes)
+
+
+def compute_review_stats(tshirt_ids=None):
+    """Aggregate stats from the review table.
+
+    Returns:
+        dict: tshirt_id -> unsaved TShirtReviewStats
+    """
+    reviews = TShirtReview.objects.all()
+    if tshirt_ids is not None:
+        reviews = reviews.filter(tshirt_id__in=tshirt_ids)
+
+    stats = {}
+    rows = reviews.order_by().values('tshirt_id', 'rating').annotate(n=Count('id'))
+    for row in rows:
+        entry = stats.setdefault(row['tshirt_id'], TShirtReviewStats(tshirt_id=row['tshirt_id']))
+        entry.review_count += row['n']
+        entry.rating_sum += row['rating'] * row['n']
+        field = f"rating_{row['rating']}"
+        setattr(entry, field, getattr(entry, field) + row['n'])
+    return stats
+
+
+STAT_FIELDS = ['review_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+
+
+def reconcile_review_stats(fix=True, batch_size=500):
+    """Compare stored stats with the review table and optionally repair them.
+
+    Returns:
+        list: tshirt ids whose stored stats had drifted
+    """
+    expected = compute_review_stats()
+    drifted = []
+    to_create, to_update = [], []
+
+    stored = {stats.tshirt_id: stats for stats in TShirtReviewStats.objects.all()}
+    for tshirt_id, stats in expected.items():
+        current = stored.pop(tshirt_id, None)
+        if current is None:
+            drifted.append(tshirt_id)
+            to_create.append(stats)
+        elif any(getattr(current, field) != getattr(stats, field) for field in STAT_FIELDS):
+            drifted.append(tshirt_id)
+            to_update.append(stats)
+    # Rows left over belong to products that no longer have reviews.
+    emptied = [tshirt_id for tshirt_id, current in stored.items() if current.review_count or current.rating_sum]
+    drifted.extend(emptied)
+
+    if fix and drifted:
+        now = timezone.now()
+        for stats in to_create + to_update:
+            stats.updated_at = now
+        with transaction.atomic():
+            TShirtReviewStats.objects.bulk_create(to_create, batch_size=batch_size)
+            TShirtReviewStats.objects.bulk_update(to_update, STAT_FIELDS + ['updated_at'], batch_size=batch_size)
+            TShirtReviewStats.objects.filter(tshirt_id__in=emptied).delete()
+    return drifted
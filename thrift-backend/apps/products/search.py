@@ -0,0 +1,347 @@
+"""In-process full-text search over the available catalog.
+
+The index maps stemmed terms to postings (TShirt id -> weighted term
+frequency) and ranks matches with BM25. It is updated incrementally from the
+TShirt signals, persisted as a compact marshal+zlib snapshot and caught up
+from the database when a worker loads it.
+"""
+import bisect
+import logging
+import marshal
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# Field weights: a hit in the title counts three times a hit in the description.
+FIELD_WEIGHTS = {
+    'title': 3,
+    'brand': 2,
+    'color': 2,
+    'tags': 2,
+    'description': 1,
+}
+
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is',
+    'it', 'its', 'of', 'on', 'or', 'the', 'this', 'to', 'with',
+})
+
+# Apparel spelling variants folded onto one term before stemming.
+SYNONYMS = {
+    'tshirt': 'tee',
+    'tshirts': 'tee',
+    'shirt': 'tee',
+    'shirts': 'tee',
+    'grey': 'gray',
+    'colour': 'color',
+    'colours': 'color',
+    'hoody': 'hoodie',
+}
+
+_T_SHIRT_RE = re.compile(r'\bt[\s\-]?shirts?\b')
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def stem(word):
+    """Harman "S" stemmer: strips plural endings and nothing else.
+
+    Apparel text is mostly nouns and adjectives, where aggressive stemming
+    (e.g. Porter) merges unrelated words like "printed"/"print" with "prints".
+    """
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith('ies') and not word.endswith(('eies', 'aies')):
+        return word[:-3] + 'y'
+    if word.endswith('es') and not word.endswith(('aes', 'ees', 'oes')):
+        return word[:-1]
+    if word.endswith('s') and not word.endswith(('us', 'ss')):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Split text into normalized, stemmed terms (stopwords removed)."""
+    if not text:
+        return []
+    text = _T_SHIRT_RE.sub(' tee ', text.lower())
+    terms = []
+    for token in _TOKEN_RE.findall(text):
+        if token in STOPWORDS:
+            continue
+        token = SYNONYMS.get(token, token)
+        terms.append(stem(token))
+    return terms
+
+
+def document_fields(tshirt):
+    """Searchable text of a TShirt, keyed like FIELD_WEIGHTS."""
+    return {
+        'title': tshirt.title,
+        'brand': tshirt.brand.name,
+        'color': tshirt.color,
+        'tags': tshirt.tags.replace(',', ' '),
+        'description': tshirt.description,
+    }
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking.
+
+    ``postings`` maps term -> {doc_id: weighted tf}; ``doc_terms`` keeps each
+    document's terms so it can be removed without scanning the vocabulary.
+    """
+    k1 = 1.2
+    b = 0.75
+    prefix_weight = 0.7
+
+    def __init__(self):
+        self.postings = {}
+        self.doc_lengths = {}
+        self.doc_terms = {}
+        self.total_length = 0
+        self.synced_at = None
+        self._vocabulary = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_lengths
+
+    # Mutation
+
+    def add(self, doc_id, fields):
+        """Index (or re-index) a document given its field texts."""
+        frequencies = Counter()
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1)
+            for term in tokenize(text):
+                frequencies[term] += weight
+
+        with self._lock:
+            self._remove(doc_id)
+            for term, tf in frequencies.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = {}
+                    self._vocabulary = None
+                postings[doc_id] = tf
+            length = sum(frequencies.values())
+            self.doc_lengths[doc_id] = length
+            self.doc_terms[doc_id] = tuple(frequencies)
+            self.total_length += length
+
+    def add_tshirt(self, tshirt):
+        self.add(tshirt.pk, document_fields(tshirt))
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+                self._vocabulary = None
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    # Query
+
+    def _expand(self, term):
+        """The term itself plus vocabulary terms it is a prefix of."""
+        expansions = [(term, 1.0)] if term in self.postings else []
+        if len(term) < 3:
+            return expansions
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        start = bisect.bisect_right(vocabulary, term)
+        for candidate in vocabulary[start:]:
+            if not candidate.startswith(term):
+                break
+            expansions.append((candidate, self.prefix_weight))
+        return expansions
+
+    def search(self, query, limit=None):
+        """Rank documents matching every query term.
+
+        Each query term also matches vocabulary terms it is a prefix of, which
+        keeps the as-you-type behaviour of the old ``icontains`` search.
+
+        Returns:
+            list: (doc_id, score) pairs, best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            doc_count = len(self.doc_lengths)
+            if not doc_count:
+                return []
+            average_length = self.total_length / doc_count
+
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for candidate, weight in self._expand(term):
+                    postings = self.postings[candidate]
+                    df = len(postings)
+                    idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                    for doc_id, tf in postings.items():
+                        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                        score = weight * idf * tf * (self.k1 + 1) / (tf + norm)
+                        if score > term_scores.get(doc_id, 0):
+                            term_scores[doc_id] = score
+                if not term_scores:
+                    return []
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        doc_id: score + term_scores[doc_id]
+                        for doc_id, score in scores.items()
+                        if doc_id in term_scores
+                    }
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit] if limit else ranked
+
+    # Persistence
+
+    def save(self, path):
+        """Write a compressed snapshot atomically."""
+        with self._lock:
+            payload = {
+                'version': SNAPSHOT_VERSION,
+                'synced_at': self.synced_at.timestamp() if self.synced_at else None,
+                'postings': self.postings,
+                'doc_lengths': self.doc_lengths,
+                'doc_terms': self.doc_terms,
+            }
+            data = zlib.compress(marshal.dumps(payload), 6)
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        with open(tmp_path, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as fh:
+            payload = marshal.loads(zlib.decompress(fh.read()))
+        if payload.get('version') != SNAPSHOT_VERSION:
+            raise ValueError('Unsupported search snapshot version')
+
+        index = cls()
+        index.postings = payload['postings']
+        index.doc_lengths = payload['doc_lengths']
+        index.doc_terms = payload['doc_terms']
+        index.total_length = sum(index.doc_lengths.values())
+        if payload['synced_at'] is not None:
+            index.synced_at = datetime.fromtimestamp(payload['synced_at'], tz=dt_timezone.utc)
+        return index
+
+    # Database sync
+
+    def sync(self, full=False, batch_size=1000):
+        """Catch the index up with the available TShirt rows.
+
+        Documents no longer available are dropped, and rows changed since the
+        last sync (or missing from the index) are re-indexed.
+        """
+        from .models import TShirt
+
+        started = timezone.now()
+        available = TShirt.objects.filter(is_available=True)
+        available_ids = set(available.values_list('id', flat=True))
+
+        with self._lock:
+            for doc_id in [doc_id for doc_id in self.doc_lengths if doc_id not in available_ids]:
+                self._remove(doc_id)
+            missing = available_ids.difference(self.doc_lengths)
+
+        changed = available.select_related('brand')
+        if not full and self.synced_at is not None:
+            changed = changed.filter(updated_at__gte=self.synced_at)
+        for tshirt in changed.iterator(chunk_size=batch_size):
+            self.add_tshirt(tshirt)
+            missing.discard(tshirt.pk)
+
+        if missing:
+            for tshirt in available.filter(id__in=missing).select_related('brand').iterator(chunk_size=batch_size):
+                self.add_tshirt(tshirt)
+
+        self.synced_at = started
+        return len(self)
+
+
+_index = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def snapshot_path():
+    return getattr(settings, 'CATALOG_SEARCH_INDEX_PATH', None)
+
+
+def get_search_index():
+    """Process-wide index: loaded from the snapshot (or built) on first use.
+
+    Writes in this process are applied through signals; writes made by other
+    workers are picked up by a periodic catch-up sync.
+    """
+    global _index, _index_checked_at
+
+    refresh_seconds = getattr(settings, 'CATALOG_SEARCH_REFRESH_SECONDS', 60)
+    with _index_lock:
+        if _index is None:
+            index = None
+            path = snapshot_path()
+            if path and os.path.exists(path):
+                try:
+                    index = SearchIndex.load(path)
+                except (OSError, ValueError, EOFError, zlib.error) as exc:
+                    logger.warning(f"Ignoring unreadable search snapshot {path}: {exc}")
+            _index = index or SearchIndex()
+            _index.sync(full=index is None)
+            _index_checked_at = time.monotonic()
+        elif refresh_seconds and time.monotonic() - _index_checked_at > refresh_seconds:
+            _index.sync()
+            _index_checked_at = time.monotonic()
+        return _index
+
+
+def loaded_search_index():
+    """The process index if it has been loaded, without loading it."""
+    return _index
+
+
+def reset_search_index():
+    global _index
+    with _index_lock:
+        _index = None
@@ -1,43 +1,113 @@
 from rest_framework import serializers
-from .models import TShirt, Brand, Category, TShirtReview
+from apps.common.fast_serializers import FastListSerializer, FastRepresentationMixin
+from apps.common.fieldsets import SparseFieldsetMixin
+from .images import IMAGE_FIELDS, build_srcset
+from .models import TShirt, Brand, Category, TShirtReview, ProductListing
 
-class BrandSerializer(serializers.ModelSerializer):
+MEASUREMENT_FIELDS = ['pit_to_pit', 'shoulder_to_shoulder', 'front_length', 'back_length', 'sleeve_length']
+CONDITION_FLAGS = ['has_stains', 'has_holes', 'has_fading', 'has_pilling', 'has_repairs']
+CONDITION_PHOTOS = ['condition_photo_1', 'condition_photo_2', 'condition_photo_3', 'condition_photo_4']
+
+class BrandSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Brand model."""
     
     class Meta:
         model = Brand
         fields = ['id', 'name', 'slug', 'description']
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Category model."""
     
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description']
 
-class TShirtListSerializer(serializers.ModelSerializer):
+class TShirtListSerializer(SparseFieldsetMixin, FastRepresentationMixin, serializers.ModelSerializer):
     """Serializer for T-Shirt list view (minimal data)."""
     brand = BrandSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     discount_percentage = serializers.ReadOnlyField()
+    primary_image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = TShirt
+        list_serializer_class = FastListSerializer
+        fields = [
+            'id', 'title', 'slug', 'brand', 'category', 'size', 'color',
+            'condition', 'price', 'original_price', 'discount_percentage',
+            'primary_image', 'primary_image_srcset', 'is_featured', 'quantity', 'is_available', 'created_at'
+        ]
+        field_sources = {
+            'discount_percentage': ['price', 'original_price'],
+            'primary_image_srcset': ['image_variants', 'primary_image'],
+        }
+
+    def get_primary_image_srcset(self, obj):
+        entry = (obj.image_variants or {}).get('primary_image')
+        return build_srcset(entry, obj.primary_image.name, self.context.get('request'))
+
+class ProductListingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Serializer for the flat ProductListing read model.
+
+    Mirrors TShirtListSerializer; nested brand/category are built from the
+    denormalized columns and omit ``description``.
+    """
+    id = serializers.IntegerField(source='tshirt_id', read_only=True)
+    brand = serializers.SerializerMethodField()
+    category = serializers.SerializerMethodField()
+    primary_image = serializers.SerializerMethodField()
+    primary_image_srcset = serializers.SerializerMethodField()
+    is_available = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductListing
         fields = [
             'id', 'title', 'slug', 'brand', 'category', 'size', 'color',
             'condition', 'price', 'original_price', 'discount_percentage',
-            'primary_image', 'is_featured', 'quantity', 'is_available', 'created_at'
+            'primary_image', 'primary_image_srcset', 'is_featured', 'quantity', 'is_available', 'created_at'
         ]
+        field_sources = {
+            'brand': ['brand_id', 'brand_name', 'brand_slug'],
+            'category': ['category_id', 'category_name', 'category_slug'],
+            'primary_image': ['primary_image'],
+            'primary_image_srcset': ['primary_image_variants', 'primary_image'],
+            'is_available': [],
+        }
 
-class TShirtDetailSerializer(serializers.ModelSerializer):
+    def get_brand(self, obj):
+        return {'id': obj.brand_id, 'name': obj.brand_name, 'slug': obj.brand_slug}
+
+    def get_category(self, obj):
+        if obj.category_id is None:
+            return None
+        return {'id': obj.category_id, 'name': obj.category_name, 'slug': obj.category_slug}
+
+    def get_primary_image(self, obj):
+        if not obj.primary_image:
+            return None
+        url = TShirt._meta.get_field('primary_image').storage.url(obj.primary_image)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def get_primary_image_srcset(self, obj):
+        return build_srcset(obj.primary_image_variants, obj.primary_image, self.context.get('request'))
+
+    def get_is_available(self, obj):
+        return True
+
+class TShirtDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for T-Shirt detail view (full data)."""
     brand = BrandSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     all_images = serializers.SerializerMethodField()
     condition_photos = serializers.SerializerMethodField()
+    image_srcsets = serializers.SerializerMethodField()
     discount_percentage = serializers.ReadOnlyField()
     reviews_count = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
     has_detailed_condition_info = serializers.ReadOnlyField()
     condition_badge_class = serializers.ReadOnlyField()
     
@@ -47,8 +117,8 @@ class TShirtDetailSerializer(serializers.ModelSerializer):
             'id', 'title', 'slug', 'description', 'brand', 'category',
             'size', 'color', 'material', 'gender', 'condition', 'price',
             'original_price', 'discount_percentage', 'quantity', 'is_available',
-            'is_featured', 'meta_description', 'tags', 'all_images', 'condition_photos',
-            'reviews_count', 'average_rating', 'has_detailed_condition_info',
+            'is_featured', 'meta_description', 'tags', 'all_images', 'condition_photos', 'image_srcsets',
+            'reviews_count', 'average_rating', 'rating_histogram', 'has_detailed_condition_info',
             'condition_badge_class', 'created_at', 'updated_at',
             # Enhanced Condition Fields
             'condition_notes', 'has_stains', 'has_holes', 'has_fading',
@@ -57,15 +127,29 @@ class TShirtDetailSerializer(serializers.ModelSerializer):
             'sleeve_length', 'weight_grams', 'condition_verified',
             'condition_verifier', 'condition_verified_at'
         ]
+        field_sources = {
+            'all_images': ['primary_image', 'image_2', 'image_3', 'image_4'] + CONDITION_PHOTOS,
+            'condition_photos': CONDITION_PHOTOS,
+            'image_srcsets': ['image_variants'] + list(IMAGE_FIELDS),
+            'discount_percentage': ['price', 'original_price'],
+            'reviews_count': ['review_stats'],
+            'average_rating': ['review_stats'],
+            'rating_histogram': ['review_stats'],
+            'has_detailed_condition_info': MEASUREMENT_FIELDS + CONDITION_FLAGS + CONDITION_PHOTOS + ['condition_notes'],
+            'condition_badge_class': ['condition'],
+        }
     
     def get_reviews_count(self, obj):
-        return obj.reviews.count()
+        stats = getattr(obj, 'review_stats', None)
+        return stats.review_count if stats else 0
     
     def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return round(sum(review.rating for review in reviews) / len(reviews), 1)
-        return 0
+        stats = getattr(obj, 'review_stats', None)
+        return stats.average_rating if stats else 0
+
+    def get_rating_histogram(self, obj):
+        stats = getattr(obj, 'review_stats', None)
+        return stats.histogram if stats else {stars: 0 for stars in range(1, 6)}
 
     def get_all_images(self, obj):
         request = self.context.get('request')
@@ -86,6 +170,17 @@ class TShirtDetailSerializer(serializers.ModelSerializer):
                     continue
         return urls
 
+    def get_image_srcsets(self, obj):
+        """``srcset`` data per image field that has rendered variants."""
+        request = self.context.get('request')
+        variants = obj.image_variants or {}
+        srcsets = {}
+        for field in IMAGE_FIELDS:
+            srcset = build_srcset(variants.get(field), getattr(obj, field).name, request)
+            if srcset is not None:
+                srcsets[field] = srcset
+        return srcsets
+
     def get_condition_photos(self, obj):
         """Return condition-specific photos with descriptions."""
         request = self.context.get('request')
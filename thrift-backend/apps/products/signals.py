@@ -0,0 +1,389 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.common.response_cache import bump_model_version
+
+from .autocomplete import loaded_suggestion_index
+from .facets import loaded_facet_index
+from .fit import loaded_fit_index
+from .images import IMAGE_FIELDS, queue_image_variants, stale_image_fields
+from .models import (
+    Brand, Category, ProductListing, ProductReservation, ShippingMethod, ShippingRate, ShippingZone, SimilarTShirt,
+    Tag, TShirt, TShirtReview, TShirtTag,
+)
+from .read_model import refresh_listings, sync_listing
+from .reservation_stats import apply_reservation_change
+from .review_stats import apply_review_change
+from .search import loaded_search_index
+from .similarity import (
+    ROW_FIELDS as SIMILARITY_FIELDS, queue_similar_items_update, remove_from_similarity_model,
+)
+from .snapshot import mark_catalog_dirty
+from .stock import record_opening_stock
+from .tags import adjust_tag_counts, sync_tshirt_tags
+
+
+@receiver(post_save, sender=TShirt)
+def update_listing_on_tshirt_save(sender, instance, raw=False, **kwargs):
+    """Keep the catalog read model in step with TShirt writes."""
+    if raw:
+        return
+    sync_listing(instance)
+
+
+@receiver(post_save, sender=TShirt)
+def record_opening_stock_on_tshirt_create(sender, instance, created, raw=False, **kwargs):
+    """Start a new product's stock journal from the quantity it was created with."""
+    if created and not raw:
+        record_opening_stock([instance], kind='adjustment')
+
+
+@receiver(post_save, sender=TShirt)
+def update_tags_on_tshirt_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep TShirtTag links and Tag counts in step with ``tags`` and availability."""
+    if raw:
+        return
+    if update_fields is not None and not {'tags', 'is_available'}.intersection(update_fields):
+        return
+    sync_tshirt_tags(instance)
+
+
+@receiver(post_delete, sender=TShirtTag)
+def update_tag_count_on_link_delete(sender, instance, **kwargs):
+    """Covers explicit unlinking and the cascade from a TShirt delete."""
+    if instance.tshirt_available:
+        adjust_tag_counts({instance.tag_id: -1})
+
+
+@receiver(post_save, sender=TShirt)
+def render_image_variants_on_tshirt_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Render variants of new or replaced photos once the write commits."""
+    if raw or not settings.PRODUCT_IMAGE_VARIANTS_ON_UPLOAD:
+        return
+    if update_fields is not None and not set(update_fields).intersection(IMAGE_FIELDS):
+        return
+    if stale_image_fields(instance):
+        queue_image_variants(instance.pk)
+
+
+def _sync_on_commit(index, instance):
+    """Add or drop a product in a loaded in-process index once the write commits.
+
+    Deferred like the similarity updates, so a rolled-back write never
+    reaches the index.
+    """
+    def sync():
+        if instance.is_available:
+            index.add_tshirt(instance)
+        else:
+            index.remove(instance.pk)
+    transaction.on_commit(sync)
+
+
+def _remove_on_commit(index, tshirt_id):
+    transaction.on_commit(lambda: index.remove(tshirt_id))
+
+
+def _refresh_on_commit(index, product_ids):
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: index.refresh_products(product_ids))
+
+
+@receiver(post_save, sender=TShirt)
+def update_search_index_on_tshirt_save(sender, instance, raw=False, **kwargs):
+    """Apply the write to this process's search index, if it is loaded."""
+    index = loaded_search_index()
+    if raw or index is None:
+        return
+    _sync_on_commit(index, instance)
+
+
+@receiver(post_delete, sender=TShirt)
+def update_search_index_on_tshirt_delete(sender, instance, **kwargs):
+    index = loaded_search_index()
+    if index is not None:
+        _remove_on_commit(index, instance.pk)
+
+
+@receiver(post_save, sender=TShirt)
+def update_suggestions_on_tshirt_save(sender, instance, raw=False, **kwargs):
+    index = loaded_suggestion_index()
+    if raw or index is None:
+        return
+    _sync_on_commit(index, instance)
+
+
+@receiver(post_delete, sender=TShirt)
+def update_suggestions_on_tshirt_delete(sender, instance, **kwargs):
+    index = loaded_suggestion_index()
+    if index is not None:
+        _remove_on_commit(index, instance.pk)
+
+
+@receiver(post_save, sender=TShirt)
+def update_facets_on_tshirt_save(sender, instance, raw=False, **kwargs):
+    index = loaded_facet_index()
+    if raw or index is None:
+        return
+    _sync_on_commit(index, instance)
+
+
+@receiver(post_delete, sender=TShirt)
+def update_facets_on_tshirt_delete(sender, instance, **kwargs):
+    index = loaded_facet_index()
+    if index is not None:
+        _remove_on_commit(index, instance.pk)
+
+
+@receiver(post_save, sender=TShirt)
+def update_fit_index_on_tshirt_save(sender, instance, raw=False, **kwargs):
+    index = loaded_fit_index()
+    if raw or index is None:
+        return
+    transaction.on_commit(lambda: index.add_tshirt(instance))
+
+
+@receiver(post_delete, sender=TShirt)
+def update_fit_index_on_tshirt_delete(sender, instance, **kwargs):
+    index = loaded_fit_index()
+    if index is not None:
+        _remove_on_commit(index, instance.pk)
+
+
+@receiver(pre_save, sender=TShirt)
+def remember_similarity_features(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the stored features so a save that changes none of them skips recomputation."""
+    if raw or instance.pk is None or not settings.SIMILAR_ITEMS_INCREMENTAL:
+        return
+    if update_fields is not None and not {'is_available', *SIMILARITY_FIELDS}.intersection(update_fields):
+        return
+    instance._previous_similarity_row = sender.objects.filter(pk=instance.pk).values_list(
+        'is_available', *SIMILARITY_FIELDS
+    ).first()
+
+
+@receiver(post_save, sender=TShirt)
+def update_similar_items_on_tshirt_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Recompute only the neighbour rows touched by a sell-out, restock or feature change."""
+    if raw or not settings.SIMILAR_ITEMS_INCREMENTAL:
+        return
+    if update_fields is not None and not {'is_available', *SIMILARITY_FIELDS}.intersection(update_fields):
+        return
+    previous = None if created else getattr(instance, '_previous_similarity_row', None)
+    current = tuple(getattr(instance, field) for field in ('is_available', *SIMILARITY_FIELDS))
+    if previous == current or (previous is None and not instance.is_available):
+        return
+    if not SimilarTShirt.objects.exists():
+        # Nothing precomputed yet; the offline job will cover this product.
+        return
+    if instance.is_available or previous[0]:
+        queue_similar_items_update(changed=[instance.pk])
+
+
+@receiver(pre_delete, sender=TShirt)
+def collect_similar_items_on_tshirt_delete(sender, instance, **kwargs):
+    """Remember which rows list the product; its SimilarTShirt rows cascade with it."""
+    if settings.SIMILAR_ITEMS_INCREMENTAL:
+        remove_from_similarity_model(instance.pk)
+        instance._similar_to_ids = list(
+            SimilarTShirt.objects.filter(similar_id=instance.pk).values_list('tshirt_id', flat=True)
+        )
+
+
+@receiver(post_delete, sender=TShirt)
+def update_similar_items_on_tshirt_delete(sender, instance, **kwargs):
+    """Refill the rows that lost it as a neighbour."""
+    if not settings.SIMILAR_ITEMS_INCREMENTAL or not getattr(instance, '_similar_to_ids', None):
+        return
+    queue_similar_items_update(stale=instance._similar_to_ids)
+
+
+@receiver(post_save, sender=Brand)
+def update_listings_on_brand_save(sender, instance, created, raw=False, **kwargs):
+    """Brand name/slug are denormalized into every listing of that brand."""
+    if raw or created:
+        return
+    stale = ProductListing.objects.filter(brand=instance).exclude(
+        brand_name=instance.name,
+        brand_slug=instance.slug,
+    )
+    if stale.exists():
+        refresh_listings(TShirt.objects.filter(brand=instance))
+
+
+@receiver(post_save, sender=Brand)
+def update_search_index_on_brand_save(sender, instance, created, raw=False, **kwargs):
+    """Brand names are indexed with each product."""
+    index = loaded_search_index()
+    if raw or created or index is None:
+        return
+    brand_id = instance.pk
+
+    def reindex():
+        for tshirt in TShirt.objects.filter(brand_id=brand_id, is_available=True).select_related('brand'):
+            index.add_tshirt(tshirt)
+    transaction.on_commit(reindex)
+
+
+@receiver(post_save, sender=Brand)
+def update_suggestions_on_brand_save(sender, instance, created, raw=False, **kwargs):
+    index = loaded_suggestion_index()
+    if raw or created or index is None:
+        return
+    _refresh_on_commit(index, TShirt.objects.filter(brand=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Brand)
+def update_facets_on_brand_save(sender, instance, created, raw=False, **kwargs):
+    """Only the brand label is kept per brand; its bitset is keyed by id."""
+    index = loaded_facet_index()
+    if raw or index is None:
+        return
+    brand_id, name = instance.pk, instance.name
+
+    def relabel():
+        index.labels[('brand', brand_id)] = name
+    transaction.on_commit(relabel)
+
+
+@receiver(post_save, sender=Category)
+def update_listings_on_category_save(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    ProductListing.objects.filter(category=instance).update(
+        category_name=instance.name,
+        category_slug=instance.slug,
+    )
+
+
+@receiver(post_save, sender=Category)
+def update_suggestions_on_category_save(sender, instance, created, raw=False, **kwargs):
+    index = loaded_suggestion_index()
+    if raw or created or index is None:
+        return
+    _refresh_on_commit(index, TShirt.objects.filter(category=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Category)
+def update_facets_on_category_save(sender, instance, created, raw=False, **kwargs):
+    """Category bitsets are keyed by slug, so a rename moves the products."""
+    index = loaded_facet_index()
+    if raw or created or index is None:
+        return
+    _refresh_on_commit(index, TShirt.objects.filter(category=instance).values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def clear_listings_on_category_delete(sender, instance, **kwargs):
+    """TShirt.category is SET_NULL, so drop the denormalized columns too."""
+    ProductListing.objects.filter(category=instance).update(category_name='', category_slug='')
+
+
+@receiver(pre_delete, sender=Category)
+def collect_products_on_category_delete(sender, instance, **kwargs):
+    """Remember the affected products; SET_NULL happens without TShirt signals."""
+    if loaded_suggestion_index() is not None or loaded_facet_index() is not None:
+        instance._affected_product_ids = list(instance.tshirts.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def update_indexes_on_category_delete(sender, instance, **kwargs):
+    product_ids = getattr(instance, '_affected_product_ids', None)
+    if not product_ids:
+        return
+    for index in (loaded_suggestion_index(), loaded_facet_index()):
+        if index is not None:
+            _refresh_on_commit(index, product_ids)
+
+
+@receiver(pre_save, sender=TShirtReview)
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    """Keep the stored rating so an edit can move it between histogram buckets."""
+    if raw or instance.pk is None:
+        return
+    instance._previous_rating = sender.objects.filter(pk=instance.pk).values_list('tshirt_id', 'rating').first()
+
+
+@receiver(post_save, sender=TShirtReview)
+def update_review_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_previous_rating', None)
+    current = (instance.tshirt_id, instance.rating)
+    if previous == current:
+        return
+    if previous is not None:
+        apply_review_change(*previous, delta=-1)
+    apply_review_change(*current, delta=1)
+
+
+@receiver(post_delete, sender=TShirtReview)
+def update_review_stats_on_delete(sender, instance, **kwargs):
+    apply_review_change(instance.tshirt_id, instance.rating, delta=-1)
+
+
+def _held(product_id, quantity, is_active):
+    return (product_id, quantity if is_active else 0)
+
+
+@receiver(pre_save, sender=ProductReservation)
+def remember_reservation_hold(sender, instance, raw=False, using=None, **kwargs):
+    """Read the stored hold under a row lock, so the sweeper can't expire it between this read and the save."""
+    if raw or instance.pk is None:
+        return
+    reservations = sender.objects.using(using)
+    if transaction.get_connection(using).in_atomic_block:
+        # The sweeper skips locked rows; if it got here first, this waits and reads is_active=False.
+        reservations = reservations.select_for_update()
+    row = reservations.filter(pk=instance.pk).values_list('product_id', 'quantity', 'is_active').first()
+    instance._previous_hold = _held(*row) if row else None
+
+
+@receiver(post_save, sender=ProductReservation)
+def update_reservation_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_previous_hold', None)
+    product_id, held = _held(instance.product_id, instance.quantity, instance.is_active)
+    expires_at = instance.expires_at if instance.is_active else None
+    if previous is not None and previous[0] != product_id:
+        apply_reservation_change(previous[0], -previous[1])
+        previous = None
+    apply_reservation_change(product_id, held - (previous[1] if previous else 0), expires_at)
+
+
+@receiver(post_delete, sender=ProductReservation)
+def update_reservation_stats_on_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        apply_reservation_change(instance.product_id, -instance.quantity)
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=TShirt)
+@receiver(post_delete, sender=TShirt)
+def mark_catalog_snapshot_dirty(sender, raw=False, **kwargs):
+    """Let the workers republish the catalog snapshot after this change commits."""
+    if not raw:
+        mark_catalog_dirty()
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=TShirt)
+@receiver(post_delete, sender=TShirt)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=ShippingZone)
+@receiver(post_delete, sender=ShippingZone)
+@receiver(post_save, sender=ShippingMethod)
+@receiver(post_delete, sender=ShippingMethod)
+@receiver(post_save, sender=ShippingRate)
+@receiver(post_delete, sender=ShippingRate)
+def bump_response_cache_version(sender, **kwargs):
+    """Invalidate cached catalog/shipping metadata responses built from ``sender``."""
+    bump_model_version(sender)
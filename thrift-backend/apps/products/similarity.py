@@ -0,0 +1,398 @@
+"""Precomputed "similar items" from NumPy cosine similarity.
+
+Every product is encoded into a fixed-length feature vector (brand,
+category, size, color, condition, gender, price band and measurements),
+L2-normalized so a dot product is the cosine similarity. The top-K
+available neighbours of each product are found with batched matrix
+products and stored in ``SimilarTShirt``.
+
+Incremental updates only touch affected rows: when a product sells out (or
+is deleted) only the rows listing it as a neighbour are recomputed, and when
+one becomes available (or changes) only the rows it would now enter are.
+They run on a background worker fed by the TShirt signals (inline on commit
+when SIMILAR_ITEMS_ASYNC is off), never in a request.
+"""
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .facets import PRICE_BUCKETS
+from .models import SimilarTShirt, TShirt
+
+logger = logging.getLogger(__name__)
+
+MEASUREMENTS = ('pit_to_pit', 'shoulder_to_shoulder', 'front_length', 'back_length', 'sleeve_length')
+ROW_FIELDS = ('id', 'brand_id', 'category_id', 'size', 'color', 'condition', 'gender', 'price') + MEASUREMENTS
+
+# Relative weight of each feature group in the cosine similarity.
+FEATURE_WEIGHTS = {
+    'brand': 1.0,
+    'category': 1.0,
+    'size': 1.5,
+    'color': 0.8,
+    'condition': 0.6,
+    'gender': 1.0,
+    'price': 1.0,
+    'measurements': 1.2,
+}
+
+
+def _soft_one_hot(position, width, spread=0.5):
+    """One-hot with ``spread`` on the neighbouring slots, for ordered values (sizes, conditions)."""
+    vector = np.zeros(width, dtype=np.float32)
+    if position is None:
+        return vector
+    vector[position] = 1.0
+    if position > 0:
+        vector[position - 1] = spread
+    if position + 1 < width:
+        vector[position + 1] = spread
+    return vector / np.linalg.norm(vector)
+
+
+class FeatureEncoder:
+    """Maps ROW_FIELDS tuples to unit-length float32 vectors.
+
+    Vocabularies and measurement statistics come from the rows it is fitted
+    on; values it has never seen encode as zeros in their group.
+    """
+
+    def __init__(self, rows):
+        self.brands = self._vocabulary(row[1] for row in rows)
+        self.categories = self._vocabulary(row[2] for row in rows if row[2] is not None)
+        self.colors = self._vocabulary(self._color(row[4]) for row in rows)
+        self.sizes = {value: position for position, (value, _) in enumerate(TShirt.SIZE_CHOICES)}
+        self.conditions = {value: position for position, (value, _) in enumerate(TShirt.CONDITION_CHOICES)}
+        self.genders = {value: position for position, (value, _) in enumerate(TShirt.GENDER_CHOICES)}
+
+        self.measure_mean = np.zeros(len(MEASUREMENTS), dtype=np.float32)
+        self.measure_std = np.ones(len(MEASUREMENTS), dtype=np.float32)
+        for column, _ in enumerate(MEASUREMENTS):
+            values = np.array([float(row[8 + column]) for row in rows if row[8 + column] is not None])
+            if len(values):
+                self.measure_mean[column] = values.mean()
+                self.measure_std[column] = values.std() or 1.0
+
+        self.layout = [
+            ('brand', len(self.brands)),
+            ('category', len(self.categories)),
+            ('size', len(self.sizes)),
+            ('color', len(self.colors)),
+            ('condition', len(self.conditions)),
+            ('gender', len(self.genders)),
+            ('price', len(PRICE_BUCKETS)),
+            ('measurements', len(MEASUREMENTS)),
+        ]
+        self.offsets = {}
+        offset = 0
+        for group, width in self.layout:
+            self.offsets[group] = (offset, offset + width)
+            offset += width
+        self.width = offset
+
+    @staticmethod
+    def _vocabulary(values):
+        return {value: position for position, value in enumerate(sorted(set(values), key=str))}
+
+    @staticmethod
+    def _color(value):
+        return ' '.join((value or '').lower().split())
+
+    def _one_hot(self, vector, group, position):
+        if position is not None:
+            vector[self.offsets[group][0] + position] = FEATURE_WEIGHTS[group]
+
+    def _put(self, vector, group, values):
+        start, end = self.offsets[group]
+        vector[start:end] = values * FEATURE_WEIGHTS[group]
+
+    def encode_row(self, row):
+        vector = np.zeros(self.width, dtype=np.float32)
+        _, brand_id, category_id, size, color, condition, gender, price = row[:8]
+        self._one_hot(vector, 'brand', self.brands.get(brand_id))
+        self._one_hot(vector, 'category', self.categories.get(category_id))
+        self._one_hot(vector, 'color', self.colors.get(self._color(color)))
+        self._one_hot(vector, 'gender', self.genders.get(gender))
+        self._put(vector, 'size', _soft_one_hot(self.sizes.get(size), len(self.sizes)))
+        self._put(vector, 'condition', _soft_one_hot(self.conditions.get(condition), len(self.conditions)))
+        bucket = max(position for position, lower in enumerate(PRICE_BUCKETS) if price >= lower)
+        self._put(vector, 'price', _soft_one_hot(bucket, len(PRICE_BUCKETS)))
+
+        measured = [value is not None for value in row[8:]]
+        if any(measured):
+            raw = np.array([float(value) if value is not None else 0.0 for value in row[8:]], dtype=np.float32)
+            scores = np.clip((raw - self.measure_mean) / self.measure_std, -3, 3) * np.array(measured)
+            self._put(vector, 'measurements', scores / math.sqrt(len(MEASUREMENTS)))
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, rows):
+        matrix = np.zeros((len(rows), self.width), dtype=np.float32)
+        for position, row in enumerate(rows):
+            matrix[position] = self.encode_row(row)
+        return matrix
+
+
+def top_neighbours(queries, query_ids, matrix, ids, k, batch_size=1024):
+    """Top-``k`` rows of ``matrix`` by cosine similarity for each query vector.
+
+    Processes ``batch_size`` queries per matrix product to bound memory at
+    ``batch_size x len(ids)`` floats. A query never matches its own id.
+
+    Returns:
+        list: per query, [(neighbour id, score), ...] best first, scores > 0
+    """
+    if not len(ids) or not len(queries):
+        return [[] for _ in range(len(queries))]
+    column_of = {doc_id: column for column, doc_id in enumerate(ids)}
+    ids = np.asarray(ids)
+    k = min(k, len(ids))
+    results = []
+    for start in range(0, len(queries), batch_size):
+        scores = queries[start:start + batch_size] @ matrix.T
+        for row, query_id in enumerate(query_ids[start:start + batch_size]):
+            column = column_of.get(query_id)
+            if column is not None:
+                scores[row, column] = -np.inf
+        candidates = np.argpartition(scores, -k, axis=1)[:, -k:]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        best = np.take_along_axis(candidates, order, axis=1)
+        best_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        for row in range(len(best)):
+            results.append([
+                (int(ids[column]), float(score))
+                for column, score in zip(best[row], best_scores[row]) if score > 0
+            ])
+    return results
+
+
+class SimilarityModel:
+    """Encoder plus the feature matrix of every available product.
+
+    ``kth`` caches each full row's K-th neighbour score, so finding the rows
+    a changed product enters needs no query.
+    """
+
+    def __init__(self):
+        rows = list(TShirt.objects.filter(is_available=True).order_by('id').values_list(*ROW_FIELDS))
+        self.encoder = FeatureEncoder(rows)
+        self.ids = [row[0] for row in rows]
+        self.matrix = self.encoder.encode(rows)
+        self.kth = None
+        self.built_at = time.monotonic()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def remove(self, doc_id):
+        with self._lock:
+            if doc_id in self.ids:
+                position = self.ids.index(doc_id)
+                del self.ids[position]
+                self.matrix = np.delete(self.matrix, position, axis=0)
+
+    def upsert(self, row):
+        vector = self.encoder.encode_row(row)
+        with self._lock:
+            if row[0] in self.ids:
+                self.matrix[self.ids.index(row[0])] = vector
+            else:
+                self.ids.append(row[0])
+                self.matrix = np.vstack([self.matrix, vector[None, :]])
+        return vector
+
+    def neighbours(self, rows, k, batch_size=1024):
+        """Top-``k`` available neighbours for ROW_FIELDS rows of any availability."""
+        queries = self.encoder.encode(rows)
+        with self._lock:
+            return top_neighbours(queries, [row[0] for row in rows], self.matrix, list(self.ids), k, batch_size)
+
+    def remember(self, neighbours_by_id, k):
+        """Update the cached K-th scores of freshly stored rows."""
+        if self.kth is None:
+            return
+        for tshirt_id, neighbours in neighbours_by_id.items():
+            if len(neighbours) >= k:
+                self.kth[tshirt_id] = neighbours[k - 1][1]
+            else:
+                self.kth.pop(tshirt_id, None)
+
+    def entered_by(self, vectors):
+        """Ids of rows that one of ``vectors`` now enters: it beats their K-th score, or they have free slots."""
+        if self.kth is None:
+            self.kth = dict(SimilarTShirt.objects.filter(rank=_k() - 1).values_list('tshirt_id', 'score'))
+        with self._lock:
+            best = (self.matrix @ vectors.T).max(axis=1)
+            ids = list(self.ids)
+        thresholds = np.array([self.kth.get(doc_id, 0.0) for doc_id in ids], dtype=np.float32)
+        return [ids[position] for position in np.flatnonzero((best > 0) & (best > thresholds))]
+
+
+def _k():
+    return settings.SIMILAR_ITEMS_K
+
+
+def _store(neighbours_by_id, model=None):
+    """Replace the stored neighbour rows of the given products."""
+    links = [
+        SimilarTShirt(tshirt_id=tshirt_id, similar_id=similar_id, rank=rank, score=score)
+        for tshirt_id, neighbours in neighbours_by_id.items()
+        for rank, (similar_id, score) in enumerate(neighbours)
+    ]
+    with transaction.atomic():
+        SimilarTShirt.objects.filter(tshirt_id__in=list(neighbours_by_id)).delete()
+        SimilarTShirt.objects.bulk_create(links, batch_size=2000)
+    if model is not None:
+        model.remember(neighbours_by_id, _k())
+
+
+def rebuild_similar_items(k=None, batch_size=1024):
+    """Recompute every product's neighbours from scratch (the offline job).
+
+    Returns:
+        tuple: (products with stored neighbours, SimilarityModel used)
+    """
+    k = k or _k()
+    model = SimilarityModel()
+    rows = list(TShirt.objects.order_by('id').values_list(*ROW_FIELDS))
+    results = {}
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        for row, neighbours in zip(chunk, model.neighbours(chunk, k, batch_size)):
+            results[row[0]] = neighbours
+    with transaction.atomic():
+        SimilarTShirt.objects.all().delete()
+        _store(results)
+    model.kth = {tshirt_id: neighbours[k - 1][1] for tshirt_id, neighbours in results.items() if len(neighbours) >= k}
+    _set_model(model)
+    return len(results), model
+
+
+def recompute_rows(tshirt_ids, model=None):
+    """Recompute and store the neighbours of the given products only."""
+    tshirt_ids = list(tshirt_ids)
+    if not tshirt_ids:
+        return 0
+    model = model or get_similarity_model()
+    rows = list(TShirt.objects.filter(id__in=tshirt_ids).values_list(*ROW_FIELDS))
+    _store({row[0]: neighbours for row, neighbours in zip(rows, model.neighbours(rows, _k()))}, model)
+    return len(rows)
+
+
+def update_similar_items(changed=(), stale=()):
+    """Recompute the rows touched by ``changed`` products, plus the ``stale`` rows.
+
+    A changed product that is no longer available (sold out or deleted) is
+    replaced in the rows that listed it; an available one gets its own row
+    recomputed along with the rows it now enters and the rows that already
+    listed it (they may rank it differently).
+
+    Returns:
+        int: rows recomputed
+    """
+    changed = set(changed)
+    affected = set(stale)
+    model = get_similarity_model()
+    rows = list(TShirt.objects.filter(id__in=changed, is_available=True).values_list(*ROW_FIELDS))
+    available = {row[0] for row in rows}
+    gone = changed - available
+    for tshirt_id in gone:
+        model.remove(tshirt_id)
+    if gone:
+        listing = SimilarTShirt.objects.filter(similar_id__in=gone)
+        affected.update(listing.values_list('tshirt_id', flat=True))
+        listing.delete()
+    if rows:
+        affected.update(model.entered_by(np.stack([model.upsert(row) for row in rows])))
+        affected.update(SimilarTShirt.objects.filter(similar_id__in=available).values_list('tshirt_id', flat=True))
+        affected.update(available)
+    return recompute_rows(affected, model)
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _set_model(model):
+    global _model
+    with _model_lock:
+        _model = model
+
+
+def get_similarity_model():
+    """Process-wide feature matrix, rebuilt when older than SIMILAR_ITEMS_MODEL_REFRESH_SECONDS.
+
+    Only the update worker and the offline job use it; the build runs
+    outside the lock so a rebuild never blocks an update in progress.
+    """
+    refresh_seconds = settings.SIMILAR_ITEMS_MODEL_REFRESH_SECONDS
+    model = _model
+    if model is None or (refresh_seconds and time.monotonic() - model.built_at > refresh_seconds):
+        model = SimilarityModel()
+        _set_model(model)
+    return model
+
+
+def remove_from_similarity_model(tshirt_id):
+    if _model is not None:
+        _model.remove(tshirt_id)
+
+
+def reset_similarity_model():
+    _set_model(None)
+
+
+# Update queue
+
+_changed = set()
+_stale = set()
+_pending_ready = threading.Condition()
+_worker = None
+
+
+def _update_forever():
+    while True:
+        with _pending_ready:
+            while not _changed and not _stale:
+                _pending_ready.wait()
+            changed, stale = set(_changed), set(_stale)
+            _changed.clear()
+            _stale.clear()
+        try:
+            update_similar_items(changed, stale)
+        except Exception:
+            logger.exception('Similar items update failed for %d products', len(changed) + len(stale))
+        close_old_connections()
+
+
+def _enqueue(changed=(), stale=()):
+    global _worker
+    with _pending_ready:
+        # A burst of saves to one product collapses into a single update.
+        _changed.update(changed)
+        _stale.update(stale)
+        if _worker is None:
+            _worker = threading.Thread(target=_update_forever, name='similar-items', daemon=True)
+            _worker.start()
+        _pending_ready.notify()
+
+
+def queue_similar_items_update(changed=(), stale=()):
+    """Update the similar items of changed products once the current transaction commits.
+
+    Queued for the background worker when SIMILAR_ITEMS_ASYNC is on, run
+    inline otherwise.
+    """
+    changed, stale = list(changed), list(stale)
+    if settings.SIMILAR_ITEMS_ASYNC:
+        transaction.on_commit(lambda: _enqueue(changed, stale))
+    else:
+        transaction.on_commit(lambda: update_similar_items(changed, stale))
@@ -0,0 +1,485 @@
+"""Columnar catalog snapshot shared by every worker through ``mmap``.
+
+The available catalog is written to one file as fixed-width little-endian
+columns (ids, prices in paise, choice codes, flag bits, foreign keys,
+string references) plus a deduplicated UTF-8 string table and small brand
+and category tables. Workers map the file read-only and wrap the columns
+with ``np.frombuffer``, so listing, filtering and facet counts read the
+page cache directly: one copy of the data per host instead of one per
+process, and no per-request queries.
+
+Publishing is an atomic swap: a new generation is written to
+``snapshot-<generation>.bin``, then the ``CURRENT`` pointer file is replaced
+with ``os.replace``. Workers notice the new pointer on their next check and
+map the new file; the old one stays valid for readers still holding it.
+Catalog writes touch a ``DIRTY`` marker, and the first worker to notice it
+republishes in a background thread (serialized across processes with a
+file lock).
+
+File layout: 8-byte magic, little-endian u64 header length, JSON header
+(generation, build time, row count and ``{name: [dtype, count, offset]}``
+for every array), then the arrays, each 8-byte aligned.
+"""
+import datetime
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from rest_framework import serializers
+
+from .facets import FLAG_FACETS, PRICE_BUCKETS, VALUE_FACETS
+from .images import build_srcset
+from .models import Brand, Category, TShirt
+
+MAGIC = b'TSNAP001'
+ALIGN = 8
+NO_VALUE = -1
+NO_CODE = 255
+
+SIZES = [value for value, _ in TShirt.SIZE_CHOICES]
+CONDITIONS = [value for value, _ in TShirt.CONDITION_CHOICES]
+GENDERS = [value for value, _ in TShirt.GENDER_CHOICES]
+CODES = {'size': SIZES, 'condition': CONDITIONS, 'gender': GENDERS}
+PRICE_BOUNDS = np.array([int(lower * 100) for lower in PRICE_BUCKETS], dtype=np.int64)
+
+ROW_COLUMNS = (
+    ('id', '<i8'), ('brand', '<i4'), ('category', '<i4'),
+    ('size', 'u1'), ('condition', 'u1'), ('gender', 'u1'), ('flags', '<u2'),
+    ('price', '<i8'), ('original_price', '<i8'), ('price_bucket', 'u1'), ('discount', 'u1'),
+    ('quantity', '<i4'), ('created_at', '<i8'),
+    ('title', '<u4'), ('slug', '<u4'), ('color', '<u4'), ('primary_image', '<u4'), ('primary_image_variants', '<u4'),
+)
+SOURCE_FIELDS = (
+    'id', 'brand_id', 'category_id', 'size', 'condition', 'gender', *FLAG_FACETS,
+    'price', 'original_price', 'quantity', 'created_at', 'title', 'slug', 'color', 'primary_image', 'image_variants',
+)
+# Orderings the snapshot can answer (column, descending).
+ORDERINGS = {
+    'price': ('price', False), '-price': ('price', True),
+    'created_at': ('created_at', False), '-created_at': ('created_at', True),
+}
+
+
+def _paise(value):
+    return NO_VALUE if value is None else int(round(value * 100))
+
+
+def _micros(value):
+    return int(value.timestamp() * 1_000_000) if value is not None else 0
+
+
+def _aligned(size):
+    return (size + ALIGN - 1) // ALIGN * ALIGN
+
+
+class _StringTable:
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def add(self, value):
+        value = value or ''
+        position = self.index.get(value)
+        if position is None:
+            position = self.index[value] = len(self.values)
+            self.values.append(value)
+        return position
+
+    def arrays(self):
+        encoded = [value.encode('utf-8') for value in self.values]
+        offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b''.join(encoded), dtype='u1')
+
+
+def build_arrays():
+    """Read the available catalog into the snapshot's column arrays."""
+    strings = _StringTable()
+    columns = {name: [] for name, _ in ROW_COLUMNS}
+    rows = TShirt.objects.filter(is_available=True).order_by('id').values_list(*SOURCE_FIELDS)
+    for row in rows.iterator(chunk_size=2000):
+        data = dict(zip(SOURCE_FIELDS, row))
+        price, original = _paise(data['price']), _paise(data['original_price'])
+        flags = 0
+        for bit, flag in enumerate(FLAG_FACETS):
+            if data[flag]:
+                flags |= 1 << bit
+        discount = 0
+        if original != NO_VALUE and original > price:
+            discount = round((data['original_price'] - data['price']) / data['original_price'] * 100)
+        variants = (data['image_variants'] or {}).get('primary_image')
+        values = {
+            'id': data['id'], 'brand': data['brand_id'],
+            'category': data['category_id'] if data['category_id'] is not None else NO_VALUE,
+            'size': SIZES.index(data['size']) if data['size'] in SIZES else NO_CODE,
+            'condition': CONDITIONS.index(data['condition']) if data['condition'] in CONDITIONS else NO_CODE,
+            'gender': GENDERS.index(data['gender']) if data['gender'] in GENDERS else NO_CODE,
+            'flags': flags, 'price': price, 'original_price': original,
+            'price_bucket': int(np.searchsorted(PRICE_BOUNDS, price, side='right')) - 1,
+            'discount': discount, 'quantity': data['quantity'], 'created_at': _micros(data['created_at']),
+            'title': strings.add(data['title']), 'slug': strings.add(data['slug']),
+            'color': strings.add(data['color']), 'primary_image': strings.add(data['primary_image']),
+            'primary_image_variants': strings.add(json.dumps(variants) if variants else ''),
+        }
+        for name, value in values.items():
+            columns[name].append(value)
+
+    arrays = {name: np.array(columns[name], dtype=dtype) for name, dtype in ROW_COLUMNS}
+    brands = list(Brand.objects.order_by('id').values_list('id', 'name', 'slug'))
+    arrays['brand_id'] = np.array([brand[0] for brand in brands], dtype='<i4')
+    arrays['brand_name'] = np.array([strings.add(brand[1]) for brand in brands], dtype='<u4')
+    arrays['brand_slug'] = np.array([strings.add(brand[2]) for brand in brands], dtype='<u4')
+    categories = list(Category.objects.order_by('id').values_list('id', 'name', 'slug'))
+    arrays['category_id'] = np.array([category[0] for category in categories], dtype='<i4')
+    arrays['category_name'] = np.array([strings.add(category[1]) for category in categories], dtype='<u4')
+    arrays['category_slug'] = np.array([strings.add(category[2]) for category in categories], dtype='<u4')
+    arrays['string_offsets'], arrays['string_data'] = strings.arrays()
+    return arrays
+
+
+def write_snapshot(path, arrays, generation, built_at=None):
+    """Write ``arrays`` to ``path`` in the snapshot layout and fsync it.
+
+    ``built_at`` should be taken before the arrays were read from the
+    database, so a write committing during the build still looks newer.
+    """
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, len(array), offset]
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({
+        'generation': generation,
+        'built_at': time.time() if built_at is None else built_at,
+        'rows': len(arrays['id']),
+        'arrays': layout,
+    }).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    with open(path, 'wb') as handle:
+        handle.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        handle.write(b'\0' * (data_start - handle.tell()))
+        for name, array in arrays.items():
+            handle.write(array.tobytes())
+            handle.write(b'\0' * (data_start + _aligned(layout[name][2] + array.nbytes) - handle.tell()))
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+class CatalogSnapshot:
+    """Read-only view of one snapshot file; every column is a zero-copy ``np.frombuffer``."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a catalog snapshot')
+        (header_length,) = struct.unpack_from('<Q', self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mmap[header_start:header_start + header_length])
+        data_start = _aligned(header_start + header_length)
+
+        self.generation = header['generation']
+        self.built_at = header['built_at']
+        self.arrays = {
+            name: np.frombuffer(self._mmap, dtype=dtype, count=count, offset=data_start + offset)
+            for name, (dtype, count, offset) in header['arrays'].items()
+        }
+        self._offsets = self.arrays['string_offsets']
+        self._data_start = data_start + header['arrays']['string_data'][2]
+        self.brands = {
+            int(brand_id): (self.string(name), self.string(slug))
+            for brand_id, name, slug in zip(self['brand_id'], self['brand_name'], self['brand_slug'])
+        }
+        self.categories = {
+            int(category_id): (self.string(name), self.string(slug))
+            for category_id, name, slug in zip(self['category_id'], self['category_name'], self['category_slug'])
+        }
+        self.category_ids = {slug: category_id for category_id, (_, slug) in self.categories.items()}
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __len__(self):
+        return len(self.arrays['id'])
+
+    def string(self, index):
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._mmap[self._data_start + start:self._data_start + end].decode('utf-8')
+
+    # Query
+
+    def masks(self, selections=None, flags=None, min_price=None, max_price=None):
+        """One boolean row mask per active filter, keyed like ``FacetIndex.counts``."""
+        masks = {}
+        for facet, values in (selections or {}).items():
+            if not values:
+                continue
+            if facet == 'brand':
+                masks[facet] = np.isin(self['brand'], [int(value) for value in values])
+            elif facet == 'category':
+                ids = [self.category_ids[slug] for slug in values if slug in self.category_ids]
+                masks[facet] = np.isin(self['category'], ids)
+            else:
+                codes = [CODES[facet].index(value) for value in values if value in CODES[facet]]
+                masks[facet] = np.isin(self[facet], codes)
+        for bit, flag in enumerate(FLAG_FACETS):
+            value = (flags or {}).get(flag)
+            if value is not None:
+                masks[flag] = ((self['flags'] >> bit) & 1).astype(bool) == value
+        if min_price is not None or max_price is not None:
+            price = self['price']
+            mask = np.ones(len(self), dtype=bool)
+            if min_price is not None:
+                mask &= price >= _paise(min_price)
+            if max_price is not None:
+                mask &= price <= _paise(max_price)
+            masks['price'] = mask
+        return masks
+
+    def filter(self, masks, ordering='-created_at'):
+        """Row positions matching every mask, in ``ordering`` with an id tiebreaker."""
+        selected = np.ones(len(self), dtype=bool)
+        for mask in masks.values():
+            selected &= mask
+        positions = np.flatnonzero(selected)
+        column, descending = ORDERINGS[ordering]
+        keys, ids = self[column][positions], self['id'][positions]
+        if descending:
+            keys, ids = -keys, -ids
+        return positions[np.lexsort((ids, keys))]
+
+    def counts(self, masks):
+        """Disjunctive facet counts in ``FacetIndex.counts`` form."""
+        everything = np.ones(len(self), dtype=bool)
+
+        def excluding(name):
+            scope = everything.copy()
+            for other, mask in masks.items():
+                if other != name:
+                    scope &= mask
+            return scope
+
+        result = {'total': int(excluding(None).sum())}
+        for facet in VALUE_FACETS + ('price',):
+            scope = excluding(facet)
+            if facet == 'brand':
+                values, counts = np.unique(self['brand'][scope], return_counts=True)
+                result[facet] = {int(value): int(count) for value, count in zip(values, counts)}
+            elif facet == 'category':
+                values, counts = np.unique(self['category'][scope], return_counts=True)
+                result[facet] = {
+                    self.categories[int(value)][1]: int(count)
+                    for value, count in zip(values, counts) if value != NO_VALUE
+                }
+            elif facet == 'price':
+                counts = np.bincount(self['price_bucket'][scope], minlength=len(PRICE_BUCKETS))
+                result[facet] = {position: int(count) for position, count in enumerate(counts) if count}
+            else:
+                counts = np.bincount(self[facet][scope], minlength=len(CODES[facet]))
+                result[facet] = {
+                    value: int(counts[code]) for code, value in enumerate(CODES[facet]) if counts[code]
+                }
+        for bit, flag in enumerate(FLAG_FACETS):
+            scope = excluding(flag)
+            total = int(scope.sum())
+            true_count = int((((self['flags'] >> bit) & 1).astype(bool) & scope).sum())
+            result[flag] = {True: true_count, False: total - true_count}
+        return result
+
+    def label(self, facet, value):
+        if facet == 'brand':
+            return self.brands.get(value, (value,))[0]
+        if facet == 'category':
+            category_id = self.category_ids.get(value)
+            return self.categories[category_id][0] if category_id is not None else value
+        return value
+
+    # Rendering
+
+    def listing(self, position, request=None):
+        """A row in ``ProductListingSerializer`` form."""
+        brand_id, category_id = int(self['brand'][position]), int(self['category'][position])
+        brand_name, brand_slug = self.brands.get(brand_id, ('', ''))
+        category = None
+        if category_id != NO_VALUE:
+            name, slug = self.categories[category_id]
+            category = {'id': category_id, 'name': name, 'slug': slug}
+        image = self.string(self['primary_image'][position])
+        image_url = None
+        if image:
+            image_url = TShirt._meta.get_field('primary_image').storage.url(image)
+            if request is not None:
+                image_url = request.build_absolute_uri(image_url)
+        variants = self.string(self['primary_image_variants'][position])
+        original_price = int(self['original_price'][position])
+        created_at = datetime.datetime.fromtimestamp(
+            int(self['created_at'][position]) / 1_000_000, tz=datetime.timezone.utc
+        )
+        return {
+            'id': int(self['id'][position]),
+            'title': self.string(self['title'][position]),
+            'slug': self.string(self['slug'][position]),
+            'brand': {'id': brand_id, 'name': brand_name, 'slug': brand_slug},
+            'category': category,
+            'size': _choice(SIZES, self['size'][position]),
+            'color': self.string(self['color'][position]),
+            'condition': _choice(CONDITIONS, self['condition'][position]),
+            'price': _money(int(self['price'][position])),
+            'original_price': _money(original_price) if original_price != NO_VALUE else None,
+            'discount_percentage': int(self['discount'][position]),
+            'primary_image': image_url,
+            'primary_image_srcset': build_srcset(json.loads(variants), image, request) if variants else None,
+            'is_featured': bool(self['flags'][position] & 1),
+            'quantity': int(self['quantity'][position]),
+            'is_available': True,
+            'created_at': _DATETIME.to_representation(created_at),
+        }
+
+
+_DATETIME = serializers.DateTimeField()
+
+
+def _choice(values, code):
+    """Decode a choice column; NO_CODE (a value outside the model choices) renders empty."""
+    return values[code] if code != NO_CODE else ''
+
+
+def _money(paise):
+    return f'{paise // 100}.{paise % 100:02d}'
+
+
+# Publishing
+
+def catalog_snapshot_enabled():
+    return getattr(settings, 'CATALOG_SNAPSHOT_ENABLED', False)
+
+
+def _directory():
+    return settings.CATALOG_SNAPSHOT_DIR
+
+
+def _current_name(directory):
+    try:
+        with open(os.path.join(directory, 'CURRENT')) as handle:
+            return handle.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish_snapshot(directory=None, blocking=True, keep=2):
+    """Build a new generation and atomically point ``CURRENT`` at it.
+
+    Returns:
+        str: path of the published file, or None if another process holds
+        the lock and ``blocking`` is False
+    """
+    directory = directory or _directory()
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return None
+        current = _current_name(directory)
+        generation = int(current.split('-')[1].split('.')[0]) + 1 if current else 1
+        name = f'snapshot-{generation:08d}.bin'
+        path = os.path.join(directory, name)
+        started = time.time()
+        write_snapshot(f'{path}.tmp', build_arrays(), generation, built_at=started)
+        os.replace(f'{path}.tmp', path)
+
+        pointer = os.path.join(directory, 'CURRENT')
+        with open(f'{pointer}.tmp', 'w') as handle:
+            handle.write(name)
+        os.replace(f'{pointer}.tmp', pointer)
+
+        # Readers still mapping an unlinked generation keep their pages.
+        for old in sorted(entry for entry in os.listdir(directory) if entry.startswith('snapshot-'))[:-keep]:
+            if old.endswith('.bin'):
+                os.remove(os.path.join(directory, old))
+    return path
+
+
+def mark_catalog_dirty():
+    """Flag the published snapshot as stale once the current transaction commits."""
+    if not catalog_snapshot_enabled():
+        return
+
+    def touch():
+        directory = _directory()
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'DIRTY'), 'a'):
+            pass
+        os.utime(os.path.join(directory, 'DIRTY'))
+    transaction.on_commit(touch)
+
+
+_snapshot = None
+_checked_at = 0.0
+_publishing = False
+_lock = threading.Lock()
+
+
+def _publish_in_background():
+    global _publishing
+
+    def run():
+        global _publishing
+        try:
+            publish_snapshot(blocking=False)
+        finally:
+            _publishing = False
+            close_old_connections()
+
+    if not _publishing:
+        _publishing = True
+        threading.Thread(target=run, name='catalog-snapshot', daemon=True).start()
+
+
+def get_catalog_snapshot():
+    """This process's mapping of the current snapshot, or None while none is published.
+
+    Checks the ``CURRENT`` pointer at most every CATALOG_SNAPSHOT_CHECK_SECONDS
+    and remaps when it moved. A missing or stale (``DIRTY`` newer than the
+    build, and older than CATALOG_SNAPSHOT_MIN_AGE seconds) snapshot is
+    republished in a background thread; requests never wait for it.
+    """
+    global _snapshot, _checked_at
+    now = time.monotonic()
+    with _lock:
+        if _snapshot is not None and now - _checked_at < settings.CATALOG_SNAPSHOT_CHECK_SECONDS:
+            return _snapshot
+        _checked_at = now
+        directory = _directory()
+        name = _current_name(directory)
+        if name is None:
+            _publish_in_background()
+            return None
+        if _snapshot is None or os.path.basename(_snapshot.path) != name:
+            try:
+                _snapshot = CatalogSnapshot(os.path.join(directory, name))
+            except (OSError, ValueError):
+                _publish_in_background()
+                return _snapshot
+        try:
+            dirty_at = os.stat(os.path.join(directory, 'DIRTY')).st_mtime
+        except FileNotFoundError:
+            dirty_at = 0
+        if dirty_at > _snapshot.built_at and time.time() - _snapshot.built_at >= settings.CATALOG_SNAPSHOT_MIN_AGE:
+            _publish_in_background()
+        return _snapshot
+
+
+def reset_catalog_snapshot():
+    global _snapshot, _checked_at
+    with _lock:
+        _snapshot = None
+        _checked_at = 0.0
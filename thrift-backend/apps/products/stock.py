@@ -0,0 +1,207 @@
+"""Append-only stock journal behind ``TShirt.quantity``.
+
+Every stock change (order sale, return, admin adjustment, import) is a
+StockMovement with an idempotency key, so the same change recorded twice
+(the payment webhook and ``verify_payment`` both confirming one order, or
+order creation and payment both selling the same item) applies once: the
+second insert is ignored by the unique key.
+
+Movements are inserted pending and applied per batch: the batch's products
+are locked once, their new quantities are computed from the movements in
+order, and written with one ``UPDATE ... CASE`` statement. The stock check
+happens there, under the row lock: a movement that would take a product
+below zero (two orders racing for the last unit) is rejected and removed
+instead of applied, so callers see it missing from the recorded result.
+``is_available`` follows the quantity (false at zero, true above). The
+TShirt ``pre_save``/``post_save`` signals are sent for each changed
+product with ``update_fields`` as a ``save(update_fields=...)`` would, so
+the read model, search/facet indexes and caches stay in step.
+
+Each applied movement stores ``quantity_after``, so the stock level at any
+moment is one index seek on ``(product, applied_at)``.
+"""
+import uuid
+
+from django.db import transaction
+from django.db.models import Case, OuterRef, Subquery, Value, When
+from django.db.models.signals import post_save, pre_save
+from django.utils import timezone
+
+from .models import StockMovement, TShirt
+
+STOCK_FIELDS = frozenset({'quantity', 'is_available', 'updated_at'})
+
+
+def order_item_key(item, kind='sale'):
+    """Idempotency key for a sale (or return) of one order item."""
+    return f'{kind}:order-item:{item.pk}'
+
+
+def unique_key(kind):
+    """Key for a movement that is never retried (e.g. one admin edit)."""
+    return f'{kind}:{uuid.uuid4().hex}'
+
+
+def recorded_keys(keys):
+    """The subset of ``keys`` already in the journal."""
+    return set(StockMovement.objects.filter(idempotency_key__in=list(keys)).values_list('idempotency_key', flat=True))
+
+
+def _apply(movements):
+    """Apply a batch of locked pending movements, ordered by id.
+
+    Returns:
+        int: movements applied (the rest were rejected for insufficient stock)
+    """
+    products = TShirt.objects.select_for_update().in_bulk({movement.product_id for movement in movements})
+    now = timezone.now()
+    quantities = {product_id: product.quantity for product_id, product in products.items()}
+    applied, rejected = [], []
+    for movement in movements:
+        quantity = quantities[movement.product_id] + movement.delta
+        if quantity < 0:
+            rejected.append(movement.pk)
+            continue
+        quantities[movement.product_id] = movement.quantity_after = quantity
+        movement.applied_at = now
+        applied.append(movement)
+    if rejected:
+        # Never applied, so the journal loses nothing; the key stays free for a retry.
+        StockMovement.objects.filter(pk__in=rejected).delete()
+    StockMovement.objects.bulk_update(applied, ['quantity_after', 'applied_at'])
+
+    changed = [product for product_id, product in products.items() if quantities[product_id] != product.quantity]
+    if not changed:
+        return len(applied)
+    for product in changed:
+        pre_save.send(sender=TShirt, instance=product, raw=False, using=TShirt.objects.db, update_fields=STOCK_FIELDS)
+    TShirt.objects.filter(pk__in=[product.pk for product in changed]).update(
+        quantity=Case(*[When(pk=product.pk, then=Value(quantities[product.pk])) for product in changed]),
+        is_available=Case(*[When(pk=product.pk, then=Value(quantities[product.pk] > 0)) for product in changed]),
+        updated_at=now,
+    )
+    for product in changed:
+        product.quantity = quantities[product.pk]
+        product.is_available = product.quantity > 0
+        product.updated_at = now
+        post_save.send(
+            sender=TShirt, instance=product, created=False, raw=False, using=TShirt.objects.db,
+            update_fields=STOCK_FIELDS,
+        )
+    return len(applied)
+
+
+def apply_stock_movements(product_ids=None, batch_size=500):
+    """Apply pending movements oldest first, ``batch_size`` per transaction.
+
+    Movements another worker has locked are skipped rather than waited for.
+    ``product_ids`` limits the run to those products.
+
+    Returns:
+        int: movements applied (rejected ones are not counted)
+    """
+    pending = StockMovement.objects.filter(applied_at__isnull=True)
+    if product_ids is not None:
+        pending = pending.filter(product_id__in=list(product_ids))
+    applied = 0
+    while True:
+        with transaction.atomic():
+            movements = list(pending.order_by('id').select_for_update(skip_locked=True)[:batch_size])
+            if not movements:
+                break
+            applied += _apply(movements)
+        if len(movements) < batch_size:
+            break
+    return applied
+
+
+def record_stock_movements(movements):
+    """Insert movements, skipping any whose idempotency key is already recorded,
+    then apply the pending movements of the affected products.
+
+    Returns:
+        dict: idempotency key -> recorded StockMovement, for the given keys
+        that are now recorded (including ones recorded earlier); keys of
+        movements rejected for insufficient stock are missing
+    """
+    if not movements:
+        return {}
+    keys = [movement.idempotency_key for movement in movements]
+    with transaction.atomic():
+        StockMovement.objects.bulk_create(movements, ignore_conflicts=True)
+        apply_stock_movements(product_ids={movement.product_id for movement in movements})
+    return StockMovement.objects.in_bulk(keys, field_name='idempotency_key')
+
+
+def move_stock(product_id, delta, kind, idempotency_key=None, reference=''):
+    """Record and apply one movement; returns the recorded StockMovement, or None if it was rejected."""
+    idempotency_key = idempotency_key or unique_key(kind)
+    recorded = record_stock_movements([StockMovement(
+        product_id=product_id, kind=kind, delta=delta, idempotency_key=idempotency_key, reference=reference
+    )])
+    return recorded.get(idempotency_key)
+
+
+def set_stock(product, quantity, reference=''):
+    """Record an admin adjustment that brings ``product`` to ``quantity``."""
+    with transaction.atomic():
+        current = TShirt.objects.select_for_update().values_list('quantity', flat=True).get(pk=product.pk)
+        return move_stock(product.pk, quantity - current, 'adjustment', reference=reference)
+
+
+def save_product(product, reference='', **kwargs):
+    """Save an edited product, journalling a quantity change as an admin adjustment.
+
+    The row is saved with its stored quantity and then moved to the edited
+    one by ``set_stock``, so full-form edits (Django admin, the admin API)
+    don't bypass the journal.
+    """
+    if product.pk is None:
+        # The creation signal journals the opening stock.
+        product.save(**kwargs)
+        return
+    quantity = product.quantity
+    with transaction.atomic():
+        product.quantity = TShirt.objects.select_for_update().values_list('quantity', flat=True).get(pk=product.pk)
+        product.save(**kwargs)
+        if quantity != product.quantity:
+            set_stock(product, quantity, reference=reference)
+            product.quantity, product.is_available = quantity, quantity > 0
+
+
+def record_opening_stock(tshirts, kind='import'):
+    """Journal the initial quantity of newly created products as already-applied movements."""
+    now = timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            product_id=tshirt.pk, kind=kind, delta=tshirt.quantity, idempotency_key=f'opening:{tshirt.pk}',
+            quantity_after=tshirt.quantity, applied_at=now
+        )
+        for tshirt in tshirts
+        if tshirt.quantity
+    ], ignore_conflicts=True)
+
+
+def _history(at):
+    return StockMovement.objects.filter(applied_at__lte=at).order_by('-applied_at', '-id')
+
+
+def stock_at(product_id, at):
+    """Stock level of a product at ``at``.
+
+    0 before its first movement; for products that predate the journal that
+    is the opening movement stamped when the migration ran.
+    """
+    quantity = _history(at).filter(product_id=product_id).values_list('quantity_after', flat=True).first()
+    return quantity or 0
+
+
+def stock_levels_at(product_ids, at):
+    """{product id: stock level at ``at``} for many products in one query."""
+    latest = _history(at).filter(product_id=OuterRef('pk')).values('quantity_after')[:1]
+    return {
+        product_id: quantity or 0
+        for product_id, quantity in TShirt.objects.filter(pk__in=product_ids).order_by().annotate(
+            quantity_at=Subquery(latest)
+        ).values_list('id', 'quantity_at')
+    }
@@ -0,0 +1,156 @@
+"""Normalized tags maintained from the comma-separated ``TShirt.tags`` field.
+
+``TShirt.tags`` stays the editable source. Each tag is normalized to a
+slug (so "Rock & Roll" and "rock-roll" are one tag), stored once in
+``Tag`` and linked to products through ``TShirtTag``. ``Tag.product_count``
+is kept incrementally: a link counts while its product is available, and
+the count moves by one whenever a link is added, removed or changes
+availability.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils.text import slugify
+
+from .models import Tag, TShirt, TShirtTag
+
+MAX_TAG_LENGTH = 50
+
+
+def parse_tags(text):
+    """Normalized (slug, name) pairs of a comma-separated tag string, in order, without duplicates."""
+    pairs = {}
+    for raw in (text or '').split(','):
+        name = ' '.join(raw.split()).lower()[:MAX_TAG_LENGTH]
+        slug = slugify(name)[:60]
+        if slug and slug not in pairs:
+            pairs[slug] = name
+    return list(pairs.items())
+
+
+def _tag_ids(pairs):
+    """Map slugs to Tag ids, creating missing tags."""
+    if not pairs:
+        return {}
+    names = dict(pairs)
+    ids = dict(Tag.objects.filter(slug__in=names).values_list('slug', 'id'))
+    missing = [Tag(slug=slug, name=name) for slug, name in names.items() if slug not in ids]
+    if missing:
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        ids.update(Tag.objects.filter(slug__in=[tag.slug for tag in missing]).values_list('slug', 'id'))
+    return ids
+
+
+def adjust_tag_counts(deltas):
+    """Apply {tag_id: delta} to Tag.product_count with one UPDATE per distinct delta."""
+    by_delta = {}
+    for tag_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(tag_id)
+    for delta, tag_ids in by_delta.items():
+        Tag.objects.filter(pk__in=tag_ids).update(product_count=Greatest(F('product_count') + delta, 0))
+
+
+def apply_tags(rows, dry_run=False):
+    """Bring the links of the given products in line with their tag strings.
+
+    Args:
+        rows: iterable of (tshirt id, tags string, is_available)
+        dry_run: only report which products are out of line
+
+    Returns:
+        list: ids of products whose links changed (or would change)
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    wanted = {tshirt_id: (parse_tags(tags), available) for tshirt_id, tags, available in rows}
+
+    with transaction.atomic():
+        all_pairs = {pair for pairs, _ in wanted.values() for pair in pairs}
+        ids = _tag_ids(all_pairs) if not dry_run else dict(
+            Tag.objects.filter(slug__in=[slug for slug, _ in all_pairs]).values_list('slug', 'id')
+        )
+        current = {}
+        for link_id, tshirt_id, tag_id, available in TShirtTag.objects.filter(
+            tshirt_id__in=wanted
+        ).values_list('id', 'tshirt_id', 'tag_id', 'tshirt_available'):
+            current.setdefault(tshirt_id, {})[tag_id] = (link_id, available)
+
+        changed = []
+        removed, added, flipped = [], [], {True: [], False: []}
+        deltas = Counter()
+        for tshirt_id, (pairs, available) in wanted.items():
+            links = current.get(tshirt_id, {})
+            desired = {ids.get(slug) for slug, _ in pairs}
+            if None in desired:
+                # Dry run with a tag that doesn't exist yet.
+                changed.append(tshirt_id)
+                continue
+            stale = [link_id for tag_id, (link_id, _) in links.items() if tag_id not in desired]
+            new = [tag_id for tag_id in desired if tag_id not in links]
+            moved = {tag_id: link_id for tag_id, (link_id, was) in links.items() if tag_id in desired and was != available}
+            if not (stale or new or moved):
+                continue
+            changed.append(tshirt_id)
+            removed.extend(stale)
+            added.extend(TShirtTag(tshirt_id=tshirt_id, tag_id=tag_id, tshirt_available=available) for tag_id in new)
+            flipped[available].extend(moved.values())
+            for tag_id in moved:
+                deltas[tag_id] += 1 if available else -1
+            if available:
+                deltas.update(new)
+
+        if dry_run or not changed:
+            return changed
+
+        # Removed links decrement their tags through the TShirtTag post_delete signal.
+        TShirtTag.objects.filter(pk__in=removed).delete()
+        TShirtTag.objects.bulk_create(added)
+        for available, link_ids in flipped.items():
+            if link_ids:
+                TShirtTag.objects.filter(pk__in=link_ids).update(tshirt_available=available)
+        adjust_tag_counts(deltas)
+    return changed
+
+
+def sync_tshirt_tags(tshirt):
+    """Update one product's links after a save."""
+    return apply_tags([(tshirt.pk, tshirt.tags, tshirt.is_available)])
+
+
+def refresh_tshirt_tags(queryset, batch_size=500, dry_run=False):
+    """Re-derive links for every product in ``queryset``, in batches."""
+    changed = []
+    batch = []
+    for row in queryset.order_by().values_list('id', 'tags', 'is_available').iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            changed.extend(apply_tags(batch, dry_run=dry_run))
+            batch = []
+    changed.extend(apply_tags(batch, dry_run=dry_run))
+    return changed
+
+
+def reconcile_tags(fix=True, batch_size=500):
+    """Check links against ``TShirt.tags`` and counts against the links, repairing drift.
+
+    Returns:
+        tuple: (ids of products with drifted links, ids of tags with drifted counts)
+    """
+    products = refresh_tshirt_tags(TShirt.objects.all(), batch_size=batch_size, dry_run=not fix)
+
+    expected = dict(
+        TShirtTag.objects.filter(tshirt_available=True).order_by().values('tag_id')
+        .annotate(n=Count('id')).values_list('tag_id', 'n')
+    )
+    drifted = []
+    for tag in Tag.objects.only('id', 'product_count').iterator(chunk_size=batch_size):
+        if tag.product_count != expected.get(tag.pk, 0):
+            tag.product_count = expected.get(tag.pk, 0)
+            drifted.append(tag)
+    if fix and drifted:
+        Tag.objects.bulk_update(drifted, ['product_count'], batch_size=batch_size)
+    return products, [tag.pk for tag in drifted]
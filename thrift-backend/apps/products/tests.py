@@ -1,13 +1,45 @@
-from django.test import TestCase
+import csv
+import gzip
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
+from datetime import timedelta
 from decimal import Decimal
-from .models import TShirt, Brand, Category
+from .models import (
+    TShirt, Brand, Category, ProductListing, ProductReservation, ProductReservationStats, SimilarTShirt, StockMovement, Tag,
+    TShirtReview, TShirtReviewStats,
+)
+from .autocomplete import reset_suggestion_index
+from .facets import reset_facet_index
+from .feeds import FeedWriter, SitemapFeed
+from .fit import get_fit_index, reset_fit_index
+from .reservation_stats import expire_reservations
+from .search import SearchIndex, get_search_index, reset_search_index, stem, tokenize
+from .similarity import rebuild_similar_items, reset_similarity_model
+from .snapshot import get_catalog_snapshot, publish_snapshot, reset_catalog_snapshot
+from .stock import move_stock, order_item_key, save_product, stock_at, stock_levels_at
+from .utils import get_available_quantity, reduce_inventory_for_order
+from apps.common.response_cache import model_versions
 from apps.common.validators import sanitize_html, validate_email, validate_phone
+from apps.orders.inventory import InventoryManager
+from apps.orders.models import Order, OrderItem
 
+@override_settings(CATALOG_SEARCH_INDEX_PATH=None)
 class ProductAPITestCase(TestCase):
     def setUp(self):
+        reset_search_index()
         self.client = APIClient()
         self.brand = Brand.objects.create(name='Test Brand', slug='test-brand')
         self.category = Category.objects.create(name='T-Shirt', slug='tshirt')
@@ -33,6 +65,34 @@ class ProductAPITestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['title'], 'Test Shirt')
     
+    def test_batch_products(self):
+        """Test batch hydration keeps request order, reports missing ids and caps the size"""
+        other = TShirt.objects.create(
+            title='Other Shirt', slug='other-shirt', brand=self.brand, price=Decimal('300.00'), size='l',
+            condition='good'
+        )
+        sold = TShirt.objects.create(
+            title='Sold Shirt', slug='sold-shirt', brand=self.brand, price=Decimal('300.00'), size='l',
+            condition='good', is_available=False
+        )
+        ids = f'{other.id},{self.product.id},999,{sold.id},{other.id}'
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/v1/products/tshirts/batch/?ids={ids}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['slug'] for item in response.data['results']], ['other-shirt', 'test-shirt'])
+        self.assertEqual(response.data['missing'], [999, sold.id])
+        self.assertEqual(response.data['results'][1]['brand']['name'], 'Test Brand')
+
+        response = self.client.get('/api/v1/products/tshirts/batch/?slugs=test-shirt,nope&fields=id,slug')
+        self.assertEqual(response.data['results'], [{'id': self.product.id, 'slug': 'test-shirt'}])
+        self.assertEqual(response.data['missing'], ['nope'])
+
+        with override_settings(PRODUCT_BATCH_MAX=2):
+            response = self.client.get(f'/api/v1/products/tshirts/batch/?ids={ids}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/v1/products/tshirts/batch/?ids=1,x')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_search_products(self):
         """Test product search"""
         response = self.client.get('/api/v1/products/tshirts/?search=Test')
@@ -61,3 +121,1191 @@ class ValidatorTestCase(TestCase):
         
         with self.assertRaises(Exception):
             validate_phone('123')
+
+class CursorPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        brand = Brand.objects.create(name='Test Brand', slug='test-brand')
+        for i in range(25):
+            TShirt.objects.create(
+                title=f'Shirt {i:02d}',
+                slug=f'shirt-{i}',
+                brand=brand,
+                price=Decimal('100.00') + (i % 5),
+                size='m',
+                condition='good'
+            )
+
+    def _walk(self, url, **headers):
+        ids = []
+        while url:
+            response = self.client.get(url, **headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_cursor_walk_is_stable_for_duplicate_prices(self):
+        """Test keyset pages cover every row once when sort keys repeat"""
+        ids = self._walk('/api/v1/products/tshirts/?pagination=cursor&ordering=-price')
+        expected = list(TShirt.objects.order_by('-price', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_accept_header_opt_in(self):
+        """Test cursor mode is selected by Accept version"""
+        ids = self._walk('/api/v1/products/tshirts/?ordering=title', HTTP_ACCEPT='application/json; version=cursor')
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+
+    def test_approximate_total_and_invalid_cursor(self):
+        """Test optional total and rejection of a cursor from another ordering"""
+        response = self.client.get('/api/v1/products/tshirts/?pagination=cursor&include_total=1&ordering=price')
+        self.assertEqual(response.data['approximate_count'], 25)
+        self.assertTrue(response.data['count_is_exact'])
+
+        next_url = response.data['next']
+        response = self.client.get(next_url.replace('ordering=price', 'ordering=title'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_mode_unchanged(self):
+        """Test default pagination still reports an exact count"""
+        response = self.client.get('/api/v1/products/tshirts/')
+        self.assertEqual(response.data['count'], 25)
+
+@override_settings(CATALOG_SEARCH_INDEX_PATH=None)
+class ProductListingReadModelTestCase(TestCase):
+    def setUp(self):
+        reset_search_index()
+        self.client = APIClient()
+        self.brand = Brand.objects.create(name='Test Brand', slug='test-brand')
+        self.category = Category.objects.create(name='Band Tees', slug='band-tees')
+        self.product = TShirt.objects.create(
+            title='Rock Tour Tee',
+            slug='rock-tour-tee',
+            description='Faded 1994 tour print',
+            brand=self.brand,
+            category=self.category,
+            price=Decimal('400.00'),
+            original_price=Decimal('800.00'),
+            size='m',
+            color='Black',
+            condition='good'
+        )
+
+    def test_listing_follows_writes(self):
+        """Test listing rows track TShirt, Brand and Category saves"""
+        listing = ProductListing.objects.get(tshirt=self.product)
+        self.assertEqual(listing.discount_percentage, 50)
+        self.assertIn('test brand', listing.search_text)
+
+        self.brand.name = 'Renamed Brand'
+        self.brand.save()
+        self.category.slug = 'band'
+        self.category.save()
+        listing.refresh_from_db()
+        self.assertEqual(listing.brand_name, 'Renamed Brand')
+        self.assertIn('renamed brand', listing.search_text)
+        self.assertEqual(listing.category_slug, 'band')
+
+        self.product.is_available = False
+        self.product.save()
+        self.assertFalse(ProductListing.objects.filter(tshirt=self.product).exists())
+
+    @override_settings(CATALOG_READ_MODEL_ENABLED=True)
+    def test_list_served_from_read_model(self):
+        """Test list endpoint filters and searches the read model"""
+        response = self.client.get('/api/v1/products/tshirts/?category=band-tees&search=tour')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        item = response.data['results'][0]
+        self.assertEqual(item['id'], self.product.id)
+        self.assertEqual(item['brand']['name'], 'Test Brand')
+        self.assertEqual(item['category']['slug'], 'band-tees')
+
+        response = self.client.get('/api/v1/products/tshirts/?search=denim')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_rebuild_command(self):
+        """Test the rebuild command restores drifted rows"""
+        ProductListing.objects.all().delete()
+        call_command('rebuild_product_listings', stdout=StringIO())
+        self.assertTrue(ProductListing.objects.filter(tshirt=self.product).exists())
+
+@override_settings(CATALOG_SEARCH_INDEX_PATH=None)
+class CatalogSearchTestCase(TestCase):
+    def setUp(self):
+        reset_search_index()
+        self.client = APIClient()
+        self.brand = Brand.objects.create(name='Harley Davidson', slug='harley-davidson')
+        self.title_hit = TShirt.objects.create(
+            title='Vintage Harley T-Shirt',
+            slug='vintage-harley',
+            description='Single stitch, faded black',
+            brand=self.brand,
+            price=Decimal('900.00'),
+            size='l',
+            color='Black',
+            condition='good'
+        )
+        self.description_hit = TShirt.objects.create(
+            title='Black Tour Tee',
+            slug='black-tour-tee',
+            description='Looks vintage',
+            brand=self.brand,
+            price=Decimal('500.00'),
+            size='m',
+            color='Grey',
+            condition='good'
+        )
+
+    def test_tokenize(self):
+        """Test normalization, synonyms and plural stemming"""
+        self.assertEqual(tokenize('The Grey T-Shirts of 1994'), ['gray', 'tee', '1994'])
+        self.assertEqual(stem('hoodies'), 'hoody')
+        self.assertEqual(stem('dress'), 'dress')
+
+    def test_ranking_and_prefix_match(self):
+        """Test title hits outrank description hits and prefixes match"""
+        index = get_search_index()
+        ids = [doc_id for doc_id, _ in index.search('vintage')]
+        self.assertEqual(ids, [self.title_hit.id, self.description_hit.id])
+        self.assertEqual([doc_id for doc_id, _ in index.search('harl')], ids)
+        self.assertEqual(index.search('vintage denim'), [])
+
+    def test_index_follows_writes(self):
+        """Test saves and deletes update a loaded index"""
+        index = get_search_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.description_hit.description = 'Plain'
+            self.description_hit.save()
+        self.assertEqual([doc_id for doc_id, _ in index.search('vintage')], [self.title_hit.id])
+
+        # A rolled-back write never reaches the index.
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.title_hit.is_available = False
+            self.title_hit.save()
+            raise RuntimeError
+        self.assertEqual([doc_id for doc_id, _ in index.search('vintage')], [self.title_hit.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.title_hit.save()
+        self.assertEqual(index.search('vintage'), [])
+
+    def test_snapshot_round_trip_and_catch_up(self):
+        """Test a saved snapshot reloads and syncs rows changed since"""
+        index = SearchIndex()
+        index.sync(full=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'index.bin')
+            index.save(path)
+            TShirt.objects.filter(pk=self.title_hit.pk).update(is_available=False)
+            restored = SearchIndex.load(path)
+
+        self.assertEqual(restored.search('tour'), index.search('tour'))
+        restored.sync()
+        self.assertNotIn(self.title_hit.id, restored)
+
+    def test_search_endpoint_orders_by_relevance(self):
+        """Test the list endpoint returns index hits best first"""
+        response = self.client.get('/api/v1/products/tshirts/?search=vintage')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [self.title_hit.id, self.description_hit.id]
+        )
+
+        response = self.client.get('/api/v1/products/tshirts/?search=vintage&ordering=price')
+        self.assertEqual(response.data['results'][0]['id'], self.description_hit.id)
+
+        response = self.client.get('/api/v1/products/tshirts/?search=vintage&pagination=cursor')
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [self.title_hit.id, self.description_hit.id]
+        )
+
+    @override_settings(CATALOG_SEARCH_MAX_HITS=1)
+    def test_search_hits_are_capped(self):
+        """Test only the best CATALOG_SEARCH_MAX_HITS hits are listed"""
+        response = self.client.get('/api/v1/products/tshirts/?search=vintage')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['id'], self.title_hit.id)
+
+    def test_stopword_query_falls_back_to_icontains(self):
+        """Test a query with no index terms still matches text"""
+        self.assertEqual(tokenize('to'), [])
+        response = self.client.get('/api/v1/products/tshirts/?search=to')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.description_hit.id])
+
+class SearchSuggestionTestCase(TestCase):
+    def setUp(self):
+        reset_suggestion_index()
+        self.client = APIClient()
+        self.brand = Brand.objects.create(name='Adidas', slug='adidas')
+        self.other_brand = Brand.objects.create(name='Adirondack', slug='adirondack')
+        for i in range(3):
+            TShirt.objects.create(
+                title=f'Trefoil Tee {i}',
+                slug=f'trefoil-{i}',
+                description='Classic logo',
+                brand=self.brand,
+                price=Decimal('600.00'),
+                size='m',
+                color='Black',
+                tags='retro,sport',
+                condition='good'
+            )
+        self.lone = TShirt.objects.create(
+            title='Adirondack Camp Tee',
+            slug='adirondack-camp',
+            description='Camp print',
+            brand=self.other_brand,
+            price=Decimal('300.00'),
+            size='s',
+            color='Green',
+            condition='good'
+        )
+
+    def _values(self, query):
+        response = self.client.get('/api/v1/products/search/suggestions/', {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(item['type'], item['value'], item['count']) for item in response.data['suggestions']]
+
+    def test_prefix_ranked_by_live_count(self):
+        """Test prefix matches are ordered by product count"""
+        values = self._values('adi')
+        self.assertEqual(values[0], ('brand', 'Adidas', 3))
+        self.assertIn(('brand', 'Adirondack', 1), values)
+        self.assertIn(('title', 'Adirondack Camp Tee', 1), self._values('camp'))
+
+    def test_typo_falls_back_to_trigrams(self):
+        """Test misspelled queries still suggest close values"""
+        self.assertIn(('brand', 'Adidas', 3), self._values('addidas'))
+
+    def test_follows_catalog_writes(self):
+        """Test counts and entries follow saves and deletes"""
+        self._values('ad')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lone.delete()
+        self.assertNotIn('Adirondack', [value for _, value, _ in self._values('adi')])
+
+        self.brand.name = 'Adidas Originals'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brand.save()
+        self.assertEqual(self._values('origin')[0], ('brand', 'Adidas Originals', 3))
+
+@override_settings(CATALOG_SEARCH_INDEX_PATH=None)
+class FacetCountTestCase(TestCase):
+    def setUp(self):
+        reset_facet_index()
+        self.client = APIClient()
+        self.nike = Brand.objects.create(name='Nike', slug='nike')
+        self.levis = Brand.objects.create(name='Levis', slug='levis')
+        specs = [
+            (self.nike, 'm', Decimal('300.00'), False),
+            (self.nike, 'l', Decimal('1200.00'), True),
+            (self.nike, 'm', Decimal('450.00'), False),
+            (self.levis, 'm', Decimal('800.00'), True),
+        ]
+        self.products = [
+            TShirt.objects.create(
+                title=f'Tee {i}',
+                slug=f'tee-{i}',
+                description='Plain tee',
+                brand=brand,
+                price=price,
+                size=size,
+                color='White',
+                has_stains=stained,
+                condition='good'
+            )
+            for i, (brand, size, price, stained) in enumerate(specs)
+        ]
+
+    def _facets(self, params=''):
+        response = self.client.get(f'/api/v1/products/facets/{params}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def _count(self, data, facet, value):
+        return next(item['count'] for item in data['facets'][facet] if item['value'] == value)
+
+    def test_disjunctive_counts(self):
+        """Test a facet ignores its own selection but honours the others"""
+        data = self._facets(f'?brand={self.nike.id}&size=m')
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(self._count(data, 'brand', self.levis.id), 1)
+        self.assertEqual(self._count(data, 'size', 'l'), 1)
+        self.assertEqual(data['facets']['has_stains'], {'true': 0, 'false': 2})
+
+    def test_price_and_database_filters(self):
+        """Test price range and non-bitset filters narrow the counts"""
+        data = self._facets('?min_price=400&color=white')
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(self._count(data, 'brand', self.nike.id), 2)
+        buckets = {str(item['min']): item['count'] for item in data['facets']['price']}
+        self.assertEqual(buckets['250'], 2)
+
+    def test_follows_writes(self):
+        """Test bitsets are updated when a product changes"""
+        self._facets()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].size = 'xl'
+            self.products[0].save()
+            self.products[3].delete()
+        data = self._facets()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(self._count(data, 'size', 'xl'), 1)
+        self.assertNotIn(self.levis.id, [item['value'] for item in data['facets']['brand']])
+
+    def test_price_histogram(self):
+        """Test price buckets ignore the price range, and are cached until a product changes"""
+        url = f'/api/v1/products/price-histogram/?brand={self.nike.id}&min_price=400&bins=3'
+        data = self.client.get(url).json()
+        self.assertEqual((data['total'], data['selected'], data['min'], data['max']), (3, 2, 300.0, 1200.0))
+        self.assertEqual([bucket['count'] for bucket in data['buckets']], [2, 0, 1])
+        self.assertEqual(data['buckets'][1], {'min': 600.0, 'max': 900.0, 'count': 0})
+
+        with self.assertNumQueries(0):
+            self.client.get(f'/api/v1/products/price-histogram/?bins=3&min_price=400&brand={self.nike.id}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[1].price = Decimal('700.00')
+            self.products[1].save()
+        data = self.client.get(url).json()
+        self.assertEqual(data['max'], 700.0)
+        self.assertEqual([bucket['count'] for bucket in data['buckets']], [1, 1, 1])
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.brand = Brand.objects.create(name='Test Brand', slug='test-brand')
+
+    def test_hit_skips_database_and_honours_etag(self):
+        """Test cached metadata is served without queries and revalidates"""
+        first = self.client.get('/api/v1/products/filters/')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        etag = first['ETag']
+
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/v1/products/filters/')
+        self.assertEqual(second.content, first.content)
+
+        response = self.client.get('/api/v1/products/filters/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_bumps_version(self):
+        """Test a save invalidates dependent cached responses"""
+        etag = self.client.get('/api/v1/products/brands/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Brand.objects.create(name='New Brand', slug='new-brand')
+
+        response = self.client.get('/api/v1/products/brands/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_version_bumps_on_commit(self):
+        """Test nothing is cached under the new version before the write commits"""
+        first = self.client.get('/api/v1/products/brands/')
+        versions = model_versions([Brand])
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Brand.objects.create(name='New Brand', slug='new-brand')
+                # Mid-transaction reads still hit the old entry; the version hasn't moved.
+                self.assertEqual(model_versions([Brand]), versions)
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get('/api/v1/products/brands/').content, first.content)
+        self.assertNotEqual(model_versions([Brand]), versions)
+        self.assertEqual(self.client.get('/api/v1/products/brands/').json()['count'], 2)
+
+class ReviewStatsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        brand = Brand.objects.create(name='Test Brand', slug='test-brand')
+        self.product = TShirt.objects.create(
+            title='Review Tee',
+            slug='review-tee',
+            description='Tee with reviews',
+            brand=brand,
+            price=Decimal('500.00'),
+            size='m',
+            condition='good'
+        )
+        self.users = [User.objects.create_user(username=f'reviewer{i}', password='pass12345') for i in range(3)]
+
+    def _review(self, user, rating):
+        return TShirtReview.objects.create(tshirt=self.product, user=user, rating=rating, title='Title', comment='Comment')
+
+    def _stats(self):
+        return TShirtReviewStats.objects.get(tshirt=self.product)
+
+    def test_stats_follow_review_writes(self):
+        """Test creates, edits and deletes keep counts and histogram exact"""
+        first = self._review(self.users[0], 5)
+        self._review(self.users[1], 3)
+        stats = self._stats()
+        self.assertEqual((stats.review_count, stats.rating_sum), (2, 8))
+        self.assertEqual(stats.average_rating, 4.0)
+
+        first.rating = 4
+        first.save()
+        self.assertEqual(self._stats().histogram, {1: 0, 2: 0, 3: 1, 4: 1, 5: 0})
+
+        first.delete()
+        stats = self._stats()
+        self.assertEqual((stats.review_count, stats.rating_sum, stats.rating_4), (1, 3, 0))
+
+    def test_detail_reads_stored_stats(self):
+        """Test the detail endpoint serves stats without aggregating reviews"""
+        self._review(self.users[0], 4)
+        self._review(self.users[1], 2)
+        response = self.client.get(f'/api/v1/products/tshirts/{self.product.slug}/')
+        self.assertEqual(response.data['reviews_count'], 2)
+        self.assertEqual(response.data['average_rating'], 3.0)
+        self.assertEqual(response.data['rating_histogram'][4], 1)
+
+    def test_review_list_cursor_walk(self):
+        """Test every sort mode pages through all reviews once"""
+        users = self.users + [User.objects.create_user(username=f'extra{i}', password='pass12345') for i in range(9)]
+        for i, user in enumerate(users):
+            self._review(user, i % 5 + 1)
+
+        expected_orders = {
+            'newest': ('-created_at', '-id'),
+            'oldest': ('created_at', 'id'),
+            'rating_high': ('-rating', '-created_at', '-id'),
+            'rating_low': ('rating', '-created_at', '-id'),
+        }
+        for sort, ordering in expected_orders.items():
+            url = f'/api/v1/products/products/{self.product.id}/reviews/?sort={sort}&page_size=5'
+            ids = []
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data['total_reviews'], 12)
+                ids.extend(review['id'] for review in response.data['reviews'])
+                url = response.data['next']
+            expected = list(TShirtReview.objects.filter(tshirt=self.product).order_by(*ordering).values_list('id', flat=True))
+            self.assertEqual(ids, expected, sort)
+
+    def test_rating_low_reads_in_index_order(self):
+        """Test the mixed-direction rating_low sort is served by an index instead of a sort"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan text is SQLite specific')
+        for i, user in enumerate(self.users):
+            self._review(user, i % 5 + 1)
+        plan = TShirtReview.objects.filter(tshirt=self.product).select_related('user').order_by(
+            'rating', '-created_at', '-id'
+        )[:11].explain()
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_detail_conditional_get(self):
+        """Test detail ETags answer 304 and change with reviews"""
+        url = f'/api/v1/products/tshirts/{self.product.slug}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self._review(self.users[0], 5)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['reviews_count'], 1)
+
+    @override_settings(CATALOG_DETAIL_CACHE_ENABLED=True)
+    def test_detail_body_cache(self):
+        """Test cached detail bodies are reused until the product changes"""
+        url = f'/api/v1/products/tshirts/{self.product.slug}/'
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+
+        self.product.price = Decimal('450.00')
+        self.product.save()
+        self.assertEqual(self.client.get(url).json()['price'], '450.00')
+
+    def test_reconcile_command_repairs_drift(self):
+        """Test the reconcile command restores stats after out-of-band writes"""
+        self._review(self.users[0], 5)
+        TShirtReviewStats.objects.filter(tshirt=self.product).update(review_count=7, rating_5=0)
+        call_command('reconcile_review_stats', stdout=StringIO())
+        stats = self._stats()
+        self.assertEqual((stats.review_count, stats.rating_5), (1, 1))
+
+
+class ReservationStatsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        brand = Brand.objects.create(name='Test Brand', slug='test-brand')
+        self.product = TShirt.objects.create(
+            title='Drop Tee', slug='drop-tee', brand=brand, price=Decimal('500.00'), size='m', condition='good',
+            quantity=5
+        )
+        self.users = [User.objects.create_user(username=f'shopper{i}', password='pass12345') for i in range(2)]
+
+    def _reserve(self, user, quantity):
+        self.client.force_authenticate(user)
+        return self.client.post(f'/api/v1/products/{self.product.id}/reserve/', {'quantity': quantity}, format='json')
+
+    def test_counter_follows_reservation_writes(self):
+        """Test creates, resizes, deletes and expiries keep the reserved quantity exact"""
+        self.assertEqual(self._reserve(self.users[0], 2).status_code, status.HTTP_200_OK)
+        self.assertEqual(self._reserve(self.users[1], 4).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._reserve(self.users[1], 3).status_code, status.HTTP_200_OK)
+        self.assertEqual(self._reserve(self.users[0], 1).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_available_quantity(self.product), 1)
+
+        ProductReservation.objects.get(user=self.users[0]).delete()
+        self.assertEqual(get_available_quantity(self.product), 2)
+
+        reservation = ProductReservation.objects.get(user=self.users[1])
+        reservation.expires_at = timezone.now() - timedelta(minutes=1)
+        reservation.save()
+        self.assertEqual(get_available_quantity(self.product), 5)
+        reservation.refresh_from_db()
+        self.assertFalse(reservation.is_active)
+        self.assertEqual(ProductReservationStats.objects.get(product=self.product).reserved_quantity, 0)
+
+    def test_sweeper_expires_in_batches(self):
+        """Test the sweeper deactivates overdue reservations in batches and releases the counter"""
+        past, future = timezone.now() - timedelta(minutes=1), timezone.now() + timedelta(minutes=10)
+        other = TShirt.objects.create(
+            title='Other Tee', slug='other-tee', brand=self.product.brand, price=Decimal('300.00'), size='l',
+            condition='good', quantity=3
+        )
+        ProductReservation.objects.create(product=self.product, user=self.users[0], quantity=2, expires_at=past)
+        ProductReservation.objects.create(product=self.product, user=self.users[1], quantity=1, expires_at=future)
+        ProductReservation.objects.create(product=other, user=self.users[0], quantity=3, expires_at=past)
+
+        self.assertEqual(expire_reservations(batch_size=1), 2)
+        self.assertEqual(ProductReservation.objects.filter(is_active=True).count(), 1)
+        stats = ProductReservationStats.objects.get(product=self.product)
+        self.assertEqual((stats.reserved_quantity, stats.next_expiry), (1, future))
+        self.assertEqual(ProductReservationStats.objects.get(product=other).reserved_quantity, 0)
+
+        out = StringIO()
+        call_command('expire_reservations', stdout=out)
+        self.assertIn('Expired 0 reservations', out.getvalue())
+
+    def test_batch_status(self):
+        """Test batch reservation status uses a constant number of queries and caches anonymous responses"""
+        cache.clear()
+        others = [
+            TShirt.objects.create(
+                title=f'Tee {i}', slug=f'tee-{i}', brand=self.product.brand, price=Decimal('300.00'), size='l',
+                condition='good', quantity=1
+            )
+            for i in range(3)
+        ]
+        self._reserve(self.users[0], 2)
+        self._reserve(self.users[1], 1)
+        self.client.force_authenticate(self.users[1])
+        self.client.post(f'/api/v1/products/{others[0].id}/reserve/', {'quantity': 1}, format='json')
+        ids = [self.product.id] + [tshirt.id for tshirt in others] + [999]
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/v1/products/reservation-status/?ids={','.join(map(str, ids))}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {item['product_id']: item for item in response.data['results']}
+        self.assertEqual(response.data['missing'], [999])
+        self.assertEqual(results[self.product.id]['quantity'], 1)
+        self.assertEqual(results[self.product.id]['available_quantity'], 3)
+        self.assertTrue(results[others[0].id]['is_own_reservation'])
+        self.assertFalse(results[others[1].id]['is_reserved'])
+
+        self.client.force_authenticate(None)
+        url = f'/api/v1/products/reservation-status/?ids={others[0].id}'
+        self.assertEqual(self.client.get(url).data['results'][0]['is_own_reservation'], False)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_reconcile_command_repairs_drift(self):
+        """Test the reconcile command restores the counter after out-of-band writes"""
+        self._reserve(self.users[0], 2)
+        ProductReservation.objects.filter(user=self.users[0]).update(quantity=4)
+        out = StringIO()
+        call_command('reconcile_reservations', '--check', stdout=out)
+        self.assertIn('drifted for 1 products', out.getvalue())
+        call_command('reconcile_reservations', stdout=StringIO())
+        self.assertEqual(get_available_quantity(self.product), 1)
+
+
+class StockMovementTestCase(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(name='Test Brand', slug='test-brand')
+        self.products = [
+            TShirt.objects.create(
+                title=f'Stock Tee {i}', slug=f'stock-tee-{i}', brand=brand, price=Decimal('400.00'), size='m',
+                condition='good', quantity=3
+            )
+            for i in range(2)
+        ]
+        user = User.objects.create_user(username='buyer', password='pass12345')
+        self.order = Order.objects.create(
+            user=user, subtotal=Decimal('1200.00'), total_amount=Decimal('1200.00'), shipping_name='Buyer',
+            shipping_email='buyer@example.com', shipping_address_line1='1 Street', shipping_city='Pune',
+            shipping_state='MH', shipping_postal_code='411001'
+        )
+        for product, quantity in zip(self.products, (2, 3)):
+            OrderItem.objects.create(
+                order=self.order, tshirt=product, quantity=quantity, price=product.price,
+                product_title=product.title, product_brand='Test Brand', product_size='m', product_color='black'
+            )
+
+    def test_order_sale_applies_once(self):
+        """Test repeated payment confirmations take an order's stock once, in one batched update"""
+        opened = timezone.now()
+        with CaptureQueriesContext(connection) as queries:
+            result = reduce_inventory_for_order(self.order)
+        self.assertEqual(result['total_products_updated'], 2)
+        stock_updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "products_tshirt"')]
+        self.assertEqual(len(stock_updates), 1)
+
+        self.assertEqual(reduce_inventory_for_order(self.order)['total_products_updated'], 0)
+        item = self.order.items.get(tshirt=self.products[0])
+        self.assertEqual(
+            InventoryManager.reserve_stock(item.tshirt_id, item.quantity, idempotency_key=order_item_key(item)),
+            (True, None)
+        )
+        for product, expected in zip(self.products, (1, 0)):
+            product.refresh_from_db()
+            self.assertEqual(product.quantity, expected)
+        self.assertFalse(self.products[1].is_available)
+
+        sold = timezone.now()
+        self.assertTrue(InventoryManager.release_stock(self.products[1].id, 1, idempotency_key='return:rma-1'))
+        self.assertTrue(InventoryManager.release_stock(self.products[1].id, 1, idempotency_key='return:rma-1'))
+        self.products[1].refresh_from_db()
+        self.assertEqual((self.products[1].quantity, self.products[1].is_available), (1, True))
+
+        self.assertEqual(stock_at(self.products[0].id, opened), 3)
+        self.assertEqual(
+            stock_levels_at([product.id for product in self.products], sold),
+            {self.products[0].id: 1, self.products[1].id: 0}
+        )
+        self.assertEqual(StockMovement.objects.filter(kind='sale').count(), 2)
+
+    def test_oversell_is_rejected(self):
+        """Test a sale larger than the locked stock is rejected rather than clamped, and admin edits are journalled"""
+        product = self.products[0]
+        self.assertIsNone(move_stock(product.id, -4, 'sale', idempotency_key='sale:too-many'))
+        self.assertFalse(StockMovement.objects.filter(idempotency_key='sale:too-many').exists())
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 3)
+
+        product.quantity, product.title = 5, 'Renamed Tee'
+        save_product(product, reference='admin:test')
+        product.refresh_from_db()
+        self.assertEqual((product.quantity, product.title), (5, 'Renamed Tee'))
+        self.assertEqual(StockMovement.objects.filter(product=product, kind='adjustment').last().quantity_after, 5)
+
+
+@override_settings(PRODUCT_IMAGE_WORKERS=0, PRODUCT_IMAGE_WIDTHS=[320, 640, 1024], PRODUCT_IMAGE_FORMATS=['webp', 'jpeg'])
+@override_settings(PRODUCT_IMAGE_VARIANTS_ASYNC=False)
+class ImageVariantTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+        self.brand = Brand.objects.create(name='Test Brand', slug='test-brand')
+
+    def _upload(self, name, size=(800, 600)):
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, format='JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def test_upload_renders_variants_and_srcset(self):
+        """Test saving a photo renders capped-width variants exposed as srcset"""
+        with self.captureOnCommitCallbacks(execute=True):
+            product = TShirt.objects.create(
+                title='Photo Tee', slug='photo-tee', brand=self.brand, price=Decimal('300.00'),
+                size='m', condition='good', primary_image=self._upload('photo.jpg'),
+            )
+        product.refresh_from_db()
+        entry = product.image_variants['primary_image']
+        self.assertEqual((entry['width'], entry['height']), (800, 600))
+        self.assertEqual(sorted({variant['width'] for variant in entry['variants']}), [320, 640, 800])
+        for variant in entry['variants']:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, variant['name'])))
+
+        item = self.client.get('/api/v1/products/tshirts/').data['results'][0]
+        srcset = item['primary_image_srcset']
+        self.assertEqual([source['type'] for source in srcset['sources']], ['image/webp', 'image/jpeg'])
+        self.assertIn('-640w.webp 640w', srcset['sources'][0]['srcset'])
+        self.assertTrue(srcset['src'].endswith('-800w.jpg'))
+
+        detail = self.client.get('/api/v1/products/tshirts/photo-tee/').data
+        self.assertEqual(list(detail['image_srcsets']), ['primary_image'])
+
+    def test_backfill_command(self):
+        """Test the backfill renders photos saved without variants"""
+        with override_settings(PRODUCT_IMAGE_VARIANTS_ON_UPLOAD=False):
+            product = TShirt.objects.create(
+                title='Old Tee', slug='old-tee', brand=self.brand, price=Decimal('300.00'),
+                size='m', condition='good', primary_image=self._upload('old.jpg', (200, 300)),
+                image_2=self._upload('old-back.jpg'),
+            )
+        self.assertIsNone(self.client.get('/api/v1/products/tshirts/').data['results'][0]['primary_image_srcset'])
+
+        call_command('build_image_variants', workers=0, stdout=StringIO())
+        product.refresh_from_db()
+        self.assertEqual(set(product.image_variants), {'primary_image', 'image_2'})
+        self.assertEqual([v['width'] for v in product.image_variants['primary_image']['variants']], [200, 200])
+        self.assertEqual(ProductListing.objects.get(tshirt=product).primary_image_variants['source'], product.primary_image.name)
+
+
+@override_settings(PRODUCT_IMAGE_WORKERS=0, PRODUCT_IMAGE_WIDTHS=[320], PRODUCT_IMAGE_FORMATS=['jpeg'])
+class CatalogImportTestCase(TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=os.path.join(self.workdir, 'media'))
+        media.enable()
+        self.addCleanup(media.disable)
+        Brand.objects.create(name='Nike', slug='nike')
+        Image.new('RGB', (400, 500), (10, 10, 10)).save(os.path.join(self.workdir, 'front.jpg'))
+
+    def test_import_csv_with_rejects(self):
+        """Test a CSV import inserts valid rows in batches and writes rejects"""
+        path = os.path.join(self.workdir, 'lot.csv')
+        header = 'title,description,brand,category,size,color,material,condition,price,is_featured,primary_image\n'
+        rows = [
+            'Band Tee,Faded print,nike,Band Tees,L,Black,Cotton,Very Good,450,yes,front.jpg',
+            'Band Tee,Second copy,NIKE,band-tees,m,White,Cotton,good,300,,front.jpg',
+            'Odd Tee,Wrong size,Nike,,huge,Red,Cotton,good,300,,front.jpg',
+            'Lost Tee,Missing photo,Acme,,s,Red,Cotton,good,300,,missing.jpg',
+            'Surf Tee,Sun faded,Acme,,s,Blue,Cotton,fair,250.5,no,front.jpg',
+        ]
+        with open(path, 'w') as handle:
+            handle.write(header + '\n'.join(rows) + '\n')
+
+        out = StringIO()
+        call_command('import_catalog', path, batch_size=2, stdout=out)
+        self.assertIn('Imported 3 products', out.getvalue())
+
+        slugs = sorted(TShirt.objects.values_list('slug', flat=True))
+        self.assertEqual(slugs, ['band-tee', 'band-tee-2', 'surf-tee'])
+        band_tee = TShirt.objects.get(slug='band-tee')
+        self.assertEqual((band_tee.size, band_tee.condition, band_tee.is_featured), ('l', 'very_good', True))
+        self.assertEqual(band_tee.category.slug, 'band-tees')
+        self.assertEqual(Category.objects.count(), 1)
+        self.assertEqual(Brand.objects.filter(slug='acme').count(), 1)
+        self.assertEqual(ProductListing.objects.count(), 3)
+        self.assertIn('primary_image', band_tee.image_variants)
+
+        with open(os.path.join(self.workdir, 'lot.rejects.csv'), newline='') as handle:
+            rejects = list(csv.DictReader(handle))
+        self.assertEqual([row['title'] for row in rejects], ['Odd Tee', 'Lost Tee'])
+        self.assertEqual(rejects[0]['error'], 'size: unknown choice "huge"')
+        self.assertTrue(rejects[1]['error'].startswith('primary_image:'))
+
+    def test_import_jsonl_dry_run(self):
+        """Test a JSONL dry run validates without writing"""
+        path = os.path.join(self.workdir, 'lot.jsonl')
+        with open(path, 'w') as handle:
+            handle.write('{"title": "Tee", "description": "x", "brand": "Nike", "size": "s", "color": "Red",'
+                         ' "material": "Cotton", "condition": "good", "price": "10", "primary_image": "front.jpg"}\n')
+            handle.write('not json\n')
+        out = StringIO()
+        call_command('import_catalog', path, dry_run=True, stdout=out)
+        self.assertIn('Validated 1 products', out.getvalue())
+        self.assertIn('Rejected 1 rows', out.getvalue())
+        self.assertFalse(TShirt.objects.exists())
+
+
+class TagTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.brand = Brand.objects.create(name='Test Brand', slug='test-brand')
+        self.rock = self._product('rock-tee', 'Rock, rockabilly, 90s')
+        self.surf = self._product('surf-tee', 'rockabilly,  Surf ,surf')
+
+    def _product(self, slug, tags):
+        return TShirt.objects.create(
+            title=slug.replace('-', ' ').title(), slug=slug, brand=self.brand, price=Decimal('300.00'),
+            size='m', condition='good', tags=tags,
+        )
+
+    def _counts(self):
+        return dict(Tag.objects.values_list('slug', 'product_count'))
+
+    def test_exact_tag_filter(self):
+        """Test the tag filter matches whole tags only"""
+        response = self.client.get('/api/v1/products/tshirts/?tag=Rock')
+        self.assertEqual([item['slug'] for item in response.data['results']], ['rock-tee'])
+        response = self.client.get('/api/v1/products/tshirts/?tag=surf,90s')
+        self.assertEqual(response.data['count'], 2)
+
+    def test_counts_follow_writes(self):
+        """Test tag counts track tag edits, availability and deletes"""
+        self.assertEqual(self._counts(), {'rock': 1, 'rockabilly': 2, '90s': 1, 'surf': 1})
+
+        self.rock.tags = 'rock, grunge'
+        self.rock.save()
+        self.surf.is_available = False
+        self.surf.save(update_fields=['is_available'])
+        self.assertEqual(self._counts(), {'rock': 1, 'rockabilly': 0, '90s': 0, 'surf': 0, 'grunge': 1})
+
+        self.rock.delete()
+        self.surf.is_available = True
+        self.surf.save()
+        self.assertEqual(self._counts(), {'rock': 0, 'rockabilly': 1, '90s': 0, 'surf': 1, 'grunge': 0})
+
+        response = self.client.get('/api/v1/products/tags/')
+        self.assertEqual(response.json()['tags'], [
+            {'name': 'rockabilly', 'slug': 'rockabilly', 'count': 1},
+            {'name': 'surf', 'slug': 'surf', 'count': 1},
+        ])
+
+    def test_reconcile_command_repairs_drift(self):
+        """Test the reconcile command rebuilds links and counts after out-of-band writes"""
+        TShirt.objects.filter(pk=self.rock.pk).update(tags='metal')
+        Tag.objects.filter(slug='surf').update(product_count=9)
+        out = StringIO()
+        call_command('reconcile_tags', check=True, stdout=out)
+        self.assertIn('1 products, counts for 1 tags', out.getvalue())
+
+        call_command('reconcile_tags', stdout=StringIO())
+        self.assertEqual(self._counts(), {'rock': 0, 'rockabilly': 1, '90s': 0, 'surf': 1, 'metal': 1})
+        response = self.client.get('/api/v1/products/tshirts/?tag=metal')
+        self.assertEqual(response.data['count'], 1)
+
+
+@override_settings(SIMILAR_ITEMS_ASYNC=False)
+class SimilarItemsTestCase(TestCase):
+    def setUp(self):
+        reset_similarity_model()
+        self.client = APIClient()
+        self.brand = Brand.objects.create(name='Test Brand', slug='test-brand')
+        self.other_brand = Brand.objects.create(name='Other Brand', slug='other-brand')
+        self.base = self._product('base-tee', self.brand, 'm', 'black', '500.00')
+        self.twin = self._product('twin-tee', self.brand, 'm', 'black', '520.00')
+        self.cousin = self._product('cousin-tee', self.brand, 'l', 'black', '480.00')
+        self.stranger = self._product('stranger-tee', self.other_brand, 'xxl', 'pink', '2500.00')
+        self.spare = self._product('spare-tee', self.other_brand, 'xs', 'white', '150.00')
+
+    def _product(self, slug, brand, size, color, price):
+        return TShirt.objects.create(
+            title=slug.replace('-', ' ').title(), slug=slug, brand=brand, price=Decimal(price),
+            size=size, color=color, condition='good', gender='unisex', pit_to_pit=Decimal('52.0'),
+        )
+
+    def _neighbours(self, tshirt):
+        return list(SimilarTShirt.objects.filter(tshirt=tshirt).values_list('similar__slug', flat=True))
+
+    @override_settings(SIMILAR_ITEMS_K=2)
+    def test_similar_endpoint_ranks_closest_products(self):
+        """Test neighbours are ranked by feature similarity and exclude the product itself"""
+        rebuild_similar_items()
+        response = self.client.get('/api/v1/products/tshirts/base-tee/similar/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['slug'] for item in response.data['results']], ['twin-tee', 'cousin-tee'])
+        self.assertGreater(response.data['results'][0]['similarity'], response.data['results'][1]['similarity'])
+
+        response = self.client.get('/api/v1/products/tshirts/missing-tee/similar/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(SIMILAR_ITEMS_K=2)
+    def test_sell_out_recomputes_only_affected_rows(self):
+        """Test a sold-out product is replaced only in the rows that listed it"""
+        rebuild_similar_items()
+        untouched = {
+            tshirt_id: list(rows) for tshirt_id, rows in (
+                (tshirt.pk, SimilarTShirt.objects.filter(tshirt=tshirt).values_list('id', flat=True))
+                for tshirt in (self.twin, self.stranger, self.spare)
+            )
+            if not SimilarTShirt.objects.filter(tshirt_id=tshirt_id, similar=self.cousin).exists()
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cousin.is_available = False
+            self.cousin.save(update_fields=['is_available', 'updated_at'])
+
+        self.assertFalse(SimilarTShirt.objects.filter(similar=self.cousin).exists())
+        self.assertEqual(self._neighbours(self.base)[0], 'twin-tee')
+        self.assertNotIn('cousin-tee', self._neighbours(self.base))
+        self.assertEqual(len(self._neighbours(self.base)), 2)
+        for tshirt_id, row_ids in untouched.items():
+            self.assertEqual(list(SimilarTShirt.objects.filter(tshirt_id=tshirt_id).values_list('id', flat=True)), row_ids)
+
+        # Sold-out products keep pointing to available alternatives.
+        response = self.client.get('/api/v1/products/tshirts/cousin-tee/similar/')
+        self.assertEqual({item['slug'] for item in response.data['results']}, {'base-tee', 'twin-tee'})
+
+    @override_settings(SIMILAR_ITEMS_K=2)
+    def test_new_product_enters_rows_and_get_is_read_only(self):
+        """Test a new product is stored by the update, and the endpoint itself never writes"""
+        rebuild_similar_items()
+        with self.captureOnCommitCallbacks(execute=True):
+            clone = self._product('clone-tee', self.brand, 'm', 'black', '510.00')
+        self.assertIn('clone-tee', self._neighbours(self.base))
+        self.assertTrue(SimilarTShirt.objects.filter(tshirt=clone).exists())
+
+        SimilarTShirt.objects.filter(tshirt=clone).delete()
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/products/tshirts/clone-tee/similar/')
+        self.assertEqual(response.data['results'], [])
+        self.assertFalse(SimilarTShirt.objects.filter(tshirt=clone).exists())
+
+
+class FitSearchTestCase(TestCase):
+    def setUp(self):
+        reset_fit_index()
+        self.client = APIClient()
+        self.brand = Brand.objects.create(name='Test Brand', slug='test-brand')
+        self.mine = self._product('mine-tee', pit_to_pit='21.00', front_length='28.00')
+        self.close = self._product('close-tee', pit_to_pit='21.50', front_length='28.00')
+        self.closer = self._product('closer-tee', pit_to_pit='21.00', front_length='28.25')
+        self.boxy = self._product('boxy-tee', pit_to_pit='24.00', front_length='27.00')
+        self.unmeasured = self._product('unmeasured-tee')
+
+    def _product(self, slug, **measurements):
+        return TShirt.objects.create(
+            title=slug.replace('-', ' ').title(), slug=slug, brand=self.brand, price=Decimal('300.00'),
+            size='m', condition='good',
+            **{name: Decimal(value) for name, value in measurements.items()},
+        )
+
+    def _slugs(self, query):
+        response = self.client.get(f'/api/v1/products/fit-search/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['slug'] for item in response.data['results']]
+
+    def test_fit_search_ranks_within_tolerance(self):
+        """Test matches are limited by tolerance and ranked by fit"""
+        self.assertEqual(self._slugs('like=mine-tee'), ['closer-tee', 'close-tee'])
+        self.assertEqual(
+            self._slugs('pit_to_pit=21&front_length=28&front_length_tolerance=0.1'),
+            ['mine-tee', 'close-tee'],
+        )
+        self.assertEqual(self._slugs('pit_to_pit=23.5&tolerance=0.5'), ['boxy-tee'])
+        # Zero is an exact match, not the default tolerance.
+        self.assertEqual(self._slugs('pit_to_pit=21&front_length=28&tolerance=0'), ['mine-tee'])
+
+        for query in ('tolerance=2', 'pit_to_pit=21&tolerance=-1', 'pit_to_pit=21&front_length_tolerance=-0.5'):
+            response = self.client.get(f'/api/v1/products/fit-search/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fit_index_follows_writes(self):
+        """Test the loaded index picks up sell-outs and new measurements"""
+        get_fit_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.closer.is_available = False
+            self.closer.save()
+            self.unmeasured.pit_to_pit = Decimal('21.10')
+            self.unmeasured.front_length = Decimal('28.00')
+            self.unmeasured.save()
+        self.assertEqual(self._slugs('like=mine-tee'), ['unmeasured-tee', 'close-tee'])
+
+
+class SparseFieldsetTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.brand = Brand.objects.create(name='Test Brand', slug='test-brand')
+        self.tshirt = TShirt.objects.create(
+            title='Band Tee', slug='band-tee', brand=self.brand, price=Decimal('450.00'),
+            original_price=Decimal('900.00'), size='m', condition='good', description='Soft cotton',
+        )
+
+    def test_fields_prune_payload_and_columns(self):
+        """Test ?fields= narrows the list payload and the columns queried"""
+        grid = 'id,slug,title,price,primary_image,condition'
+        for read_model in (False, True):
+            with override_settings(CATALOG_READ_MODEL_ENABLED=read_model):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(f'/api/v1/products/tshirts/?fields={grid}')
+                item = response.data['results'][0]
+                self.assertEqual(set(item), set(grid.split(',')))
+                select = next(query['sql'] for query in queries if 'ORDER BY' in query['sql'])
+                self.assertNotIn('brand', select)
+                self.assertNotIn('created_at"', select.split('FROM')[0])
+
+        response = self.client.get('/api/v1/products/tshirts/?fields=id,brand.name,discount_percentage')
+        self.assertEqual(response.data['results'][0], {
+            'id': self.tshirt.pk, 'brand': {'name': 'Test Brand'}, 'discount_percentage': 50,
+        })
+
+    def test_omit_on_detail(self):
+        """Test ?omit= drops detail fields, including nested ones"""
+        response = self.client.get('/api/v1/products/tshirts/band-tee/?omit=description,brand.description,all_images')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('description', response.data)
+        self.assertNotIn('all_images', response.data)
+        self.assertEqual(response.data['brand'], {'id': self.brand.pk, 'name': 'Test Brand', 'slug': 'test-brand'})
+        self.assertEqual(response.data['reviews_count'], 0)
+
+
+class ProductFeedTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.brand = Brand.objects.create(name='Acme & Sons', slug='acme')
+        self.tshirts = [
+            TShirt.objects.create(
+                title=f'Tee {number}', slug=f'tee-{number}', brand=self.brand, price=Decimal('300.00'),
+                size='m', condition='new_with_tags' if number == 0 else 'good', description='Soft <cotton>',
+            )
+            for number in range(4)
+        ]
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_feed_endpoint_serves_written_file(self):
+        """Test feeds are served from the written file, gzip-compressed when accepted, with an ETag"""
+        self.tshirts[3].is_available = False
+        self.tshirts[3].save()
+
+        with override_settings(PRODUCT_FEED_ROOT=self.root, PRODUCT_FEED_SHARD_SIZE=2):
+            response = self.client.get('/api/v1/products/feeds/google/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            body = gzip.decompress(b''.join(response.streaming_content)).decode()
+            self.assertEqual(body.count('<item>'), 3)
+            self.assertIn('<g:brand>Acme &amp; Sons</g:brand>', body)
+            self.assertIn('<g:condition>new</g:condition>', body)
+
+            # Served from the file until the next build, not re-rendered per request.
+            self.tshirts[0].delete()
+            response = self.client.get(
+                '/api/v1/products/feeds/google/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag']
+            )
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            response = self.client.get('/api/v1/products/feeds/meta/')
+            self.assertNotIn('Content-Encoding', response)
+            rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+            self.assertEqual([row['id'] for row in rows], [str(tshirt.pk) for tshirt in self.tshirts[1:3]])
+            self.assertEqual(self.client.get('/api/v1/products/feeds/unknown/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_sitemap_splits_into_index(self):
+        """Test a sitemap over the per-file URL limit is written as an index of parts"""
+        feed = SitemapFeed(media_base_url='http://testserver')
+        feed.max_items = 3
+        writer = FeedWriter(feed, root=self.root, shard_size=1)
+        writer.update()
+        with gzip.open(writer.output_path, 'rt') as handle:
+            index = handle.read()
+        self.assertIn('<sitemapindex', index)
+        self.assertIn('http://testserver/api/v1/products/feeds/sitemap/1/', index)
+
+        with override_settings(PRODUCT_FEED_ROOT=self.root):
+            parts = [self.client.get(f'/api/v1/products/feeds/sitemap/{part}/') for part in range(3)]
+        self.assertEqual([part.status_code for part in parts], [200, 200, 404])
+        self.assertEqual(
+            [b''.join(part.streaming_content).decode().count('<url>') for part in parts[:2]], [3, 1]
+        )
+
+        self.tshirts[3].delete()
+        writer.update()
+        self.assertFalse(os.path.exists(writer.part_path(0)))
+        with gzip.open(writer.output_path, 'rt') as handle:
+            self.assertEqual(handle.read().count('<url>'), 3)
+
+    def test_writer_rerenders_only_changed_shards(self):
+        """Test incremental runs rewrite only the shards holding changed products"""
+        writer = FeedWriter(SitemapFeed(media_base_url='http://testserver'), root=self.root, shard_size=1)
+        self.assertEqual(writer.update(), (4, 4, 4))
+        self.assertEqual(writer.update()[0], 0)
+
+        self.tshirts[1].slug = 'renamed-tee'
+        self.tshirts[1].save()
+        self.tshirts[2].delete()
+        self.assertEqual(writer.update(), (2, 3, 3))
+
+        with gzip.open(writer.output_path, 'rt') as handle:
+            body = handle.read()
+        self.assertTrue(body.startswith('<?xml') and body.endswith('</urlset>\n'))
+        self.assertEqual(body.count('<url>'), 3)
+        self.assertIn('/products/renamed-tee</loc>', body)
+        self.assertNotIn('/products/tee-2<', body)
+
+
+
+class CatalogSnapshotTestCase(TestCase):
+    def setUp(self):
+        reset_catalog_snapshot()
+        reset_facet_index()
+        self.client = APIClient()
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            CATALOG_SNAPSHOT_DIR=self.directory, CATALOG_SNAPSHOT_CHECK_SECONDS=0, CATALOG_SNAPSHOT_MIN_AGE=3600,
+        )
+        self.settings_override.enable()
+        nike = Brand.objects.create(name='Nike', slug='nike')
+        levis = Brand.objects.create(name='Levis', slug='levis')
+        category = Category.objects.create(name='Band Tees', slug='band-tees')
+        specs = [
+            (nike, None, 'm', Decimal('300.00'), None, False),
+            (nike, category, 'l', Decimal('1200.00'), Decimal('2000.00'), True),
+            (levis, category, 'm', Decimal('450.50'), None, False),
+            (levis, None, 's', Decimal('800.00'), Decimal('900.00'), True),
+        ]
+        self.products = [
+            TShirt.objects.create(
+                title=f'Tee {i}', slug=f'tee-{i}', brand=brand, category=category, size=size, price=price,
+                original_price=original_price, has_stains=stained, color='White', condition='good',
+            )
+            for i, (brand, category, size, price, original_price, stained) in enumerate(specs)
+        ]
+        self.nike = nike
+
+    def tearDown(self):
+        self.settings_override.disable()
+        reset_catalog_snapshot()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_listing_and_facets_match_database(self):
+        """Test snapshot listings and facet counts match the database paths"""
+        publish_snapshot()
+        for params in ['', '?ordering=price', '?size=m&ordering=-price', f'?brand={self.nike.id}&max_price=500',
+                       '?category=band-tees&has_stains=true']:
+            with override_settings(CATALOG_READ_MODEL_ENABLED=True):
+                expected = self.client.get(f'/api/v1/products/tshirts/{params}').json()
+            with override_settings(CATALOG_SNAPSHOT_ENABLED=True), self.assertNumQueries(1 if 'brand' in params else 0):
+                response = self.client.get(f'/api/v1/products/tshirts/{params}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), expected)
+
+            expected = self.client.get(f'/api/v1/products/facets/{params}').json()
+            with override_settings(CATALOG_SNAPSHOT_ENABLED=True):
+                self.assertEqual(self.client.get(f'/api/v1/products/facets/{params}').json(), expected)
+
+    @override_settings(CATALOG_SNAPSHOT_ENABLED=True)
+    def test_publish_swaps_generation(self):
+        """Test a republished snapshot replaces the mapped generation"""
+        publish_snapshot()
+        first = get_catalog_snapshot()
+        self.assertEqual((first.generation, len(first)), (1, 4))
+
+        self.products[0].price = Decimal('999.00')
+        self.products[0].save()
+        self.products[3].is_available = False
+        self.products[3].save()
+        call_command('publish_catalog_snapshot', stdout=StringIO())
+        second = get_catalog_snapshot()
+        self.assertEqual((second.generation, len(second)), (2, 3))
+        self.assertEqual(second.listing(0)['price'], '999.00')
+        # Readers holding the previous generation keep a valid mapping.
+        self.assertEqual(first.listing(0)['price'], '300.00')
+
+        response = self.client.get('/api/v1/products/tshirts/?ordering=-price')
+        self.assertEqual([item['slug'] for item in response.json()['results']], ['tee-1', 'tee-0', 'tee-2'])
+
+    @override_settings(CATALOG_SNAPSHOT_ENABLED=True)
+    def test_listing_with_unknown_choice(self):
+        """Test a size outside the model choices renders empty instead of failing"""
+        TShirt.objects.filter(pk=self.products[0].pk).update(size='4xl')
+        publish_snapshot()
+        self.assertEqual(get_catalog_snapshot().listing(0)['size'], '')
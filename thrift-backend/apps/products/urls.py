@@ -6,8 +6,10 @@ app_name = 'products'
 urlpatterns = [
     # T-Shirt endpoints
     path('tshirts/', views.TShirtListView.as_view(), name='tshirt-list'),
-    path('tshirts/<slug:slug>/', views.TShirtDetailView.as_view(), name='tshirt-detail'),
     path('tshirts/featured/', views.FeaturedTShirtsView.as_view(), name='featured-tshirts'),
+    path('tshirts/batch/', views.tshirt_batch, name='tshirt-batch'),
+    path('tshirts/<slug:slug>/', views.TShirtDetailView.as_view(), name='tshirt-detail'),
+    path('tshirts/<slug:slug>/similar/', views.similar_tshirts, name='tshirt-similar'),
     
     # Brand and Category endpoints
     path('brands/', views.BrandListView.as_view(), name='brand-list'),
@@ -21,6 +23,12 @@ urlpatterns = [
     # Utility endpoints
     path('search/suggestions/', views.search_suggestions, name='search-suggestions'),
     path('filters/', views.filter_options, name='filter-options'),
+    path('facets/', views.facet_counts, name='facet-counts'),
+    path('price-histogram/', views.price_histogram, name='price-histogram'),
+    path('tags/', views.tag_cloud, name='tag-cloud'),
+    path('fit-search/', views.fit_search, name='fit-search'),
+    path('feeds/<str:feed_format>/', views.product_feed, name='product-feed'),
+    path('feeds/<str:feed_format>/<int:part>/', views.product_feed, name='product-feed-part'),
     
     # Shipping Calculator endpoints
     path('shipping/calculate/', views.calculate_shipping, name='calculate-shipping'),
@@ -32,4 +40,5 @@ urlpatterns = [
     path('<int:product_id>/reserve/', views.create_reservation, name='create-reservation'),
     path('reservations/<int:reservation_id>/extend/', views.extend_reservation, name='extend-reservation'),
     path('<int:product_id>/reservation-status/', views.check_reservation_status, name='check-reservation-status'),
+    path('reservation-status/', views.reservation_status_batch, name='reservation-status-batch'),
 ]
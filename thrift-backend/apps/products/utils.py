@@ -1,54 +1,60 @@
-from django.db.models import Sum
-from django.utils import timezone
 from .models import ProductReservation
+from .reservation_engine import get_reservation_engine, release_hold
+from .reservation_stats import reserved_quantity
 
 def get_available_quantity(product):
-    """Get available quantity for a product considering active reservations."""
-    total_reserved = ProductReservation.objects.filter(
-        product=product,
-        is_active=True,
-        expires_at__gt=timezone.now()
-    ).aggregate(total=Sum('quantity'))['total'] or 0
-    
-    return max(0, product.quantity - total_reserved)
+    """Get available quantity for a product considering active reservations.
+
+    Reads the maintained ProductReservationStats row instead of summing the
+    reservations, or the reservation engine's holds when one is configured
+    (the stored counter lags its asynchronous write-through).
+    """
+    engine = get_reservation_engine()
+    if engine is not None:
+        return engine.available(product.pk, None, product.quantity)
+    return max(0, product.quantity - reserved_quantity(product.pk))
 
 def can_reserve_quantity(product, user, requested_quantity=1):
-    """Check if user can reserve the requested quantity."""
+    """Check if user can reserve the requested quantity.
+
+    The user's own reservation counts as available to them, so a unique item
+    (quantity = 1) can only be reserved when nobody else holds it. With a
+    reservation engine configured, its holds are checked instead.
+    """
+    engine = get_reservation_engine()
+    if engine is not None:
+        return engine.available(product.pk, user.pk, product.quantity) >= requested_quantity
+
     available = get_available_quantity(product)
-    
-    # For unique items (quantity = 1), only allow if no one else has reserved it
-    if product.quantity == 1:
-        # Check if anyone else has an active reservation
-        other_reservations = ProductReservation.objects.filter(
-            product=product,
-            is_active=True,
-            expires_at__gt=timezone.now()
-        ).exclude(user=user)
-        
-        if other_reservations.exists():
-            return False
-        
-        # User can reserve if no one else has it
-        return requested_quantity <= 1
-    
-    # For multiple quantity items, use normal logic
-    # If user already has a reservation, add their current quantity to available
-    try:
-        existing = ProductReservation.objects.get(
-            product=product, 
-            user=user, 
-            is_active=True,
-            expires_at__gt=timezone.now()
-        )
-        available += existing.quantity
-    except ProductReservation.DoesNotExist:
-        pass
-    
-    return available >= requested_quantity
+    # get_available_quantity released any overdue reservations, so is_active is exact.
+    own = ProductReservation.objects.filter(
+        product=product,
+        user=user,
+        is_active=True
+    ).values_list('quantity', flat=True).first() or 0
+
+    return available + own >= requested_quantity
+
+
+def hold_quantity(product, user, quantity, expires_at):
+    """Check and hold ``quantity`` for the user in one step when a reservation engine is configured.
+
+    Without an engine this only checks (``can_reserve_quantity``); the
+    caller writes the ProductReservation as before.
+    """
+    engine = get_reservation_engine()
+    if engine is None:
+        return can_reserve_quantity(product, user, quantity)
+    return engine.hold(product.pk, user.pk, quantity, product.quantity, expires_at)[0]
 
 
 def reduce_inventory_for_order(order):
     """Reduce product inventory based on order items.
+
+    Each item is a ``sale`` stock movement keyed by ``order_item_key``, so
+    calling this again for the same order (payment webhook and
+    verification both firing) takes no more stock; those items are simply
+    not reported again.
     
     Args:
         order: Order instance with related order items
@@ -60,27 +66,29 @@ def reduce_inventory_for_order(order):
         ValueError: If inventory reduction would result in negative quantities
     """
     from django.db import transaction
-    from .models import TShirt
+    from .models import StockMovement
+    from .stock import order_item_key, record_stock_movements, recorded_keys
     
     updated_products = []
     errors = []
     
     with transaction.atomic():
         # Get all order items with their products
-        order_items = order.items.select_related('tshirt').all()
+        order_items = list(order.items.select_related('tshirt'))
+        already_sold = recorded_keys(order_item_key(item) for item in order_items)
+        sales = []
         
         for item in order_items:
             if not item.tshirt:
                 # Product was deleted, skip inventory reduction
                 errors.append(f"Product for item '{item.product_title}' no longer exists")
                 continue
+            if order_item_key(item) in already_sold:
+                continue
                 
             product = item.tshirt
             ordered_quantity = item.quantity
             
-            # Lock the product for update to prevent race conditions
-            product = TShirt.objects.select_for_update().get(id=product.id)
-            
             # Check if we have enough inventory
             if product.quantity < ordered_quantity:
                 error_msg = (
@@ -90,23 +98,34 @@ def reduce_inventory_for_order(order):
                 errors.append(error_msg)
                 continue
             
-            # Reduce the inventory
-            new_quantity = product.quantity - ordered_quantity
-            product.quantity = new_quantity
-            
-            # Set availability based on remaining quantity
-            if new_quantity <= 0:
-                product.is_available = False
-                product.quantity = 0  # Ensure it doesn't go negative
-            
-            product.save(update_fields=['quantity', 'is_available'])
+            sales.append((item, StockMovement(
+                product=product,
+                kind='sale',
+                delta=-ordered_quantity,
+                idempotency_key=order_item_key(item),
+                reference=order.order_number,
+            )))
+        
+        recorded = record_stock_movements([movement for _, movement in sales])
+        for item, movement in sales:
+            if movement.idempotency_key in recorded:
+                # The sale took the stock the buyer's hold was keeping.
+                release_hold(item.tshirt.id, order.user_id)
+        for item, movement in sales:
+            if movement.idempotency_key not in recorded:
+                # Rejected under the row lock: a concurrent sale took the stock after the check above.
+                errors.append(
+                    f"Insufficient inventory for '{item.tshirt.title}'. Ordered: {item.quantity}"
+                )
+                continue
+            new_quantity = recorded[movement.idempotency_key].quantity_after
             updated_products.append({
-                'product_id': product.id,
-                'product_title': product.title,
-                'previous_quantity': product.quantity + ordered_quantity,
-                'new_quantity': product.quantity,
-                'ordered_quantity': ordered_quantity,
-                'is_available': product.is_available
+                'product_id': item.tshirt.id,
+                'product_title': item.tshirt.title,
+                'previous_quantity': item.tshirt.quantity,
+                'new_quantity': new_quantity,
+                'ordered_quantity': item.quantity,
+                'is_available': new_quantity > 0
             })
     
     # If there were any errors, raise an exception
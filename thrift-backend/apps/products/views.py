@@ -1,46 +1,175 @@
-from rest_framework import generics, filters, status
+import hashlib
+import os
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import generics, status, versioning
 from rest_framework.decorators import api_view, permission_classes
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django_filters.constants import EMPTY_VALUES
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Avg, Min, Max
+from django.db.models import Q, Min, Max
 from django.db import models
-from .models import TShirt, Brand, Category, TShirtReview, ShippingZone, ShippingMethod, ShippingRate, ShippingCalculator
+from django.http import FileResponse, StreamingHttpResponse
+from .models import TShirt, Brand, Category, SimilarTShirt, Tag, TShirtReview, TShirtReviewStats, ShippingZone, ShippingMethod, ShippingRate, ShippingCalculator, ProductListing
 from .serializers import (
     TShirtListSerializer, TShirtDetailSerializer, BrandSerializer,
-    CategorySerializer, TShirtReviewSerializer
+    CategorySerializer, TShirtReviewSerializer, ProductListingSerializer
 )
-from .filters import TShirtFilter
+from .filters import TShirtFilter, ProductListingFilter, CatalogSearchFilter, RelevanceOrderingFilter
+from .autocomplete import get_suggestion_index
+from .feeds import FEEDS, FeedWriter, gunzip_file
+from .fit import MEASUREMENTS, get_fit_index
+from .facets import FACET_FILTERS, FLAG_FACETS, PRICE_FILTERS, bitset_from_ids, describe_counts, get_facet_index
+from .pagination import CatalogPagination, ReviewPagination, wants_cursor_pagination
+from .search import get_search_index
+from .snapshot import ORDERINGS as SNAPSHOT_ORDERINGS, catalog_snapshot_enabled, get_catalog_snapshot
+from .read_model import read_model_enabled
+from apps.common.fieldsets import SparseFieldsetViewMixin, prune_queryset, sparse_fieldset_requested
+from apps.common.response_cache import cache_response, conditional_response, model_versions
 from apps.common.validators import sanitize_search_query, sanitize_html, validate_quantity
 
-class TShirtListView(generics.ListAPIView):
+class ListingReadModelMixin:
+    """Serve a catalog list from the ProductListing read model when enabled."""
+    listing_filters = {}
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if read_model_enabled():
+            if getattr(self, 'filterset_class', None) is not None:
+                self.filterset_class = ProductListingFilter
+            if getattr(self, 'search_fields', None):
+                self.search_fields = ['search_text']
+
+    def get_queryset(self):
+        if read_model_enabled():
+            return ProductListing.objects.filter(**self.listing_filters)
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if read_model_enabled():
+            return ProductListingSerializer
+        return super().get_serializer_class()
+
+class TShirtListView(SparseFieldsetViewMixin, ListingReadModelMixin, generics.ListAPIView):
     """List view for T-Shirts with filtering and search."""
     queryset = TShirt.objects.filter(is_available=True).select_related('brand', 'category')
     serializer_class = TShirtListSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, CatalogSearchFilter, RelevanceOrderingFilter]
     filterset_class = TShirtFilter
     search_fields = ['title', 'description', 'brand__name', 'color', 'tags']
     ordering_fields = ['price', 'created_at', 'title']
     ordering = ['-created_at']
-
-class TShirtDetailView(generics.RetrieveAPIView):
+    pagination_class = CatalogPagination
+    versioning_class = versioning.AcceptHeaderVersioning
+
+    def list(self, request, *args, **kwargs):
+        snapshot = get_catalog_snapshot() if snapshot_can_list(request) else None
+        if snapshot is not None:
+            filterset = TShirtFilter(request.query_params, queryset=TShirt.objects.none())
+            if filterset.is_valid():
+                data = filterset.form.cleaned_data
+                masks = snapshot.masks(
+                    _facet_selections(data), {flag: data.get(flag) for flag in FLAG_FACETS},
+                    data.get('min_price'), data.get('max_price'),
+                )
+                positions = snapshot.filter(masks, request.query_params.get('ordering') or '-created_at')
+                page = self.paginate_queryset(positions)
+                return self.get_paginated_response([snapshot.listing(position, request) for position in page])
+        if self.ranks_by_relevance(request):
+            return self.list_by_relevance(request)
+        return super().list(request, *args, **kwargs)
+
+    def ranks_by_relevance(self, request):
+        """Whether this is a page-number search listed in relevance order."""
+        if not CatalogSearchFilter.ranked_hits(request) or wants_cursor_pagination(request):
+            return False
+        ordering = RelevanceOrderingFilter().get_ordering(request, self.get_queryset(), self)
+        return bool(ordering) and ordering[0] == '-search_rank'
+
+    def list_by_relevance(self, request):
+        """Page through the ranked search hits, loading only the page's rows."""
+        queryset = self.filter_queryset(self.get_queryset())
+        matched = set(queryset.values_list('pk', flat=True))
+        page = self.paginate_queryset([
+            doc_id for doc_id, _ in CatalogSearchFilter.ranked_hits(request) if doc_id in matched
+        ])
+        rows = queryset.in_bulk(page)
+        serializer = self.get_serializer([rows[doc_id] for doc_id in page if doc_id in rows], many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+# Query parameters the catalog snapshot answers; anything else goes to the database.
+SNAPSHOT_LIST_PARAMS = frozenset(
+    {'brand', 'category', 'size', 'condition', 'gender', 'min_price', 'max_price', 'ordering', 'page', 'page_size'}
+) | frozenset(FLAG_FACETS)
+
+
+def snapshot_can_list(request):
+    """Whether a catalog list request can be served from the memory-mapped snapshot."""
+    if not catalog_snapshot_enabled() or wants_cursor_pagination(request):
+        return False
+    params = request.query_params
+    if not set(params).issubset(SNAPSHOT_LIST_PARAMS):
+        return False
+    return params.get('ordering', '-created_at') in SNAPSHOT_ORDERINGS
+
+
+def _facet_selections(data):
+    """Facet selections from TShirtFilter cleaned data."""
+    return {
+        'brand': [brand.pk for brand in data.get('brand') or []],
+        'category': data.get('category') or [],
+        'size': data.get('size') or [],
+        'condition': data.get('condition') or [],
+        'gender': data.get('gender') or [],
+    }
+
+def tshirt_detail_validators(request, slug):
+    """Weak ETag and Last-Modified for a product detail, from one indexed lookup.
+
+    The ETag covers the product row, its review stats and the brand/category
+    cache versions, since their names are nested in the payload.
+    """
+    row = TShirt.objects.filter(slug=slug, is_available=True).values_list(
+        'id', 'updated_at', 'review_stats__updated_at'
+    ).first()
+    if row is None:
+        return None
+    tshirt_id, updated_at, reviews_updated_at = row
+    last_modified = max(updated_at, reviews_updated_at or updated_at)
+    versions = ':'.join(str(version) for version in model_versions((Brand, Category)))
+    tag = hashlib.md5(f'{tshirt_id}:{updated_at.isoformat()}:{reviews_updated_at}:{versions}'.encode()).hexdigest()
+    return f'W/"{tag}"', last_modified
+
+@method_decorator(
+    conditional_response(tshirt_detail_validators, cache_enabled=lambda: settings.CATALOG_DETAIL_CACHE_ENABLED),
+    name='dispatch'
+)
+class TShirtDetailView(SparseFieldsetViewMixin, generics.RetrieveAPIView):
     """Detail view for individual T-Shirt."""
-    queryset = TShirt.objects.filter(is_available=True).select_related('brand', 'category')
+    queryset = TShirt.objects.filter(is_available=True).select_related('brand', 'category', 'review_stats')
     serializer_class = TShirtDetailSerializer
     lookup_field = 'slug'
 
-class FeaturedTShirtsView(generics.ListAPIView):
+class FeaturedTShirtsView(SparseFieldsetViewMixin, ListingReadModelMixin, generics.ListAPIView):
     """List view for featured T-Shirts."""
+    listing_filters = {'is_featured': True}
     queryset = TShirt.objects.filter(is_available=True, is_featured=True).select_related('brand', 'category')
     serializer_class = TShirtListSerializer
+    pagination_class = CatalogPagination
+    versioning_class = versioning.AcceptHeaderVersioning
 
+@method_decorator(cache_response(Brand), name='dispatch')
 class BrandListView(generics.ListAPIView):
     """List view for all brands."""
     queryset = Brand.objects.all()
     serializer_class = BrandSerializer
 
+@method_decorator(cache_response(Category), name='dispatch')
 class CategoryListView(generics.ListAPIView):
     """List view for all categories."""
     queryset = Category.objects.all()
@@ -66,30 +195,11 @@ def search_suggestions(request):
     if len(query) < 2:
         return Response({'suggestions': []})
     
-    # Search in brands, colors, and tags
-    brands = Brand.objects.filter(name__icontains=query)[:5]
-    colors = TShirt.objects.filter(color__icontains=query).values_list('color', flat=True).distinct()[:5]
-    
-    suggestions = []
-    
-    # Add brand suggestions
-    for brand in brands:
-        suggestions.append({
-            'type': 'brand',
-            'value': brand.name,
-            'label': f"Brand: {brand.name}"
-        })
-    
-    # Add color suggestions
-    for color in colors:
-        suggestions.append({
-            'type': 'color',
-            'value': color,
-            'label': f"Color: {color.title()}"
-        })
+    suggestions = get_suggestion_index().suggest(query, limit=10)
     
-    return Response({'suggestions': suggestions[:10]})
+    return Response({'suggestions': suggestions})
 
+@cache_response(Brand, Category, TShirt)
 @api_view(['GET'])
 def filter_options(request):
     """API endpoint to get all available filter options."""
@@ -143,6 +253,280 @@ def filter_options(request):
     })
 
 
+@cache_response(Tag, TShirt)
+@api_view(['GET'])
+def tag_cloud(request):
+    """API endpoint for the most used tags with their available product counts."""
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+    except ValueError:
+        limit = 50
+    tags = Tag.objects.filter(product_count__gt=0).order_by('-product_count', 'name')[:limit]
+    return Response({
+        'tags': [{'name': tag.name, 'slug': tag.slug, 'count': tag.product_count} for tag in tags]
+    })
+
+@api_view(['GET'])
+def tshirt_batch(request):
+    """API endpoint returning many products' detail data in one query.
+
+    Takes comma-separated ``ids`` or ``slugs`` (at most PRODUCT_BATCH_MAX).
+    Results follow the request order without duplicates; requested products
+    that don't exist or aren't available are listed under ``missing``.
+    Supports ``fields``/``omit`` like the detail endpoint.
+    """
+    if 'ids' in request.GET:
+        field, raw = 'pk', request.GET['ids']
+    elif 'slugs' in request.GET:
+        field, raw = 'slug', request.GET['slugs']
+    else:
+        return Response({'error': 'ids or slugs is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    keys = list(dict.fromkeys(value.strip() for value in raw.split(',') if value.strip()))
+    if field == 'pk':
+        try:
+            keys = list(dict.fromkeys(int(value) for value in keys))
+        except ValueError:
+            return Response({'error': 'ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(keys) > settings.PRODUCT_BATCH_MAX:
+        return Response(
+            {'error': f'At most {settings.PRODUCT_BATCH_MAX} products per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    context = {'request': request}
+    queryset = TShirt.objects.filter(is_available=True).select_related('brand', 'category', 'review_stats')
+    if sparse_fieldset_requested(request):
+        queryset = prune_queryset(queryset, TShirtDetailSerializer(context=context))
+    found = queryset.in_bulk(keys, field_name=field)
+    serializer = TShirtDetailSerializer([found[key] for key in keys if key in found], many=True, context=context)
+    return Response({
+        'count': len(serializer.data),
+        'results': serializer.data,
+        'missing': [key for key in keys if key not in found],
+    })
+
+@api_view(['GET'])
+def similar_tshirts(request, slug):
+    """API endpoint for the precomputed nearest available neighbours of a product.
+
+    Sold-out products still get alternatives. Read-only: rows are written by
+    the offline job and the update worker, so a product neither has reached
+    yet returns no results.
+    """
+    tshirt_id = TShirt.objects.filter(slug=slug).values_list('id', flat=True).first()
+    if tshirt_id is None:
+        return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+    k = settings.SIMILAR_ITEMS_K
+    try:
+        limit = min(max(int(request.GET.get('limit', k)), 1), k)
+    except ValueError:
+        limit = k
+
+    links = SimilarTShirt.objects.filter(tshirt_id=tshirt_id, similar__is_available=True)
+    ranked = list(links.order_by('rank').values_list('similar_id', 'score')[:limit])
+    tshirts = TShirt.objects.select_related('brand', 'category').in_bulk([similar_id for similar_id, _ in ranked])
+    serializer = TShirtListSerializer(
+        [tshirts[similar_id] for similar_id, _ in ranked], many=True, context={'request': request}
+    )
+    results = serializer.data
+    for item, (_, score) in zip(results, ranked):
+        item['similarity'] = round(score, 4)
+    return Response({'count': len(results), 'results': results})
+
+def _feed_file(feed_format, part=None):
+    """Path of a written feed file (writing the feed on first use), or None for an unknown feed or part."""
+    feed_class = FEEDS.get(feed_format)
+    if feed_class is None:
+        return None
+    writer = FeedWriter(feed_class(media_base_url=settings.PRODUCT_FEED_MEDIA_BASE_URL))
+    path = writer.ensure()
+    if part is not None:
+        path = writer.part_path(part)
+    return path if os.path.exists(path) else None
+
+
+def product_feed_validators(request, feed_format, part=None):
+    """Weak ETag and Last-Modified of the feed file, from one stat."""
+    path = _feed_file(feed_format, part)
+    if path is None:
+        return None
+    stat = os.stat(path)
+    modified = datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+    return f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"', modified
+
+
+@conditional_response(product_feed_validators)
+@api_view(['GET'])
+def product_feed(request, feed_format, part=None):
+    """Serve a merchant feed or the sitemap of every available product.
+
+    The file is the one ``build_product_feeds`` keeps up to date (written
+    here on first use), stored gzip-compressed: it is sent as is when the
+    client accepts gzip and decompressed on the fly otherwise. Large
+    sitemaps are an index whose parts are served with ``part``.
+    """
+    path = _feed_file(feed_format, part)
+    if path is None:
+        return Response({'error': 'Unknown feed'}, status=status.HTTP_404_NOT_FOUND)
+    content_type = FEEDS[feed_format].content_type
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(gunzip_file(path), content_type=content_type)
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+def _measurement_param(request, name):
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return None
+    value = float(value)
+    if not 0 <= value < 1000:
+        raise ValueError(name)
+    return value
+
+
+@api_view(['GET'])
+def fit_search(request):
+    """API endpoint for available products that fit like a reference garment.
+
+    The reference is given as measurement parameters (e.g. ``pit_to_pit=21``)
+    or taken from a product with ``like=<slug>``. ``tolerance`` sets the
+    allowed difference in inches for every measurement (0 for an exact match;
+    negative values are rejected) and ``<measurement>_tolerance`` overrides
+    it for one.
+    """
+    try:
+        reference = {name: _measurement_param(request, name) for name in MEASUREMENTS}
+        default_tolerance = _measurement_param(request, 'tolerance')
+        if default_tolerance is None:
+            default_tolerance = settings.FIT_SEARCH_DEFAULT_TOLERANCE
+        tolerances = {name: _measurement_param(request, f'{name}_tolerance') for name in MEASUREMENTS}
+        tolerances = {name: default_tolerance if value is None else value for name, value in tolerances.items()}
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        return Response({'error': 'Invalid measurement, tolerance or limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+    exclude = ()
+    like = request.GET.get('like')
+    if like:
+        row = TShirt.objects.filter(slug=like).values_list('id', *MEASUREMENTS).first()
+        if row is None:
+            return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+        exclude = (row[0],)
+        for name, value in zip(MEASUREMENTS, row[1:]):
+            if reference[name] is None and value is not None:
+                reference[name] = float(value)
+    reference = {name: value for name, value in reference.items() if value is not None}
+    if not reference:
+        return Response({'error': 'Provide at least one measurement'}, status=status.HTTP_400_BAD_REQUEST)
+
+    count, matches = get_fit_index().search(reference, tolerances, limit=limit, exclude=exclude)
+    tshirts = TShirt.objects.select_related('brand', 'category').in_bulk([tshirt_id for tshirt_id, _, _ in matches])
+    matches = [match for match in matches if match[0] in tshirts]
+    results = TShirtListSerializer(
+        [tshirts[tshirt_id] for tshirt_id, _, _ in matches], many=True, context={'request': request}
+    ).data
+    for item, (_, score, differences) in zip(results, matches):
+        item['fit_score'] = round(score, 4)
+        item['measurement_differences'] = differences
+    return Response({
+        'count': count,
+        'reference': reference,
+        'tolerances': {name: tolerances[name] for name in reference},
+        'results': results,
+    })
+
+def _filter_bitset(filterset, names):
+    """Apply the named filters through the database and return the matching ids as a bitset."""
+    queryset = filterset.queryset
+    for name in names:
+        queryset = filterset.filters[name].filter(queryset, filterset.form.cleaned_data[name])
+    return bitset_from_ids(queryset.values_list('id', flat=True))
+
+def _split_filters(filterset):
+    """(db_filters, price_filters): active TShirtFilter filters the bitsets can't answer, and price range ones."""
+    data = filterset.form.cleaned_data
+    active = [name for name in filterset.filters if data.get(name) not in EMPTY_VALUES]
+    db_filters = [name for name in active if name not in FACET_FILTERS | PRICE_FILTERS]
+    price_filters = [name for name in active if name in PRICE_FILTERS]
+    return db_filters, price_filters
+
+
+def _base_bitset(filterset, db_filters, query):
+    """Universe narrowed by database filters and search hits, or None when nothing narrows it."""
+    # Filters the bitsets can't answer narrow the universe with one id query each.
+    base = _filter_bitset(filterset, db_filters) if db_filters else None
+    if filterset.form.cleaned_data.get('is_available') is False:
+        base = 0
+    if query:
+        hits = bitset_from_ids(doc_id for doc_id, _ in get_search_index().search(query))
+        base = hits if base is None else base & hits
+    return base
+
+
+@api_view(['GET'])
+def facet_counts(request):
+    """API endpoint for per-value filter counts under the current TShirtFilter params."""
+    filterset = TShirtFilter(request.query_params, queryset=TShirt.objects.filter(is_available=True))
+    if not filterset.is_valid():
+        return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = filterset.form.cleaned_data
+    selections = _facet_selections(data)
+    flags = {flag: data.get(flag) for flag in FLAG_FACETS}
+    db_filters, price_filters = _split_filters(filterset)
+    query = request.query_params.get('search', '').strip()
+
+    # The snapshot answers facet and min/max price filters without building the bitset index.
+    if (
+        catalog_snapshot_enabled() and not db_filters and not query and data.get('is_available') is not False
+        and set(price_filters) <= {'min_price', 'max_price'}
+    ):
+        snapshot = get_catalog_snapshot()
+        if snapshot is not None:
+            masks = snapshot.masks(selections, flags, data.get('min_price'), data.get('max_price'))
+            return Response(describe_counts(snapshot.counts(masks), snapshot.label))
+
+    index = get_facet_index()
+    base = _base_bitset(filterset, db_filters, query)
+    price_mask = _filter_bitset(filterset, price_filters) if price_filters else None
+
+    counts = index.counts(selections, flags, base=base, price_mask=price_mask)
+    return Response(index.describe(counts))
+
+
+@cache_response(Brand, Category, TShirt)
+@api_view(['GET'])
+def price_histogram(request):
+    """API endpoint for the price slider: price buckets under the current TShirtFilter params.
+
+    The price range params don't narrow the histogram; ``selected`` counts
+    the products inside the range instead.
+    """
+    try:
+        bins = min(max(int(request.GET.get('bins', 20)), 1), 100)
+    except ValueError:
+        return Response({'error': 'bins must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    filterset = TShirtFilter(request.query_params, queryset=TShirt.objects.filter(is_available=True))
+    if not filterset.is_valid():
+        return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = filterset.form.cleaned_data
+    db_filters, price_filters = _split_filters(filterset)
+    base = _base_bitset(filterset, db_filters, request.query_params.get('search', '').strip())
+    price_mask = _filter_bitset(filterset, price_filters) if price_filters else None
+
+    histogram = get_facet_index().price_histogram(
+        _facet_selections(data), {flag: data.get(flag) for flag in FLAG_FACETS},
+        base=base, price_mask=price_mask, bins=bins,
+    )
+    histogram['buckets'] = [
+        {'min': lower, 'max': upper, 'count': count} for lower, upper, count in histogram['buckets']
+    ]
+    return Response(histogram)
+
+
 # Shipping Calculator API Endpoints
 
 @api_view(['POST'])
@@ -283,6 +667,7 @@ def calculate_shipping(request):
         )
 
 
+@cache_response(ShippingZone)
 @api_view(['GET'])
 def shipping_zones(request):
     """Get all available shipping zones."""
@@ -297,6 +682,7 @@ def shipping_zones(request):
     } for zone in zones])
 
 
+@cache_response(ShippingMethod)
 @api_view(['GET'])
 def shipping_methods(request):
     """Get all available shipping methods."""
@@ -311,6 +697,7 @@ def shipping_methods(request):
     } for method in methods])
 
 
+@cache_response(ShippingRate, ShippingZone, ShippingMethod)
 @api_view(['GET'])
 def shipping_rates(request):
     """Get all shipping rates for admin purposes."""
@@ -327,32 +714,33 @@ def shipping_rates(request):
     } for rate in rates])
 
 
+REVIEW_ORDERINGS = {
+    'newest': ('-created_at',),
+    'oldest': ('created_at',),
+    'rating_high': ('-rating', '-created_at'),
+    'rating_low': ('rating', '-created_at'),
+}
+
 @api_view(['GET'])
 def product_reviews(request, product_id):
-    """Get reviews for a specific product with sorting."""
+    """Get a cursor-paginated page of reviews for a product, with stored summary stats."""
     try:
-        product = TShirt.objects.get(id=product_id, is_available=True)
+        product = TShirt.objects.select_related('review_stats').get(id=product_id, is_available=True)
     except TShirt.DoesNotExist:
         return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    reviews = TShirtReview.objects.filter(tshirt=product).select_related('user')
+    stats = getattr(product, 'review_stats', None) or TShirtReviewStats(tshirt=product)
     
-    # Sorting
+    # Sorting (unknown values fall back to newest)
     sort_by = request.GET.get('sort', 'newest')
-    if sort_by == 'oldest':
-        reviews = reviews.order_by('created_at')
-    elif sort_by == 'rating_high':
-        reviews = reviews.order_by('-rating', '-created_at')
-    elif sort_by == 'rating_low':
-        reviews = reviews.order_by('rating', '-created_at')
-    else:  # newest (default)
-        reviews = reviews.order_by('-created_at')
+    ordering = REVIEW_ORDERINGS.get(sort_by, REVIEW_ORDERINGS['newest'])
+    reviews = TShirtReview.objects.filter(tshirt=product).select_related('user').order_by(*ordering)
     
-    # Calculate average rating
-    avg_rating = reviews.aggregate(avg=Avg('rating'))['avg'] or 0
+    paginator = ReviewPagination()
+    page = paginator.paginate_queryset(reviews, request)
     
     review_data = []
-    for review in reviews:
+    for review in page:
         review_data.append({
             'id': review.id,
             'rating': review.rating,
@@ -366,8 +754,10 @@ def product_reviews(request, product_id):
     
     return Response({
         'reviews': review_data,
-        'average_rating': round(avg_rating, 1),
-        'total_reviews': len(review_data)
+        'next': paginator.get_next_cursor_link(),
+        'average_rating': stats.average_rating,
+        'total_reviews': stats.review_count,
+        'rating_histogram': stats.histogram
     })
 
 
@@ -422,10 +812,13 @@ def submit_review(request, product_id):
 from django.utils import timezone
 from datetime import timedelta
 from .models import ProductReservation
-from .utils import get_available_quantity, can_reserve_quantity
+from .reservation_stats import stock_and_reserved
+from .reservation_engine import atomic_with_holds, get_reservation_engine
+from .utils import get_available_quantity, hold_quantity
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@atomic_with_holds
 def create_reservation(request, product_id):
     try:
         product = TShirt.objects.get(id=product_id, is_available=True)
@@ -435,23 +828,16 @@ def create_reservation(request, product_id):
         if quantity < 1:
             return Response({'error': 'Quantity must be at least 1'}, status=400)
         
-        # Check if user can reserve this quantity
-        if not can_reserve_quantity(product, request.user, quantity):
+        expires_at = timezone.now() + timedelta(minutes=15)
+
+        # Check if user can reserve this quantity (and hold it, with a reservation engine)
+        if not hold_quantity(product, request.user, quantity, expires_at):
             available = get_available_quantity(product)
             return Response({
                 'error': f'Only {available} items available for reservation'
             }, status=400)
         
-        # Clean up expired reservations first
-        ProductReservation.objects.filter(
-            product=product,
-            is_active=True,
-            expires_at__lte=timezone.now()
-        ).update(is_active=False)
-        
         # Create or update reservation
-        expires_at = timezone.now() + timedelta(minutes=15)
-        
         try:
             # Try to get existing reservation
             reservation = ProductReservation.objects.get(
@@ -486,14 +872,25 @@ def create_reservation(request, product_id):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@atomic_with_holds
 def extend_reservation(request, reservation_id):
     try:
-        reservation = ProductReservation.objects.get(
+        reservation = ProductReservation.objects.select_related('product').get(
             id=reservation_id, 
             user=request.user,
             is_active=True
         )
         
+        engine = get_reservation_engine()
+        if engine is not None and reservation.can_extend():
+            # The engine must keep holding the stock for the extended time, or the extension is refused.
+            held, _ = engine.hold(
+                reservation.product_id, request.user.pk, reservation.quantity, reservation.product.quantity,
+                timezone.now() + timedelta(minutes=5)
+            )
+            if not held:
+                return Response({'error': 'Cannot extend reservation'}, status=400)
+
         if reservation.extend_reservation():
             return Response({
                 'expires_at': reservation.expires_at,
@@ -506,66 +903,111 @@ def extend_reservation(request, reservation_id):
     except ProductReservation.DoesNotExist:
         return Response({'error': 'Reservation not found'}, status=404)
 
+def _reservation_status(total, available, own=None):
+    """Reservation-status payload for one product.
+
+    Args:
+        total: the product's stock quantity
+        available: stock not held by active reservations
+        own: (quantity, expires_at) of the caller's active reservation, if any
+    """
+    if own is not None:
+        quantity, expires_at = own
+        return {
+            'is_reserved': True,
+            'expires_at': expires_at,
+            'time_remaining': max(int((expires_at - timezone.now()).total_seconds()), 0),
+            'is_own_reservation': True,
+            'quantity': quantity,
+            'available_quantity': available + quantity,
+            'total_quantity': total
+        }
+    if available == total:
+        # No reservations in effect; treat as not reserved
+        return {'is_reserved': False, 'available_quantity': available, 'total_quantity': total}
+    if available == 0:
+        # Fully reserved by others
+        return {'is_reserved': True, 'is_own_reservation': False, 'available_quantity': available, 'total_quantity': total}
+    # Partially reserved by others but stock remains; not reserved from the shopper's perspective
+    return {'is_reserved': False, 'available_quantity': available, 'total_quantity': total}
+
 @api_view(['GET'])
 def check_reservation_status(request, product_id):
     try:
         product = TShirt.objects.get(id=product_id)
         
-        # Clean up expired reservations
-        ProductReservation.objects.filter(
-            product=product,
-            is_active=True,
-            expires_at__lte=timezone.now()
-        ).update(is_active=False)
+        # Get available quantity (this releases any overdue reservations, so is_active is exact below)
+        available_qty = get_available_quantity(product)
         
         # Check if user has active reservation
-        user_reservation = None
-        if request.user.is_authenticated:
-            try:
-                user_reservation = ProductReservation.objects.get(
-                    product=product,
-                    user=request.user,
-                    is_active=True,
-                    expires_at__gt=timezone.now()
-                )
-            except ProductReservation.DoesNotExist:
-                pass
+        own = None
+        engine = get_reservation_engine()
+        if engine is not None:
+            if request.user.is_authenticated:
+                own = engine.current(product.pk, request.user.pk)
+        elif request.user.is_authenticated:
+            own = ProductReservation.objects.filter(
+                product=product,
+                user=request.user,
+                is_active=True
+            ).values_list('quantity', 'expires_at').first()
         
-        # Get available quantity
-        available_qty = get_available_quantity(product)
-        
-        if user_reservation:
-            return Response({
-                'is_reserved': True,
-                'expires_at': user_reservation.expires_at,
-                'time_remaining': user_reservation.time_remaining,
-                'is_own_reservation': True,
-                'quantity': user_reservation.quantity,
-                'available_quantity': available_qty + user_reservation.quantity,
-                'total_quantity': product.quantity
-            })
-        elif available_qty == product.quantity:
-            # No reservations in effect; treat as not reserved
-            return Response({
-                'is_reserved': False,
-                'available_quantity': available_qty,
-                'total_quantity': product.quantity
-            })
-        elif available_qty == 0:
-            # Fully reserved by others
-            return Response({
-                'is_reserved': True,
-                'is_own_reservation': False,
-                'available_quantity': available_qty,
-                'total_quantity': product.quantity
-            })
-        else:
-            # Partially reserved by others but stock remains; not reserved from the shopper's perspective
-            return Response({
-                'is_reserved': False,
-                'available_quantity': available_qty,
-                'total_quantity': product.quantity
-            })
+        return Response(_reservation_status(product.quantity, available_qty, own))
         
     except TShirt.DoesNotExist:
-        return Response({'error': 'Product not found'}, status=404)
\ No newline at end of file
+        return Response({'error': 'Product not found'}, status=404)
+
+@api_view(['GET'])
+def reservation_status_batch(request):
+    """Reservation status of many products (``?ids=1,2,3``) for listing and cart badges.
+
+    Two queries whatever the number of products: stock plus reserved
+    quantities, and the caller's own reservations (with a reservation
+    engine: one query, and holds read from the engine). Anonymous responses
+    are cached for RESERVATION_STATUS_CACHE_SECONDS.
+    """
+    try:
+        ids = list(dict.fromkeys(int(value) for value in request.GET.get('ids', '').split(',') if value.strip()))
+    except ValueError:
+        return Response({'error': 'ids must be integers'}, status=400)
+    if not ids:
+        return Response({'error': 'ids is required'}, status=400)
+    if len(ids) > settings.PRODUCT_BATCH_MAX:
+        return Response({'error': f'At most {settings.PRODUCT_BATCH_MAX} products per request'}, status=400)
+
+    anonymous = not request.user.is_authenticated
+    cache_key = f"reservation-status:{','.join(map(str, ids))}"
+    if anonymous and settings.RESERVATION_STATUS_CACHE_SECONDS:
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+
+    engine = get_reservation_engine()
+    if engine is not None:
+        # Holds live in the engine; the stored counter lags its write-through.
+        stock, own = {}, {}
+        for product_id, total in TShirt.objects.filter(id__in=ids).order_by().values_list('id', 'quantity'):
+            stock[product_id] = (total, total - engine.available(product_id, None, total))
+            if not anonymous:
+                own[product_id] = engine.current(product_id, request.user.pk)
+    else:
+        stock = stock_and_reserved(ids)
+        own = {}
+    if engine is None and not anonymous:
+        own = {
+            product_id: (quantity, expires_at)
+            for product_id, quantity, expires_at in ProductReservation.objects.filter(
+                user=request.user, product_id__in=list(stock), is_active=True
+            ).order_by().values_list('product_id', 'quantity', 'expires_at')
+        }
+    results = []
+    for product_id in ids:
+        if product_id in stock:
+            total, reserved = stock[product_id]
+            status_data = _reservation_status(total, max(0, total - reserved), own.get(product_id))
+            results.append({'product_id': product_id, **status_data})
+    data = {'results': results, 'missing': [product_id for product_id in ids if product_id not in stock]}
+
+    if anonymous and settings.RESERVATION_STATUS_CACHE_SECONDS:
+        cache.set(cache_key, data, settings.RESERVATION_STATUS_CACHE_SECONDS)
+    return Response(data)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from apps.common.fieldsets import PATH_CONTEXT_KEY, SparseFieldsetMixin
 from .models import UserProfile, Wishlist, SavedSearch
 
 class UserSerializer(serializers.ModelSerializer):
@@ -29,7 +30,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'size_preference', 'created_at', 'updated_at'
         ]
 
-class WishlistSerializer(serializers.ModelSerializer):
+class WishlistSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Wishlist serializer."""
     from apps.products.serializers import TShirtListSerializer
     tshirt = TShirtListSerializer(read_only=True)
@@ -38,6 +39,28 @@ class WishlistSerializer(serializers.ModelSerializer):
         model = Wishlist
         fields = ['id', 'tshirt', 'created_at']
 
+class WishlistListingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Wishlist serializer backed by the ProductListing read model.
+
+    Expects ``listings`` (tshirt id -> ProductListing) in the context; items
+    that have no listing (sold out) fall back to TShirtListSerializer over
+    the ``tshirts`` (tshirt id -> TShirt) context entry.
+    """
+    tshirt = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Wishlist
+        fields = ['id', 'tshirt', 'created_at']
+
+    def get_tshirt(self, obj):
+        from apps.products.serializers import ProductListingSerializer, TShirtListSerializer
+        context = {**self.context, PATH_CONTEXT_KEY: ('tshirt',)}
+        listing = self.context.get('listings', {}).get(obj.tshirt_id)
+        if listing is not None:
+            return ProductListingSerializer(listing, context=context).data
+        tshirt = self.context.get('tshirts', {}).get(obj.tshirt_id) or obj.tshirt
+        return TShirtListSerializer(tshirt, context=context).data
+
 class SavedSearchSerializer(serializers.ModelSerializer):
     """Saved search serializer."""
     user = UserSerializer(read_only=True)
@@ -7,7 +7,8 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from .models import UserProfile, Wishlist, SavedSearch
-from .serializers import UserSerializer, UserProfileSerializer, WishlistSerializer, SavedSearchSerializer
+from .serializers import UserSerializer, UserProfileSerializer, WishlistSerializer, WishlistListingSerializer, SavedSearchSerializer
+from apps.common.fieldsets import SparseFieldsetViewMixin
 from apps.common.validators import sanitize_html, validate_email
 
 class RegisterView(generics.CreateAPIView):
@@ -134,7 +135,7 @@ class UpdateProfileView(generics.UpdateAPIView):
         profile, created = UserProfile.objects.get_or_create(user=self.request.user)
         return profile
 
-class WishlistView(generics.ListAPIView):
+class WishlistView(SparseFieldsetViewMixin, generics.ListAPIView):
     """User wishlist view."""
     serializer_class = WishlistSerializer
     permission_classes = [IsAuthenticated]
@@ -146,6 +147,27 @@ class WishlistView(generics.ListAPIView):
             .select_related('tshirt', 'tshirt__brand', 'tshirt__category')
         )
 
+    def list(self, request, *args, **kwargs):
+        from apps.products.models import ProductListing, TShirt
+        from apps.products.read_model import read_model_enabled
+
+        if not read_model_enabled():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(Wishlist.objects.filter(user=request.user))
+        page = self.paginate_queryset(queryset)
+        items = page if page is not None else list(queryset)
+
+        context = self.get_serializer_context()
+        context['listings'] = ProductListing.objects.in_bulk([item.tshirt_id for item in items])
+        # Only items without a listing (sold out) need the product, brand and category rows.
+        missing = [item.tshirt_id for item in items if item.tshirt_id not in context['listings']]
+        context['tshirts'] = TShirt.objects.select_related('brand', 'category').in_bulk(missing) if missing else {}
+        serializer = WishlistListingSerializer(items, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
 class AddToWishlistView(generics.CreateAPIView):
     """Add item to wishlist."""
     permission_classes = [IsAuthenticated]
@@ -196,6 +196,15 @@ DEFAULT_FROM_EMAIL = 'Thriftee <noreply@thriftee.com>'
 # Frontend URL for email links
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 
+# Catalog read model: serve list endpoints from the denormalized ProductListing table
+CATALOG_READ_MODEL_ENABLED = os.getenv('CATALOG_READ_MODEL_ENABLED', 'False') == 'True'
+
+# In-process catalog search index (see apps/products/search.py)
+CATALOG_SEARCH_INDEX_PATH = os.getenv('CATALOG_SEARCH_INDEX_PATH', os.path.join(BASE_DIR, 'var', 'search_index.bin'))
+CATALOG_SEARCH_REFRESH_SECONDS = int(os.getenv('CATALOG_SEARCH_REFRESH_SECONDS', '60'))
+# Most index hits a catalog search returns
+CATALOG_SEARCH_MAX_HITS = int(os.getenv('CATALOG_SEARCH_MAX_HITS', '1000'))
+
 # Cache Configuration
 CACHES = {
     'default': {
@@ -203,7 +212,67 @@ CACHES = {
     }
 }
 
+# Upper bound on how long versioned metadata responses stay cached (apps/common/response_cache.py)
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', '86400'))
+
+# Also cache rendered product detail JSON, keyed on the detail ETag
+CATALOG_DETAIL_CACHE_ENABLED = os.getenv('CATALOG_DETAIL_CACHE_ENABLED', 'False') == 'True'
+
+# Render hot list/cart serializers through precompiled accessors (apps/common/fast_serializers.py)
+FAST_SERIALIZERS_ENABLED = os.getenv('FAST_SERIALIZERS_ENABLED', 'True') == 'True'
+
+# Resized product photo variants (apps/products/images.py); 0 workers renders inline
+PRODUCT_IMAGE_WIDTHS = [int(width) for width in os.getenv('PRODUCT_IMAGE_WIDTHS', '320,640,1024,1600').split(',')]
+PRODUCT_IMAGE_FORMATS = os.getenv('PRODUCT_IMAGE_FORMATS', 'avif,webp,jpeg').split(',')
+PRODUCT_IMAGE_QUALITY = int(os.getenv('PRODUCT_IMAGE_QUALITY', '80'))
+PRODUCT_IMAGE_WORKERS = int(os.getenv('PRODUCT_IMAGE_WORKERS', '2'))
+PRODUCT_IMAGE_VARIANTS_ON_UPLOAD = os.getenv('PRODUCT_IMAGE_VARIANTS_ON_UPLOAD', 'True') == 'True'
+PRODUCT_IMAGE_VARIANTS_ASYNC = os.getenv('PRODUCT_IMAGE_VARIANTS_ASYNC', 'True') == 'True'
+
+# Precomputed "similar items" per product (apps/products/similarity.py)
+SIMILAR_ITEMS_K = int(os.getenv('SIMILAR_ITEMS_K', '12'))
+SIMILAR_ITEMS_INCREMENTAL = os.getenv('SIMILAR_ITEMS_INCREMENTAL', 'True') == 'True'
+SIMILAR_ITEMS_ASYNC = os.getenv('SIMILAR_ITEMS_ASYNC', 'True') == 'True'
+SIMILAR_ITEMS_MODEL_REFRESH_SECONDS = int(os.getenv('SIMILAR_ITEMS_MODEL_REFRESH_SECONDS', '3600'))
+
+# Most products one tshirts/batch/ request may hydrate
+PRODUCT_BATCH_MAX = int(os.getenv('PRODUCT_BATCH_MAX', '50'))
+
+# Reservation expiry sweeper (apps/products/reservation_stats.py): run `manage.py expire_reservations --loop`,
+# or set RESERVATION_SWEEPER_THREAD to sweep from a thread in each web process
+RESERVATION_SWEEPER_THREAD = os.getenv('RESERVATION_SWEEPER_THREAD', 'False') == 'True'
+RESERVATION_SWEEPER_INTERVAL = int(os.getenv('RESERVATION_SWEEPER_INTERVAL', '30'))
+RESERVATION_SWEEP_BATCH_SIZE = int(os.getenv('RESERVATION_SWEEP_BATCH_SIZE', '500'))
+# How long batch reservation-status responses are cached for anonymous callers (0 disables)
+RESERVATION_STATUS_CACHE_SECONDS = int(os.getenv('RESERVATION_STATUS_CACHE_SECONDS', '5'))
+# Atomic reservation holds outside the database (apps/products/reservation_engine.py):
+# 'redis' for multi-process deployments, 'memory' for a single process, empty to hold with row locks
+RESERVATION_ENGINE = os.getenv('RESERVATION_ENGINE', '')
+RESERVATION_REDIS_URL = os.getenv('RESERVATION_REDIS_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+RESERVATION_WRITE_THROUGH_ASYNC = os.getenv('RESERVATION_WRITE_THROUGH_ASYNC', 'True') == 'True'
+# Redis hold keys of a product idle this long (seconds) expire and are reseeded from the database
+RESERVATION_REDIS_KEY_TTL = int(os.getenv('RESERVATION_REDIS_KEY_TTL', '86400'))
+
+# Default allowed difference (inches) per measurement in fit search
+FIT_SEARCH_DEFAULT_TOLERANCE = float(os.getenv('FIT_SEARCH_DEFAULT_TOLERANCE', '1.0'))
+
+# Merchant feeds and sitemap (apps/products/feeds.py)
+PRODUCT_FEED_ROOT = os.getenv('PRODUCT_FEED_ROOT', os.path.join(MEDIA_ROOT, 'feeds'))
+PRODUCT_FEED_SHARD_SIZE = int(os.getenv('PRODUCT_FEED_SHARD_SIZE', '1000'))
+# Absolute origin for image links in feeds written by the command
+PRODUCT_FEED_MEDIA_BASE_URL = os.getenv('PRODUCT_FEED_MEDIA_BASE_URL', 'http://localhost:8000')
+
+# Memory-mapped columnar catalog snapshot shared by all workers (apps/products/snapshot.py)
+CATALOG_SNAPSHOT_ENABLED = os.getenv('CATALOG_SNAPSHOT_ENABLED', 'False') == 'True'
+CATALOG_SNAPSHOT_DIR = os.getenv('CATALOG_SNAPSHOT_DIR', os.path.join(BASE_DIR, 'var', 'catalog_snapshot'))
+# How often a worker checks for a newer generation, and the minimum age before a dirty snapshot is rebuilt
+CATALOG_SNAPSHOT_CHECK_SECONDS = float(os.getenv('CATALOG_SNAPSHOT_CHECK_SECONDS', '1'))
+CATALOG_SNAPSHOT_MIN_AGE = float(os.getenv('CATALOG_SNAPSHOT_MIN_AGE', '5'))
+
 # Logging Configuration
+LOG_DIR = os.path.join(BASE_DIR, 'logs')
+os.makedirs(LOG_DIR, exist_ok=True)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -211,7 +280,7 @@ LOGGING = {
         'file': {
             'level': 'ERROR',
             'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'logs', 'errors.log'),
+            'filename': os.path.join(LOG_DIR, 'errors.log'),
         },
     },
     'loggers': {